@@ -1,29 +1,98 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, session
-import schedule
+from startup import StartupTimer
+# Created before anything else is imported, so the startup report covers the imports
+startup = StartupTimer()
+
+from flask import Flask, Request, Response, g, request, jsonify, render_template, redirect, url_for, session
 import time
-import pyttsx3
+import logging
 import datetime
-import pandas as pd
 import os
 import threading
+import multiprocessing
 import platform
-import json
-from typing import Dict, List
-from pathlib import Path
-import hashlib
+import random
+import argparse
+from typing import Dict, List, Optional
+from tempfile import SpooledTemporaryFile, mkstemp
 import uuid
 from functools import wraps
 import base64
 from werkzeug.utils import secure_filename
-import re
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from users import EmailAlreadyRegistered, UserManager
+from sqlite_users import SQLiteUserManager
+from reminder_scheduler import ReminderScheduler
+from notifications import NotificationDispatcher
+from smtp_pool import SMTPConnectionPool
+from email_templates import ReminderEmailTemplate, format_medicine_list
+from prices import PriceCatalog
+from price_history import PricePopularity
+from basket import optimize_basket
+from prescription_jobs import PrescriptionJobQueue, extract_prescription_text
+from voice import AudioCache, VoiceAlerts, create_voice_backend
+from metrics import CONTENT_TYPE, REGISTRY, Counter, Gauge, Histogram, start_metrics_server
+from structured_logging import configure_logging
+
+class SpooledUploadRequest(Request):
+    """Request that keeps uploaded files in memory up to UPLOAD_SPOOL_THRESHOLD.
+
+    Larger uploads spill to an anonymous temporary file, which is unique
+    per upload and removed as soon as the request is done with it.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        return SpooledTemporaryFile(max_size=app.config['UPLOAD_SPOOL_THRESHOLD'], mode='rb+')
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
+app.request_class = SpooledUploadRequest
 app.secret_key = 'mediremind_secret_key_2025'  # For session management
-app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
+app.config['UPLOAD_SPOOL_THRESHOLD'] = 1024 * 1024  # uploads above this size spill to a temp file
+app.config['PRESCRIPTION_AUDIT_DIR'] = None  # set to a directory to keep uploaded prescriptions
+
+# Background prescription analysis (POST /analyze_prescription with async=1):
+# worker processes, unfinished jobs allowed per user, seconds results are kept.
+# Each web worker runs its own pool, so the cores are split between them;
+# jobs are kept in PRESCRIPTION_JOB_DB, which every web worker shares.
+app.config['WEB_WORKERS'] = int(os.environ.get('MEDIREMIND_WEB_WORKERS', 1))
+app.config['PRESCRIPTION_JOB_WORKERS'] = max(1, (os.cpu_count() or 1) // app.config['WEB_WORKERS'])
+app.config['PRESCRIPTION_JOB_DB'] = 'prescription_jobs.db'
+app.config['PRESCRIPTION_JOBS_PER_USER'] = 3
+app.config['PRESCRIPTION_JOB_TTL'] = 600
+
+app.config['MEDICINE_PRICES_CSV'] = 'medicine_prices.csv'
+app.config['PRICES_POLL_INTERVAL'] = 5  # seconds between checks for a new price file
+app.config['PRICE_DELTA_DIR'] = 'price_deltas'  # delta feeds dropped here are applied live
+app.config['SEARCH_SUGGESTIONS'] = 10  # medicine names suggested for a search or a miss
+app.config['COMPARE_BATCH_LIMIT'] = 50  # medicines per /compare_prices/batch or /basket request
+app.config['BASKET_MAX_PHARMACIES'] = 5  # most pharmacies a basket may be split across
+app.config['PRICE_WARM_TOP'] = 100  # most-checked medicines whose price tables are prebuilt
+
+# User storage: 'json' (users.json + journal) or 'sqlite'
+app.config['USER_STORE'] = os.environ.get('MEDIREMIND_USER_STORE', 'json')
+app.config['USERS_FILE'] = 'users.json'
+app.config['USER_DB_PATH'] = 'users.db'
+app.config['PRICE_HISTORY_SIZE'] = 10  # price checks remembered per user
+app.config['USER_FLUSH_INTERVAL'] = 0.05  # seconds between batched writes of changed users
+
+# Process role: 'all' (one process does everything), 'web' (requests only)
+# or 'scheduler' (reminders only); web and scheduler share the sqlite store
+app.config['ROLE'] = os.environ.get('MEDIREMIND_ROLE', 'all')
+app.config['SCHEDULER_SYNC_INTERVAL'] = 5  # seconds between checks for reminders saved by web processes
+
+# Spoken alerts; the voice engine is only started when the first one is due.
+# Backends: 'pyttsx3', or 'none' to make no sound. Synthesized phrases are
+# kept as audio files in VOICE_CACHE_DIR, up to VOICE_CACHE_SIZE of them.
+app.config['VOICE_ALERTS_ENABLED'] = os.environ.get('MEDIREMIND_VOICE_ALERTS', '1') != '0'
+app.config['VOICE_BACKEND'] = os.environ.get('MEDIREMIND_VOICE_BACKEND', 'pyttsx3')
+app.config['VOICE_CACHE_DIR'] = 'voice_cache'
+app.config['VOICE_CACHE_SIZE'] = 64
+
+# Logging: level, and 'text' lines or 'json' objects (one per line)
+app.config['LOG_LEVEL'] = os.environ.get('MEDIREMIND_LOG_LEVEL', 'INFO')
+app.config['LOG_FORMAT'] = os.environ.get('MEDIREMIND_LOG_FORMAT', 'text')
+# The scheduler process has no web app, so it serves /metrics on this port (0 to disable)
+app.config['SCHEDULER_METRICS_PORT'] = int(os.environ.get('MEDIREMIND_METRICS_PORT', 9105))
 
 # Email configuration
 app.config['MAIL_SERVER'] = 'smtp.gmail.com'
@@ -31,177 +100,123 @@ app.config['MAIL_PORT'] = 587
 app.config['MAIL_USE_TLS'] = True
 app.config['MAIL_USERNAME'] = 'mediremind.app@gmail.com'  # Replace with your email
 app.config['MAIL_PASSWORD'] = 'your_app_password'  # Replace with your app password
+app.config['MAIL_MAX_CONNECTIONS'] = 4  # SMTP sessions kept open and reused
+app.config['MAIL_IDLE_TIMEOUT'] = 60  # seconds before an idle session is replaced
+
+# Notification delivery: worker threads per channel, queue size per channel,
+# and how often a failed email is retried (with exponential backoff)
+app.config['NOTIFY_EMAIL_WORKERS'] = 4
+app.config['NOTIFY_QUEUE_SIZE'] = 1000
+app.config['NOTIFY_MAX_RETRIES'] = 3
+app.config['NOTIFY_RETRY_BACKOFF'] = 2.0  # seconds before the first retry
+
+configure_logging(app.config['LOG_LEVEL'], json_format=app.config['LOG_FORMAT'] == 'json')
+log = logging.getLogger('mediremind')
+
+REQUEST_SECONDS = Histogram('mediremind_http_request_duration_seconds', 'Time to handle a request',
+                            ['method', 'route', 'status'])
+PRICE_LOOKUP_SECONDS = Histogram('mediremind_price_lookup_duration_seconds',
+                                 'Time to answer a price query', ['operation'])
+
+def create_user_manager(role='all'):
+    """Create the UserManager for the configured storage backend and process role."""
+    if app.config['USER_STORE'] == 'sqlite':
+        # Web workers share the database, so they cannot batch writes
+        # in memory without losing each other's updates
+        return SQLiteUserManager(app.config['USER_DB_PATH'], app.config['PRICE_HISTORY_SIZE'],
+                                 app.config['USER_FLUSH_INTERVAL'], write_behind=role != 'web')
+    return UserManager(app.config['USERS_FILE'], app.config['PRICE_HISTORY_SIZE'],
+                       app.config['USER_FLUSH_INTERVAL'])
+
+class MedicineReminder:
+    """The app's services, started according to the process's role.
+
+    'all' runs everything in one process, as the development server does.
+    'web' serves requests only: reminders are saved to the user store and
+    nothing is scheduled, spoken or emailed. 'scheduler' fires reminders
+    only, following the reminders web processes save (see sync_reminders).
+    """
 
-# Create uploads directory if it doesn't exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-class User:
-    def __init__(self, name, email, password_hash, user_id=None):
-        self.user_id = user_id or str(uuid.uuid4())
-        self.name = name
-        self.email = email
-        self.password_hash = password_hash
-        self.reminders = {}
-        self.medications = []
-        self.price_checks = []
-        self.streak_days = 0
-        self.email_notifications = True  # Default to enabled
+    def __init__(self, role: str = 'all'):
+        self.role = role
+        self.voice = None
+
+        # Reloaded in the background whenever medicine_prices.csv changes
+        # Medicines checked most often have their price tables built ahead of time
+        # The first load runs in the background as well; price_index waits for it
+        self.popularity = PricePopularity()
+        self.prices = None
+        if role != 'scheduler':
+            self.prices = PriceCatalog(
+                app.config['MEDICINE_PRICES_CSV'],
+                poll_interval=app.config['PRICES_POLL_INTERVAL'],
+                delta_dir=app.config['PRICE_DELTA_DIR'],
+                popular=self.popular_medicines
+            )
+            self.prices.start_watching(load=True)
+        with startup.phase('users'):
+            self.user_manager = create_user_manager(role)
+        self.scheduler = None
+        if role == 'web':
+            return
+        self.scheduler = ReminderScheduler(on_due=self.fire_reminders)
         
-    def to_dict(self):
-        return {
-            'user_id': self.user_id,
-            'name': self.name,
-            'email': self.email,
-            'password_hash': self.password_hash,
-            'reminders': self.reminders,
-            'medications': self.medications,
-            'price_checks': self.price_checks,
-            'streak_days': self.streak_days,
-            'email_notifications': self.email_notifications
-        }
-    
-    @classmethod
-    def from_dict(cls, data):
-        user = cls(
-            name=data['name'],
-            email=data['email'],
-            password_hash=data['password_hash'],
-            user_id=data['user_id']
+        self.email_template = ReminderEmailTemplate(app.config['MAIL_USERNAME'])
+        self.smtp_pool = SMTPConnectionPool(
+            app.config['MAIL_SERVER'],
+            app.config['MAIL_PORT'],
+            username=app.config['MAIL_USERNAME'],
+            password=app.config['MAIL_PASSWORD'],
+            use_tls=app.config['MAIL_USE_TLS'],
+            max_connections=app.config['MAIL_MAX_CONNECTIONS'],
+            max_idle=app.config['MAIL_IDLE_TIMEOUT']
         )
-        user.reminders = data.get('reminders', {})
-        user.medications = data.get('medications', [])
-        user.price_checks = data.get('price_checks', [])
-        user.streak_days = data.get('streak_days', 0)
-        user.email_notifications = data.get('email_notifications', True)
-        return user
-
-class UserManager:
-    def __init__(self):
-        self.users = {}
-        self.users_file = 'users.json'
-        self.load_users()
-        
-    def load_users(self):
-        try:
-            if os.path.exists(self.users_file):
-                with open(self.users_file, 'r') as f:
-                    users_data = json.load(f)
-                    for user_id, user_data in users_data.items():
-                        self.users[user_id] = User.from_dict(user_data)
-                print(f"Loaded {len(self.users)} users from {self.users_file}")
-            else:
-                print(f"No users file found at {self.users_file}")
-        except Exception as e:
-            print(f"Error loading users: {e}")
-            
-    def save_users(self):
-        try:
-            users_data = {user_id: user.to_dict() for user_id, user in self.users.items()}
-            with open(self.users_file, 'w') as f:
-                json.dump(users_data, f, indent=4)
-            print(f"Saved {len(self.users)} users to {self.users_file}")
-        except Exception as e:
-            print(f"Error saving users: {e}")
-            
-    def get_user_by_email(self, email):
-        for user in self.users.values():
-            if user.email.lower() == email.lower():
-                return user
-        return None
-        
-    def get_user_by_id(self, user_id):
-        return self.users.get(user_id)
-        
-    def create_user(self, name, email, password):
-        # Check if user with email already exists
-        if self.get_user_by_email(email):
-            return None
-            
-        # Hash password
-        password_hash = self._hash_password(password)
         
-        # Create new user
-        user = User(name, email, password_hash)
-        self.users[user.user_id] = user
-        self.save_users()
-        return user
-        
-    def authenticate_user(self, email, password):
-        user = self.get_user_by_email(email)
-        if not user:
-            return None
-            
-        password_hash = self._hash_password(password)
-        if user.password_hash == password_hash:
-            return user
-        return None
-        
-    def update_user(self, user_id, name=None, email=None, password=None, email_notifications=None):
-        user = self.get_user_by_id(user_id)
-        if not user:
-            return False
-            
-        if name:
-            user.name = name
-        if email:
-            user.email = email
-        if password:
-            user.password_hash = self._hash_password(password)
-        if email_notifications is not None:
-            user.email_notifications = email_notifications
-            
-        self.save_users()
-        return True
+        # Voice and email delivery run on their own workers so a slow
+        # mail server cannot hold up the scheduler
+        self.notifications = NotificationDispatcher(
+            queue_size=app.config['NOTIFY_QUEUE_SIZE'],
+            retry_backoff=app.config['NOTIFY_RETRY_BACKOFF']
+        )
+        # Speech plays one phrase at a time, and pyttsx3 engines are not
+        # thread-safe, so voice gets a single worker
+        self.notifications.add_channel('voice', workers=1)
+        if app.config['VOICE_ALERTS_ENABLED']:
+            # The backend starts its engine when the voice worker first needs
+            # it, so a slow or hanging audio setup never holds up startup
+            voice_backend = create_voice_backend(app.config['VOICE_BACKEND'])
+            self.voice = VoiceAlerts(voice_backend, AudioCache(
+                app.config['VOICE_CACHE_DIR'],
+                max_entries=app.config['VOICE_CACHE_SIZE'],
+                extension=voice_backend.extension
+            ))
+        self.notifications.add_channel(
+            'email',
+            workers=app.config['NOTIFY_EMAIL_WORKERS'],
+            max_retries=app.config['NOTIFY_MAX_RETRIES']
+        )
         
-    def _hash_password(self, password):
-        # Simple password hashing - in production, use a more secure method
-        return hashlib.sha256(password.encode()).hexdigest()
-
-class MedicineReminder:
-    def __init__(self):
-        self.voice_system_available = False
-        try:
-            self.engine = pyttsx3.init()
-            # Test the voice system
-            self.engine.say("Voice system initialized")
-            self.engine.runAndWait()
-            self.voice_system_available = True
-            print("\nVoice alert system is ready!")
-        except Exception as e:
-            print(f"\nWarning: Could not initialize voice system: {e}")
-            print("Reminders will still work, but without voice alerts.")
-            self.engine = None
-
-        self.medicine_prices = self.load_medicine_prices()
-        self.user_manager = UserManager()
+        # Reminder changes seen so far: the store's version and each user's reminders
+        self.reminders_version = -1
+        self.synced_reminders: Dict[str, Dict[str, str]] = {}
+        with startup.phase('reminders'):
+            if role == 'scheduler':
+                self.sync_reminders()
+            else:
+                self.restore_reminders()
         
         # Start the scheduler in a separate thread
         self.scheduler_thread = threading.Thread(target=self.run_scheduler, daemon=True)
         self.scheduler_thread.start()
 
-    def load_medicine_prices(self) -> Dict:
-        """Load medicine prices from CSV file."""
-        try:
-            csv_path = Path("medicine_prices.csv")
-            if not csv_path.exists():
-                print("Warning: medicine_prices.csv not found. Using empty price database.")
-                return {}
-            
-            df = pd.read_csv(csv_path)
-            prices_dict = {}
-            for _, row in df.iterrows():
-                medicine = row['Medicine Name']
-                pharmacy = row['Pharmacy Name']
-                price = float(row['Price'])
-                
-                if medicine not in prices_dict:
-                    prices_dict[medicine] = {}
-                prices_dict[medicine][pharmacy] = price
-            
-            return prices_dict
-        except Exception as e:
-            print(f"Error loading medicine prices: {e}")
-            return {}
+    @property
+    def price_index(self):
+        """The current price index; take it once per request.
+
+        Waits for the first load if it is still running.
+        """
+        self.prices.wait_loaded()
+        return self.prices.index
 
     def validate_time_format(self, time_str: str) -> bool:
         """Validate if the time string is in correct format."""
@@ -230,13 +245,6 @@ class MedicineReminder:
     def set_reminder(self, user_id: str, medicine_name: str, reminder_time: str) -> Dict:
         """Set a reminder for taking medicine at a specific time."""
         try:
-            user = self.user_manager.get_user_by_id(user_id)
-            if not user:
-                return {
-                    "status": "error",
-                    "message": "User not found"
-                }
-                
             if not self.validate_time_format(reminder_time):
                 return {
                     "status": "error",
@@ -245,23 +253,33 @@ class MedicineReminder:
 
             time_24hour = self.convert_to_24hour(reminder_time)
             
-            # Store reminder in user's reminders
-            if medicine_name not in user.reminders:
-                user.reminders[medicine_name] = time_24hour
+            # Held from read to save so concurrent requests cannot lose each other's changes
+            with self.user_manager.user_lock(user_id):
+                user = self.user_manager.get_user_by_id(user_id)
+                if not user:
+                    return {
+                        "status": "error",
+                        "message": "User not found"
+                    }
                 
-                # Add medication to user's list if not already there
-                if medicine_name not in user.medications:
-                    user.medications.append(medicine_name)
-                
-                # Save updated user data
-                self.user_manager.save_users()
+                # Store reminder in user's reminders
+                if medicine_name not in user.reminders:
+                    user.reminders[medicine_name] = time_24hour
+                    
+                    # Add medication to user's list if not already there
+                    if medicine_name not in user.medications:
+                        user.medications.append(medicine_name)
+                    
+                    # Save updated user data
+                    self.user_manager.save_user(user, 'reminders', 'medications')
             
-            # Set up scheduler
-            schedule_tag = f"{user_id}_{medicine_name}"
-            schedule.clear(schedule_tag)
-            schedule.every().day.at(time_24hour).do(
-                self.alert_reminder, user_id, medicine_name
-            ).tag(schedule_tag)
+            # Set up scheduler; in a web process the scheduler process picks
+            # the saved reminder up from the store instead
+            if self.scheduler is not None:
+                schedule_tag = f"{user_id}_{medicine_name}"
+                self.scheduler.schedule_daily(
+                    schedule_tag, time_24hour, self.alert_reminder, user_id, medicine_name
+                )
             
             # Format time for display
             time_obj = datetime.datetime.strptime(time_24hour, '%H:%M')
@@ -283,114 +301,246 @@ class MedicineReminder:
                 "message": str(e)
             }
 
-    def alert_reminder(self, user_id: str, medicine_name: str) -> None:
-        """Alert the user when it's time to take medicine."""
+    def restore_reminders(self) -> int:
+        """Schedule every persisted reminder; returns how many were scheduled."""
+        start = time.perf_counter()
+        jobs = (
+            (f"{user_id}_{medicine_name}", time_24hour, self.alert_reminder, (user_id, medicine_name))
+            for user_id, medicine_name, time_24hour in self.user_manager.iter_reminders()
+        )
+        count = self.scheduler.schedule_many(jobs)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        log.info("Restored %d reminders in %.1f ms", count, elapsed_ms)
+        return count
+
+    def sync_reminders(self) -> int:
+        """Schedule reminders changed in the store since the last sync; returns users updated.
+
+        Only the changed users are read. Their reminders are compared with
+        what was scheduled for them, and only new, moved or removed
+        reminders touch the scheduler.
+        """
+        version, changed = self.user_manager.changed_reminders(self.reminders_version)
+        jobs = []
+        for user_id, reminders in changed.items():
+            scheduled = self.synced_reminders.get(user_id, {})
+            for medicine_name in scheduled.keys() - reminders.keys():
+                self.scheduler.cancel(f"{user_id}_{medicine_name}")
+            jobs.extend(
+                (f"{user_id}_{medicine_name}", time_24hour, self.alert_reminder, (user_id, medicine_name))
+                for medicine_name, time_24hour in reminders.items()
+                if scheduled.get(medicine_name) != time_24hour
+            )
+            if reminders:
+                self.synced_reminders[user_id] = reminders
+            else:
+                self.synced_reminders.pop(user_id, None)
+        if jobs:
+            self.scheduler.schedule_many(jobs)
+        if self.reminders_version < 0:
+            log.info("Scheduled %d reminders for %d users", len(jobs), len(self.synced_reminders))
+        # Never below 0, even for an empty store, so the first sync is only reported once
+        self.reminders_version = max(version, 0)
+        return len(changed)
+
+    def follow_reminders(self) -> None:
+        """Keep syncing reminders from the store; never returns."""
+        while True:
+            time.sleep(app.config['SCHEDULER_SYNC_INTERVAL'])
+            try:
+                self.sync_reminders()
+            except Exception as e:
+                log.exception("Error syncing reminders: %s", e)
+
+    def fire_reminders(self, jobs) -> None:
+        """Alert for reminders that came due together, one call per user.
+
+        The emails for all of them are sent as one batch.
+        """
+        due_by_user = {}
+        for job in jobs:
+            user_id, medicine_name = job.args
+            due_by_user.setdefault(user_id, []).append(medicine_name)
+        emails = []
+        for user_id, medicine_names in due_by_user.items():
+            try:
+                self.alert_user(user_id, medicine_names, emails)
+            except Exception as e:
+                log.exception("Error alerting user %s: %s", user_id, e)
+        self.submit_reminder_emails(emails)
+
+    def alert_reminder(self, user_id: str, *medicine_names: str) -> None:
+        """Alert the user when it's time to take medicine.
+        
+        Several medicines due at the same time are announced in one voice
+        alert and one email, unless the user turned digests off.
+        """
+        emails = []
+        self.alert_user(user_id, medicine_names, emails)
+        self.submit_reminder_emails(emails)
+
+    def alert_user(self, user_id: str, medicine_names, emails: List) -> None:
+        """Speak the alert for ``medicine_names`` and add the user's email to ``emails``."""
         user = self.user_manager.get_user_by_id(user_id)
         if not user:
-            print(f"User {user_id} not found for reminder")
+            log.warning("User %s not found for reminder", user_id)
+            return
+            
+        if len(medicine_names) > 1 and not user.digest_reminders:
+            for medicine_name in medicine_names:
+                self.alert_user(user_id, [medicine_name], emails)
             return
             
-        message = f"Time to take your {medicine_name}!"
-        print(f"\n{'='*50}")
-        print(f"REMINDER for {user.name}: {message}")
-        print(f"Current time: {datetime.datetime.now().strftime('%I:%M %p')}")
-        print(f"{'='*50}\n")
+        medicine_names = list(medicine_names)
+        message = f"Time to take your {format_medicine_list(medicine_names)}!"
+        log.info("REMINDER for %s: %s", user.name, message,
+                 extra={'user_id': user_id, 'medicines': medicine_names})
         
         # Voice alert
-        if self.voice_system_available and self.engine:
-            try:
-                self.engine.say(message)
-                self.engine.runAndWait()
-            except Exception as e:
-                print(f"Could not play voice alert: {e}")
+        if self.voice is not None and self.voice.available:
+            self.notifications.submit('voice', self.voice.speak, message)
         
         # Email alert - only send if user has email notifications enabled
         if user.email_notifications:
-            try:
-                self.send_reminder_email(user.email, user.name, medicine_name)
-                print(f"Email reminder sent to {user.email}")
-            except Exception as e:
-                print(f"Failed to send email reminder: {e}")
+            emails.append((user.email, user.name, medicine_names))
         else:
-            print(f"Email notifications disabled for user {user.name}")
+            log.info("Email notifications disabled for user %s", user.name)
+
+    def submit_reminder_emails(self, emails: List) -> None:
+        """Queue ``(email, user_name, medicine_names)`` reminder emails for delivery."""
+        if len(emails) == 1:
+            self.notifications.submit('email', self.deliver_reminder_email, *emails[0])
+        elif emails:
+            self.notifications.submit('email', self.deliver_reminder_emails, emails)
+
+    def deliver_reminder_email(self, email: str, user_name: str, medicine_names: List[str]) -> None:
+        """Send a reminder email; runs on an email notification worker, which retries failures."""
+        self.send_reminder_email(email, user_name, medicine_names)
+        log.info("Email reminder sent to %s", email)
+
+    def deliver_reminder_emails(self, emails: List) -> None:
+        """Send a batch of reminder emails over as few SMTP sessions as possible.
+
+        Runs on an email notification worker. Each email the batch failed
+        to deliver is queued again on its own, so it gets the channel's
+        retries without sending the rest of the batch twice.
+        """
+        sender = app.config['MAIL_USERNAME']
+        unrenderable = []
+        messages = [
+            (sender, [email], msg)
+            for email, msg in self.email_template.render_many(emails, failed=unrenderable)
+        ]
+        for email, error in unrenderable:
+            log.error("Cannot send a reminder email to %r: %s", email, error)
+        failures = self.smtp_pool.send_many(messages)
+        failed = set()
+        for to_addrs, error in failures:
+            log.warning("Failed to send reminder email to %s, will retry: %s", ', '.join(to_addrs), error)
+            failed.update(to_addrs)
+        for email, user_name, medicine_names in emails:
+            if email in failed:
+                self.notifications.submit(
+                    'email', self.deliver_reminder_email, email, user_name, medicine_names
+                )
+        log.info("Sent %d of %d reminder emails in one batch", len(messages) - len(failures), len(emails))
 
-    def send_reminder_email(self, email: str, user_name: str, medicine_name: str) -> None:
-        """Send an email reminder to the user."""
+    def send_reminder_email(self, email: str, user_name: str, medicine_names: List[str]) -> None:
+        """Send an email reminder listing every medicine that is due."""
         try:
-            current_time = datetime.datetime.now().strftime('%I:%M %p')
+            msg = self.email_template.render(email, user_name, medicine_names)
             
-            msg = MIMEMultipart()
-            msg['Subject'] = f"MediRemind: Time to take {medicine_name}"
-            msg['From'] = app.config['MAIL_USERNAME']
-            msg['To'] = email
-            
-            # Email content
-            html = f"""
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background-color: #4a90e2; color: white; padding: 20px; text-align: center; }}
-                    .content {{ padding: 20px; background-color: #f8f9fa; }}
-                    .footer {{ text-align: center; margin-top: 20px; font-size: 12px; color: #777; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>Medicine Reminder</h1>
-                    </div>
-                    <div class="content">
-                        <h2>Hello {user_name},</h2>
-                        <p>It's time to take your medication:</p>
-                        <p style="font-size: 18px; font-weight: bold; color: #4a90e2;">{medicine_name}</p>
-                        <p>Current time: {current_time}</p>
-                        <p>Stay healthy!</p>
-                    </div>
-                    <div class="footer">
-                        <p>This is an automated reminder from MediRemind.</p>
-                        <p>&copy; 2025 MediRemind - Healthcare INIT-SAGA</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            
-            msg.attach(MIMEText(html, 'html'))
-            
-            # Connect to the SMTP server and send the email
-            with smtplib.SMTP(app.config['MAIL_SERVER'], app.config['MAIL_PORT']) as server:
-                server.starttls()
-                server.login(app.config['MAIL_USERNAME'], app.config['MAIL_PASSWORD'])
-                server.send_message(msg)
+            # Send over a pooled, already authenticated SMTP session
+            self.smtp_pool.send(app.config['MAIL_USERNAME'], [email], msg)
                 
         except Exception as e:
             raise Exception(f"Failed to send email: {str(e)}")
 
+    def popular_medicines(self, n: Optional[int] = None) -> List[str]:
+        """Names of the most checked medicines, most popular first."""
+        n = app.config['PRICE_WARM_TOP'] if n is None else n
+        return [name for name, count in self.popularity.most_common(n)]
+
+    @PRICE_LOOKUP_SECONDS.labels('compare').time()
     def compare_prices(self, medicine_name: str) -> Dict:
         """Compare prices of a medicine across different pharmacies."""
-        if not self.medicine_prices:
+        price_index = self.price_index
+        if not price_index:
             return {
                 "status": "error",
                 "message": "Medicine price database is not available"
             }
 
-        if medicine_name in self.medicine_prices:
+        entry = price_index.get(medicine_name)
+        if entry:
             return {
                 "status": "success",
                 "data": {
                     "medicine": medicine_name,
-                    "prices": self.medicine_prices[medicine_name]
+                    "prices": entry.price_table()
                 }
             }
         else:
             return {
                 "status": "error",
                 "message": f"Medicine '{medicine_name}' not found",
-                "available_medicines": sorted(list(self.medicine_prices.keys()))
+                "available_medicines": price_index.search_index().search(
+                    medicine_name, app.config['SEARCH_SUGGESTIONS']
+                )
             }
 
+    @PRICE_LOOKUP_SECONDS.labels('batch').time()
+    def compare_prices_batch(self, medicine_names: List[str]) -> Dict:
+        """Compare prices of several medicines at once."""
+        price_index = self.price_index
+        if not price_index:
+            return {
+                "status": "error",
+                "message": "Medicine price database is not available"
+            }
+
+        medicines = []
+        not_found = []
+        for medicine_name in medicine_names:
+            entry = price_index.get(medicine_name)
+            if entry:
+                medicines.append({
+                    "medicine": medicine_name,
+                    "prices": entry.price_table(),
+                    "best_price": entry.min_price,
+                    "best_pharmacy": entry.best_pharmacy
+                })
+            else:
+                not_found.append({
+                    "medicine": medicine_name,
+                    "suggestions": price_index.search_index().search(
+                        medicine_name, app.config['SEARCH_SUGGESTIONS']
+                    )
+                })
+
+        return {
+            "status": "success",
+            "data": {
+                "medicines": medicines,
+                "not_found": not_found
+            }
+        }
+
+    @PRICE_LOOKUP_SECONDS.labels('basket').time()
+    def optimize_basket(self, medicine_names: List[str], max_pharmacies: int = 1) -> Dict:
+        """Find the cheapest way to buy several medicines from at most max_pharmacies pharmacies."""
+        price_index = self.price_index
+        if not price_index:
+            return {
+                "status": "error",
+                "message": "Medicine price database is not available"
+            }
+
+        return {
+            "status": "success",
+            "data": optimize_basket(price_index, medicine_names, max_pharmacies)
+        }
+
     def list_reminders(self, user_id: str) -> Dict:
         """List all active reminders for a user."""
         user = self.user_manager.get_user_by_id(user_id)
@@ -424,35 +574,67 @@ class MedicineReminder:
 
     def run_scheduler(self) -> None:
         """Run the scheduler in a separate thread."""
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+        self.scheduler.run()
             
-    def record_price_check(self, user_id: str, medicine_name: str) -> bool:
-        """Record a price check for a user."""
-        user = self.user_manager.get_user_by_id(user_id)
-        if not user or medicine_name not in self.medicine_prices:
-            return False
-            
-        prices = self.medicine_prices[medicine_name]
-        price_values = list(prices.values())
-        
-        check = {
-            "medicine": medicine_name,
-            "timestamp": datetime.datetime.now().isoformat(),
-            "min_price": min(price_values),
-            "max_price": max(price_values)
-        }
+    def analyze_prescription(self, user_id: str, text: str) -> List[Dict]:
+        """Find known medicines in text read from a prescription and price them."""
+        # Placeholder for actual OCR/prescription analysis: until then the
+        # text is the upload's filename, so matches are rare
+        return self.price_prescription(user_id, self.price_index.matcher().find(text))
+
+    def price_prescription(self, user_id: str, medicine_names: List[str]) -> List[Dict]:
+        """Price the medicines found in a prescription and record the checks."""
+        price_index = self.price_index
         
-        # Add to the beginning of the list (most recent first)
-        user.price_checks.insert(0, check)
+        # If no matches in the text, add some common medicines for demonstration
+        if not medicine_names and price_index:
+            # Take up to 3 random medicines from our database
+            available_medicines = price_index.names()
+            sample_size = min(3, len(available_medicines))
+            medicine_names = random.sample(available_medicines, sample_size)
         
-        # Keep only the last 10 checks
-        user.price_checks = user.price_checks[:10]
+        # Process detected medicines
+        medicines_data = []
+        for medicine in medicine_names:
+            entry = price_index.get(medicine)
+            if entry:
+                medicines_data.append({
+                    "name": medicine,
+                    "prices": entry.price_table(),
+                    "best_price": entry.min_price,
+                    "best_pharmacy": entry.best_pharmacy
+                })
         
-        # Save updated user data
-        self.user_manager.save_users()
-        return True
+        # Record the price check for each medicine
+        self.record_price_checks(user_id, medicine_names)
+        return medicines_data
+
+    def record_price_check(self, user_id: str, medicine_name: str) -> bool:
+        """Record a price check for a user."""
+        return self.record_price_checks(user_id, [medicine_name]) == 1
+
+    def record_price_checks(self, user_id: str, medicine_names: List[str]) -> int:
+        """Record price checks for several medicines with one save; returns how many were recorded."""
+        price_index = self.price_index
+        with self.user_manager.user_lock(user_id):
+            user = self.user_manager.get_user_by_id(user_id)
+            if not user:
+                return 0
+            
+            recorded = []
+            for medicine_name in medicine_names:
+                entry = price_index.get(medicine_name)
+                if entry:
+                    # The history keeps only the most recent checks, dropping the oldest
+                    user.price_checks.record(medicine_name, entry.min_price, entry.max_price)
+                    recorded.append(medicine_name)
+            if not recorded:
+                return 0
+            
+            # Save updated user data
+            self.user_manager.save_user(user, 'price_checks')
+        self.popularity.record(recorded)
+        return len(recorded)
 
 # Authentication decorator
 def login_required(f):
@@ -463,8 +645,90 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# Initialize the MedicineReminder instance
-reminder = MedicineReminder()
+ROLES = ('all', 'web', 'scheduler')
+
+def start(role: str) -> None:
+    """Start the services this process needs in ``role`` (one of ROLES)."""
+    global reminder, prescription_jobs
+    startup.mark('imports')
+    if role not in ROLES:
+        raise ValueError(f"Unknown role {role!r}; expected one of {', '.join(ROLES)}")
+    if role != 'all' and app.config['USER_STORE'] != 'sqlite':
+        # users.json lives in one process's memory; other processes never see its changes
+        raise RuntimeError(f"The {role} role needs the shared sqlite user store "
+                           "(MEDIREMIND_USER_STORE=sqlite)")
+    reminder = MedicineReminder(role)
+    if role != 'scheduler':
+        prescription_jobs = PrescriptionJobQueue(
+            reminder.price_prescription,
+            app.config['MEDICINE_PRICES_CSV'],
+            db_path=app.config['PRESCRIPTION_JOB_DB'],
+            delta_dir=app.config['PRICE_DELTA_DIR'],
+            workers=app.config['PRESCRIPTION_JOB_WORKERS'],
+            max_per_user=app.config['PRESCRIPTION_JOBS_PER_USER'],
+            result_ttl=app.config['PRESCRIPTION_JOB_TTL'],
+        )
+    register_service_metrics(reminder)
+    startup.ready()
+
+NOTIFICATION_OUTCOMES = ('submitted', 'delivered', 'failed', 'retried', 'dropped')
+
+def register_service_metrics(reminder: MedicineReminder) -> None:
+    """Metrics read from the running services each time they are scraped."""
+    user_manager = reminder.user_manager
+    Gauge('mediremind_users', 'Registered users',
+          function=lambda: user_manager.counts()['users'])
+    Gauge('mediremind_stored_reminders', 'Reminders saved in the user store',
+          function=lambda: user_manager.counts()['reminders'])
+    Gauge('mediremind_user_writes_pending', 'Changed users waiting for the next batched write',
+          function=lambda: len(user_manager.writes))
+    Gauge('mediremind_startup_seconds', 'Time from the start of the import to serving',
+          function=lambda: startup.ready_after or 0)
+    if reminder.prices is not None:
+        Gauge('mediremind_price_medicines', 'Medicines in the live price index',
+              function=lambda: len(reminder.prices.index))
+        Gauge('mediremind_price_generation', 'Price index reloads and deltas applied since startup',
+              function=lambda: reminder.prices.generation)
+    if reminder.scheduler is None:
+        return
+    Gauge('mediremind_scheduled_reminders', 'Reminder jobs in the scheduler',
+          function=lambda: len(reminder.scheduler))
+    notifications = reminder.notifications
+    Gauge('mediremind_notification_queue_depth', 'Notifications waiting to be delivered', ['channel'],
+          function=lambda: [((name, ), channel['queue_depth'])
+                            for name, channel in notifications.metrics().items()])
+    Counter('mediremind_notifications', 'Notifications by channel and outcome', ['channel', 'outcome'],
+            function=lambda: [((name, outcome), channel[outcome])
+                              for name, channel in notifications.metrics().items()
+                              for outcome in NOTIFICATION_OUTCOMES])
+    if reminder.voice is not None:
+        cache = reminder.voice.cache
+        Counter('mediremind_voice_cache_lookups', 'Voice audio cache lookups by result', ['result'],
+                function=lambda: [(('hit', ), cache.hits), (('miss', ), cache.misses)])
+        Gauge('mediremind_voice_cache_entries', 'Audio files in the voice cache',
+              function=lambda: len(cache))
+
+@app.before_request
+def start_request_timer():
+    startup.request_started()
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # The route pattern, not the path, keeps the label set small
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.labels(request.method, route, response.status_code).observe(
+            time.perf_counter() - started
+        )
+    return response
+
+# Imported by a WSGI server, start in the configured role. Run as a script,
+# main() starts the services once it knows the role. Prescription analysis
+# workers are spawned processes that re-import this module; they start nothing.
+if __name__ != '__main__' and multiprocessing.parent_process() is None:
+    start(app.config['ROLE'])
 
 @app.route('/')
 def landing():
@@ -493,7 +757,8 @@ def dashboard():
         medications_count=len(user.medications),
         streak_days=user.streak_days,
         upcoming_reminders=upcoming_reminders,
-        recent_price_checks=user.price_checks
+        recent_price_checks=user.price_checks.recent(),
+        price_check_summary=user.price_checks.by_medicine()
     )
 
 @app.route('/reminders')
@@ -635,20 +900,29 @@ def api_update_profile():
     name = data.get('name')
     email = data.get('email')
     email_notifications = data.get('email_notifications')
+    digest_reminders = data.get('digest_reminders')
     
-    if not name and not email and email_notifications is None:
+    if not name and not email and email_notifications is None and digest_reminders is None:
         return jsonify({
             "status": "error",
             "message": "No fields to update"
         }), 400
     
     # Update the user
-    success = reminder.user_manager.update_user(
-        session['user_id'],
-        name=name,
-        email=email,
-        email_notifications=email_notifications
-    )
+    try:
+        success = reminder.user_manager.update_user(
+            session['user_id'],
+            name=name,
+            email=email,
+            email_notifications=email_notifications,
+            digest_reminders=digest_reminders
+        )
+    except EmailAlreadyRegistered:
+        # Checked by the store itself, so that two users racing for one address cannot both get it
+        return jsonify({
+            "status": "error",
+            "message": "Email already registered"
+        }), 409
     
     if not success:
         return jsonify({
@@ -665,7 +939,8 @@ def api_update_profile():
             "user_id": user.user_id,
             "name": user.name,
             "email": user.email,
-            "email_notifications": user.email_notifications
+            "email_notifications": user.email_notifications,
+            "digest_reminders": user.digest_reminders
         }
     })
 
@@ -771,6 +1046,130 @@ def api_compare_prices():
     result = reminder.compare_prices(medicine_name)
     return jsonify(result)
 
+def medicine_names_from(data):
+    """Validated, de-duplicated medicine_names list from a request body, or an error message."""
+    medicine_names = data.get('medicine_names')
+    if not medicine_names or not isinstance(medicine_names, list) \
+            or not all(isinstance(name, str) and name for name in medicine_names):
+        return None, "medicine_names must be a non-empty list of medicine names"
+    if len(medicine_names) > app.config['COMPARE_BATCH_LIMIT']:
+        return None, f"At most {app.config['COMPARE_BATCH_LIMIT']} medicines can be compared at once"
+    return list(dict.fromkeys(medicine_names)), None
+
+@app.route('/compare_prices/batch', methods=['POST'])
+@login_required
+def api_compare_prices_batch():
+    """API endpoint to compare prices of several medicines in one request."""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({
+            "status": "error",
+            "message": "No data provided"
+        }), 400
+    
+    medicine_names, error = medicine_names_from(data)
+    if error:
+        return jsonify({
+            "status": "error",
+            "message": error
+        }), 400
+    
+    # Record all the price checks with a single save
+    reminder.record_price_checks(session['user_id'], medicine_names)
+    
+    result = reminder.compare_prices_batch(medicine_names)
+    return jsonify(result)
+
+@app.route('/compare_prices/basket', methods=['POST'])
+@login_required
+def api_optimize_basket():
+    """API endpoint to find where to buy several medicines most cheaply."""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({
+            "status": "error",
+            "message": "No data provided"
+        }), 400
+    
+    medicine_names, error = medicine_names_from(data)
+    if error:
+        return jsonify({
+            "status": "error",
+            "message": error
+        }), 400
+    
+    max_pharmacies = data.get('max_pharmacies', 1)
+    if not isinstance(max_pharmacies, int) or isinstance(max_pharmacies, bool) \
+            or not 1 <= max_pharmacies <= app.config['BASKET_MAX_PHARMACIES']:
+        return jsonify({
+            "status": "error",
+            "message": f"max_pharmacies must be between 1 and {app.config['BASKET_MAX_PHARMACIES']}"
+        }), 400
+    
+    result = reminder.optimize_basket(medicine_names, max_pharmacies)
+    return jsonify(result)
+
+@app.route('/search_medicines', methods=['GET'])
+@login_required
+def api_search_medicines():
+    """API endpoint suggesting medicine names by prefix, tolerating typos."""
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', app.config['SEARCH_SUGGESTIONS'], type=int)
+    
+    if not query.strip():
+        return jsonify({
+            "status": "error",
+            "message": "Missing required parameter: q"
+        }), 400
+    
+    limit = max(1, min(limit, 50))
+    with PRICE_LOOKUP_SECONDS.labels('search').time():
+        suggestions = reminder.price_index.search_index().search(query, limit)
+    return jsonify({
+        "status": "success",
+        "data": {
+            "query": query,
+            "suggestions": suggestions
+        }
+    })
+
+@app.route('/api/prices/status', methods=['GET'])
+@login_required
+def api_prices_status():
+    """API endpoint reporting the loaded price database and its last reload."""
+    return jsonify({
+        "status": "success",
+        "data": {
+            **reminder.prices.status(),
+            "popular_medicines": reminder.popular_medicines(10)
+        }
+    })
+
+@app.route('/api/notifications/status', methods=['GET'])
+@login_required
+def api_notifications_status():
+    """API endpoint reporting notification queues and the voice audio cache."""
+    if reminder.scheduler is None:
+        return jsonify({
+            "status": "error",
+            "message": "Notifications are sent by the scheduler process"
+        }), 404
+    
+    return jsonify({
+        "status": "success",
+        "data": {
+            "channels": reminder.notifications.metrics(),
+            "voice": reminder.voice.metrics() if reminder.voice is not None else None
+        }
+    })
+
+@app.route('/metrics', methods=['GET'])
+def api_metrics():
+    """Metrics of this process in the Prometheus text format."""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
 @app.route('/list_reminders', methods=['GET'])
 @login_required
 def api_list_reminders():
@@ -778,6 +1177,18 @@ def api_list_reminders():
     result = reminder.list_reminders(session['user_id'])
     return jsonify(result)
 
+def keep_prescription(file, filename):
+    """Save an upload under PRESCRIPTION_AUDIT_DIR; returns its path, or None if not kept."""
+    audit_dir = app.config['PRESCRIPTION_AUDIT_DIR']
+    if not audit_dir:
+        return None
+    os.makedirs(audit_dir, exist_ok=True)
+    # Prefixed so that two uploads with the same filename never collide
+    file_path = os.path.join(audit_dir, f"{uuid.uuid4().hex}_{filename}")
+    file.stream.seek(0)
+    file.save(file_path)
+    return file_path
+
 @app.route('/analyze_prescription', methods=['POST'])
 @login_required
 def api_analyze_prescription():
@@ -797,66 +1208,51 @@ def api_analyze_prescription():
         }), 400
     
     if file:
-        # Save the uploaded file
+        # The upload is analyzed from its in-memory (or spooled) stream and
+        # only written out when prescriptions are kept for audit
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        user_id = session['user_id']
         
         try:
-            # Placeholder for actual OCR/prescription analysis
-            # In a real implementation, this would use OCR and ML to detect medicines
-            # Instead, we'll simulate medicine detection for demo purposes
-            
-            # Basic pattern matching for medicine names in the image name
-            # This is just a placeholder - real implementation would use actual image processing
-            medicine_names = []
-            
-            # First check if any of our known medicines appear in the filename
-            for medicine in reminder.medicine_prices.keys():
-                # Case insensitive search for medicine name in filename
-                if re.search(rf'\b{re.escape(medicine)}\b', filename, re.IGNORECASE):
-                    medicine_names.append(medicine)
+            image_path = keep_prescription(file, filename)
             
-            # If no matches in filename, add some common medicines for demonstration
-            if not medicine_names and reminder.medicine_prices:
-                # Take up to 3 random medicines from our database
-                import random
-                available_medicines = list(reminder.medicine_prices.keys())
-                sample_size = min(3, len(available_medicines))
-                medicine_names = random.sample(available_medicines, sample_size)
-            
-            # Process detected medicines
-            medicines_data = []
-            for medicine in medicine_names:
-                if medicine in reminder.medicine_prices:
-                    prices = reminder.medicine_prices[medicine]
-                    # Find best price
-                    best_price = float('inf')
-                    best_pharmacy = ""
-                    
-                    for pharmacy, price in prices.items():
-                        if price < best_price:
-                            best_price = price
-                            best_pharmacy = pharmacy
-                    
-                    medicines_data.append({
-                        "name": medicine,
-                        "prices": prices,
-                        "best_price": best_price,
-                        "best_pharmacy": best_pharmacy
-                    })
-            
-            # Record the price check for each medicine
-            user_id = session['user_id']
-            for medicine in medicine_names:
-                reminder.record_price_check(user_id, medicine)
+            # With async=1 the analysis runs in a worker process; poll the job for the result
+            if request.values.get('async', '').lower() in ('1', 'true', 'yes'):
+                # The worker process reads the upload from a file: the kept
+                # copy, or a temporary one the job removes when done with it
+                job_path = image_path
+                if job_path is None:
+                    fd, job_path = mkstemp(prefix='prescription-')
+                    os.close(fd)
+                    file.stream.seek(0)
+                    file.save(job_path)
+                job = prescription_jobs.submit(user_id, filename, job_path,
+                                               remove_image=image_path is None)
+                if job is None:
+                    return jsonify({
+                        "status": "error",
+                        "message": "Too many prescriptions are already being analyzed; try again shortly"
+                    }), 429
+                return jsonify({
+                    "status": "success",
+                    "message": "Prescription queued for analysis",
+                    "data": {
+                        "job_id": job.job_id,
+                        "status_url": url_for('api_prescription_job', job_id=job.job_id),
+                        "image_path": image_path
+                    }
+                }), 202
             
+            file.stream.seek(0)
+            medicines_data = reminder.analyze_prescription(
+                user_id, extract_prescription_text(filename, file.stream)
+            )
             return jsonify({
                 "status": "success",
                 "message": f"Found {len(medicines_data)} medicines in prescription",
                 "data": {
                     "medicines": medicines_data,
-                    "image_path": file_path
+                    "image_path": image_path
                 }
             })
             
@@ -866,17 +1262,89 @@ def api_analyze_prescription():
                 "message": f"Error analyzing prescription: {str(e)}"
             }), 500
         finally:
-            # In a production app, you might want to keep the file for audit or cleanup later
-            # For this demo, we'll delete it immediately to save space
-            try:
-                os.remove(file_path)
-            except:
-                pass
+            # Frees the upload buffer, and removes the temp file if it spilled to disk
+            file.close()
     
     return jsonify({
         "status": "error",
         "message": "Invalid file format"
     }), 400
 
+@app.route('/analyze_prescription/<job_id>', methods=['GET'])
+@login_required
+def api_prescription_job(job_id):
+    """API endpoint to check on a queued prescription analysis."""
+    job = prescription_jobs.get(job_id, session['user_id'])
+    if job is None:
+        return jsonify({
+            "status": "error",
+            "message": "Unknown or expired analysis job"
+        }), 404
+    
+    return jsonify({
+        "status": "success",
+        "data": job.to_dict()
+    })
+
+def serve_web(host: str, port: int, workers: int) -> None:
+    """Serve the app from ``workers`` gunicorn processes in the web role."""
+    # Inherited by the workers, which import this module and start in this role
+    os.environ['MEDIREMIND_ROLE'] = 'web'
+    os.environ['MEDIREMIND_WEB_WORKERS'] = str(workers)
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        log.warning("gunicorn is not installed; serving from this process only")
+        start('web')
+        app.run(host=host, port=port, threaded=True)
+        return
+
+    class WebApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"{host}:{port}")
+            self.cfg.set('workers', workers)
+
+        def load(self):
+            # Imported in each worker after the fork, so each starts its own services
+            from app import app as wsgi_app
+            return wsgi_app
+
+    WebApplication().run()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run MediRemind.")
+    subparsers = parser.add_subparsers(dest='command')
+    dev = subparsers.add_parser('dev', help="Development server running every role (the default)")
+    web = subparsers.add_parser('web', help="Serve requests from several worker processes")
+    for subparser in (dev, web):
+        subparser.add_argument('--host', default='0.0.0.0')
+        subparser.add_argument('--port', type=int, default=5000)
+    web.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    scheduler = subparsers.add_parser('scheduler', help="Fire reminders saved by the web processes")
+    scheduler.add_argument('--metrics-port', type=int, default=app.config['SCHEDULER_METRICS_PORT'],
+                           help="Port serving /metrics (0 to disable)")
+    args = parser.parse_args()
+
+    if args.command == 'web':
+        serve_web(args.host, args.port, args.workers)
+    elif args.command == 'scheduler':
+        start('scheduler')
+        if args.metrics_port:
+            try:
+                start_metrics_server(args.metrics_port)
+                log.info("Serving metrics on port %d", args.metrics_port)
+            except OSError as e:
+                # Reminders matter more than their metrics
+                log.error("Could not serve metrics on port %d: %s", args.metrics_port, e)
+        reminder.follow_reminders()
+    else:
+        host = getattr(args, 'host', '0.0.0.0')
+        port = getattr(args, 'port', 5000)
+        # The debug reloader re-runs this script in a child process that
+        # serves the requests; only that one starts the services
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            start('all')
+        app.run(debug=True, host=host, port=port)
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
+    main() 
\ No newline at end of file
@@ -0,0 +1,188 @@
+from typing import Dict, List, Optional, Sequence
+
+from prices import PriceIndex
+
+# Price entries the exact solver may examine before settling for the greedy plan
+EXACT_EVAL_LIMIT = 200_000
+
+
+class _SearchBudgetExceeded(Exception):
+    pass
+
+
+class BasketOptimizer:
+    """Cheapest way to buy a basket of medicines from at most ``k`` pharmacies.
+
+    The basket is a cost matrix with one row per medicine and one column
+    per pharmacy. Rows are the index's own price arrays, which are sorted
+    cheapest first, so the pharmacies that would beat the current plan for
+    a medicine are always a prefix of its row: computing what every
+    pharmacy would save only walks those prefixes, never the whole matrix.
+
+    A medicine a pharmacy does not stock costs ``penalty``, which exceeds
+    any real basket total. Plans that leave something unbought therefore
+    always lose to plans that buy everything, and when no ``k`` pharmacies
+    stock the whole basket the best plan buys as much of it as possible.
+    """
+
+    def __init__(self, index: PriceIndex, medicine_names: Sequence[str]):
+        self.index = index
+        self.medicines: List[str] = []
+        self.unavailable: List[str] = []
+        entries = []
+        for name in dict.fromkeys(medicine_names):
+            entry = index.get(name)
+            if entry:
+                self.medicines.append(name)
+                entries.append(entry)
+            else:
+                self.unavailable.append(name)
+
+        self.penalty = sum(entry.max_price for entry in entries) + 1.0
+        self.rows = [(entry.pharmacy_ids, entry.prices) for entry in entries]
+        self.row_prices = [dict(zip(entry.pharmacy_ids, entry.prices)) for entry in entries]
+        self._evaluated = 0
+        self._eval_limit: Optional[int] = None
+
+    def _savings(self, current: List[float], after: int = -1) -> Dict[int, float]:
+        """How much adding each pharmacy (with ID above ``after``) would cut ``current``."""
+        savings: Dict[int, float] = {}
+        examined = 0
+        for (pharmacy_ids, prices), cost in zip(self.rows, current):
+            for pharmacy_id, price in zip(pharmacy_ids, prices):
+                if price >= cost:
+                    break
+                examined += 1
+                if pharmacy_id > after:
+                    savings[pharmacy_id] = savings.get(pharmacy_id, 0.0) + cost - price
+        self._evaluated += examined
+        if self._eval_limit is not None and self._evaluated > self._eval_limit:
+            raise _SearchBudgetExceeded
+        return savings
+
+    def _extend(self, current: List[float], pharmacy_id: int) -> List[float]:
+        penalty = self.penalty
+        return [
+            min(cost, prices.get(pharmacy_id, penalty))
+            for cost, prices in zip(current, self.row_prices)
+        ]
+
+    def _costs(self, chosen: List[int]) -> List[float]:
+        current = [self.penalty] * len(self.rows)
+        for pharmacy_id in chosen:
+            current = self._extend(current, pharmacy_id)
+        return current
+
+    def _greedy(self, k: int) -> List[int]:
+        """Repeatedly add the pharmacy that lowers the basket cost the most.
+
+        The picks are then revisited: each is swapped for the best pharmacy
+        given all the others, until no swap helps.
+        """
+        current = [self.penalty] * len(self.rows)
+        chosen: List[int] = []
+        for _ in range(k):
+            savings = self._savings(current)
+            if not savings:
+                break
+            pharmacy_id = max(savings, key=savings.__getitem__)
+            chosen.append(pharmacy_id)
+            current = self._extend(current, pharmacy_id)
+
+        improved = len(chosen) > 1
+        while improved:
+            improved = False
+            for i, pharmacy_id in enumerate(chosen):
+                others = chosen[:i] + chosen[i + 1:]
+                savings = self._savings(self._costs(others))
+                replacement = max(savings, key=savings.__getitem__, default=pharmacy_id)
+                if savings.get(replacement, 0.0) > savings.get(pharmacy_id, 0.0) + 1e-9:
+                    chosen[i] = replacement
+                    improved = True
+        return chosen
+
+    def _exact(self, k: int, incumbent: List[int]) -> List[int]:
+        """Branch and bound over pharmacy sets in ID order, seeded with ``incumbent``.
+
+        Adding pharmacies never saves more than the sum of what each would
+        save alone, so a branch is skipped when its own saving plus the best
+        remaining saving for each further free slot cannot beat the best
+        plan found so far.
+        """
+        best = [sum(self._costs(incumbent)), list(incumbent)]
+
+        def search(after: int, current: List[float], total: float, chosen: List[int]) -> None:
+            candidates = sorted(self._savings(current, after).items())
+            # best_after[i]: largest saving among the candidates after the i-th
+            best_after = [0.0] * len(candidates)
+            for i in range(len(candidates) - 1, 0, -1):
+                best_after[i - 1] = max(best_after[i], candidates[i][1])
+            slots_left = k - len(chosen) - 1
+            for (pharmacy_id, saving), bound in zip(candidates, best_after):
+                if total - saving - slots_left * bound >= best[0]:
+                    continue
+                chosen.append(pharmacy_id)
+                if total - saving < best[0]:
+                    best[0], best[1] = total - saving, list(chosen)
+                if slots_left:
+                    search(pharmacy_id, self._extend(current, pharmacy_id), total - saving, chosen)
+                chosen.pop()
+
+        empty = [self.penalty] * len(self.rows)
+        search(-1, empty, sum(empty), [])
+        return best[1]
+
+    def optimize(self, k: int = 1, eval_limit: int = EXACT_EVAL_LIMIT) -> Dict:
+        """Plan the basket over at most ``k`` pharmacies.
+
+        Solved exactly when the search examines at most ``eval_limit``
+        price entries, otherwise the greedy plan is returned; ``method``
+        says which. With one pharmacy the greedy pick is already optimal.
+        """
+        chosen = self._greedy(k)
+        method = 'exact'
+        if k > 1:
+            self._evaluated, self._eval_limit = 0, eval_limit
+            try:
+                chosen = self._exact(k, chosen)
+            except _SearchBudgetExceeded:
+                method = 'greedy'
+            finally:
+                self._eval_limit = None
+        return self._plan(chosen, method)
+
+    def _plan(self, chosen: List[int], method: str) -> Dict:
+        pharmacies = self.index.pharmacies
+        baskets: Dict[int, List[Dict]] = {pharmacy_id: [] for pharmacy_id in chosen}
+        not_stocked = []
+        for medicine, prices in zip(self.medicines, self.row_prices):
+            price, pharmacy_id = min(
+                ((prices.get(pharmacy_id, self.penalty), pharmacy_id) for pharmacy_id in chosen),
+                default=(self.penalty, None)
+            )
+            if price >= self.penalty:
+                not_stocked.append(medicine)
+            else:
+                baskets[pharmacy_id].append({"medicine": medicine, "price": price})
+
+        stops = [
+            {
+                "pharmacy": pharmacies[pharmacy_id],
+                "medicines": items,
+                "subtotal": round(sum(item["price"] for item in items), 2)
+            }
+            for pharmacy_id, items in baskets.items() if items
+        ]
+        return {
+            "pharmacies": stops,
+            "total": round(sum(stop["subtotal"] for stop in stops), 2),
+            "method": method,
+            "not_stocked": not_stocked,
+            "unavailable": self.unavailable
+        }
+
+
+def optimize_basket(index: PriceIndex, medicine_names: Sequence[str], k: int = 1,
+                    eval_limit: int = EXACT_EVAL_LIMIT) -> Dict:
+    """Cheapest plan for buying ``medicine_names`` from at most ``k`` pharmacies."""
+    return BasketOptimizer(index, medicine_names).optimize(k, eval_limit)
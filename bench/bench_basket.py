@@ -0,0 +1,48 @@
+"""Cheapest-basket latency: 20-medicine baskets over 10k pharmacies.
+
+Two catalogs: a dense one where each of 200 medicines is stocked by 3,000
+pharmacies, and the sparse 1M-row catalog of the price benchmarks, where
+each of 50k medicines is stocked by 20. Times the full optimize_basket()
+call, cost matrix included, and counts how often the exact solver
+finished within its budget.
+
+    python bench/bench_basket.py
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from basket import optimize_basket
+from catalog import price_table
+from prices import PriceIndex
+
+BASKET_SIZE = 20
+BASKETS = 10
+
+
+def main():
+    rng = random.Random(7)
+    catalogs = (
+        ('dense, 3k/medicine', PriceIndex(price_table(200, per_medicine=3_000))),
+        ('sparse, 20/medicine', PriceIndex(price_table(50_000))),
+    )
+    for label, index in catalogs:
+        names = list(index.names())
+        for k in (1, 2, 3, 5):
+            times, exact = [], 0
+            for _ in range(BASKETS):
+                basket = rng.sample(names, BASKET_SIZE)
+                start = time.perf_counter()
+                plan = optimize_basket(index, basket, k)
+                times.append(time.perf_counter() - start)
+                exact += plan['method'] == 'exact'
+            print(f"{label:<20} k={k}  median {statistics.median(times) * 1000:>7,.1f} ms  "
+                  f"max {max(times) * 1000:>7,.1f} ms  exact {exact}/{BASKETS}")
+
+
+if __name__ == '__main__':
+    main()
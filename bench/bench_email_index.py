@@ -0,0 +1,44 @@
+"""Email lookup: UserManager's case-folded index against the old linear scan.
+
+    python bench/bench_email_index.py
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from users import User, UserManager
+
+
+def linear_scan(users, email):
+    # What get_user_by_email did before the index
+    for user in users.values():
+        if user.email.lower() == email.lower():
+            return user
+    return None
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (1000, 100_000):
+            manager = UserManager(os.path.join(tmp, f'users_{size}.json'))
+            for i in range(size):
+                user = User(f'User {i}', f'User{i}@Example.com', 'hash')
+                manager.users[user.user_id] = user
+                manager._index_email(user)
+            # The last user is the linear scan's worst case
+            email = f'user{size - 1}@example.com'
+            assert manager.get_user_by_email(email) is linear_scan(manager.users, email)
+
+            indexed = min(timeit.repeat(lambda: manager.get_user_by_email(email),
+                                        number=10_000, repeat=3)) / 10_000
+            scanned = min(timeit.repeat(lambda: linear_scan(manager.users, email),
+                                        number=20, repeat=3)) / 20
+            print(f"{size:>7} users: indexed {indexed * 1e6:.2f} us, "
+                  f"linear scan {scanned * 1e6:,.0f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Reminder email rendering: MIMEMultipart per message against ReminderEmailTemplate.
+
+    python bench/bench_email_render.py
+"""
+import datetime
+import os
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_templates import MEDICINE_HTML, REMINDER_HTML, ReminderEmailTemplate
+
+MESSAGES = 20_000
+SENDER = 'mediremind@example.com'
+
+
+def mime_message(to, user_name, medicine_name):
+    # What send_reminder_email did before the template
+    msg = MIMEMultipart()
+    msg['Subject'] = f"MediRemind: Time to take {medicine_name}"
+    msg['From'] = SENDER
+    msg['To'] = to
+    html = (REMINDER_HTML
+            .replace('$user_name', user_name)
+            .replace('$medicines', MEDICINE_HTML.format(medicine_name))
+            .replace('$current_time', datetime.datetime.now().strftime('%I:%M %p')))
+    msg.attach(MIMEText(html, 'html'))
+    return msg.as_bytes()
+
+
+def main():
+    template = ReminderEmailTemplate(SENDER)
+    recipients = [(f'user{i}@example.com', f'User {i}', ['Aspirin']) for i in range(MESSAGES)]
+    runs = (
+        ('MIMEMultipart', lambda: [mime_message(to, name, medicines[0])
+                                   for to, name, medicines in recipients]),
+        ('render()', lambda: [template.render(to, name, medicines)
+                              for to, name, medicines in recipients]),
+        ('render_many()', lambda: list(template.render_many(recipients))),
+    )
+    for name, run in runs:
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<14} {MESSAGES / elapsed:>9,.0f} msg/s")
+
+
+if __name__ == '__main__':
+    main()
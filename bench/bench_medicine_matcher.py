@@ -0,0 +1,67 @@
+"""Finding catalog medicines in prescription text: one regex per name against MedicineMatcher.
+
+Uses a 50k-name catalog, a filename (what the upload handler scans today)
+and a 3kB OCR-sized text naming a few medicines.
+
+    python bench/bench_medicine_matcher.py
+"""
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import medicine_names
+from medicine_matcher import MedicineMatcher
+
+REGEX_RUNS = 3
+MATCHER_RUNS = 200
+
+
+def regex_loop(names, text):
+    # What api_analyze_prescription did before the matcher
+    return [name for name in names if re.search(rf'\b{re.escape(name)}\b', text, re.IGNORECASE)]
+
+
+def ocr_text(names, rng, size=3_000):
+    words = 'take one tablet twice daily after food for five days review in two weeks Dr. Rx'.split()
+    parts = []
+    while sum(map(len, parts)) < size:
+        parts.append(rng.choice(names).upper() if rng.random() < 0.05 else rng.choice(words))
+    return ' '.join(parts)
+
+
+def timed(find, text, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        find(text)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    rng = random.Random(5)
+    names = medicine_names(50_000)
+
+    start = time.perf_counter()
+    matcher = MedicineMatcher(names)
+    print(f"{'matcher build':<24} {(time.perf_counter() - start) * 1000:>10,.1f} ms")
+
+    texts = (
+        ('filename', f"{names[42].lower()} - scan.jpg"),
+        ('3kB OCR text', ocr_text(names, rng)),
+    )
+    for label, text in texts:
+        expected = regex_loop(names, text)
+        assert matcher.find(text) == expected, label
+        print(f"{label + ', regex loop':<24} {timed(lambda t: regex_loop(names, t), text, REGEX_RUNS):>10,.1f} ms"
+              f"   ({len(expected)} found)")
+        print(f"{label + ', matcher':<24} {timed(matcher.find, text, MATCHER_RUNS):>10,.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
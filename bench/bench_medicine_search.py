@@ -0,0 +1,99 @@
+"""Typo-tolerant medicine search over 50k realistic catalog names.
+
+Queries are catalog names and name fragments with a typo in them, the way
+users type them into the search box. Compares fuzzy() with counting every
+posting list of every query trigram, which is what it did before.
+
+    python bench/bench_medicine_search.py
+"""
+import heapq
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import medicine_names
+from medicine_search import MIN_SIMILARITY, MedicineSearchIndex, trigrams
+
+QUERIES = 2_000
+
+
+class ScanEveryList:
+    def __init__(self, names):
+        self.names = names
+        self.postings = defaultdict(list)
+        self.gram_counts = []
+        for name_id, name in enumerate(names):
+            grams = set(trigrams(name.casefold()))
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.postings[gram].append(name_id)
+
+    def fuzzy(self, query, limit=10):
+        grams = set(trigrams(query.casefold()))
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        best = heapq.nlargest(limit, (
+            (2 * common / (len(grams) + self.gram_counts[name_id]), name_id)
+            for name_id, common in shared.items()
+        ))
+        return [self.names[name_id] for score, name_id in best if score >= MIN_SIMILARITY]
+
+
+def timed(fuzzy, queries):
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        fuzzy(query)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return (f"mean {statistics.mean(times) * 1000:.2f} ms, "
+            f"p50 {times[len(times) // 2] * 1000:.2f} ms, "
+            f"p99 {times[len(times) * 99 // 100] * 1000:.2f} ms")
+
+
+def typo(text, rng):
+    position = rng.randrange(len(text))
+    kind = rng.randrange(3)
+    if kind == 0:  # dropped letter
+        return text[:position] + text[position + 1:]
+    if kind == 1 and position < len(text) - 1:  # swapped letters
+        return text[:position] + text[position + 1] + text[position] + text[position + 2:]
+    return text[:position] + rng.choice('abcdefghijklmnopqrstuvwxyz') + text[position + 1:]
+
+
+def queries(names, rng):
+    result = []
+    for _ in range(QUERIES):
+        words = rng.choice(names).split()
+        shape = rng.randrange(3)
+        if shape == 0:  # full name
+            text = ' '.join(words)
+        elif shape == 1:  # drug and strength
+            text = ' '.join(words[1:3])
+        else:  # drug only
+            text = words[1]
+        result.append(typo(text.lower(), rng))
+    return result
+
+
+def main():
+    names = medicine_names(50_000)
+    start = time.perf_counter()
+    index = MedicineSearchIndex(names)
+    print(f"Index build: {(time.perf_counter() - start) * 1000:,.0f} ms for {len(names):,} names")
+    scan = ScanEveryList(names)
+    search_queries = queries(names, random.Random(3))
+    assert all(index.fuzzy(query) == scan.fuzzy(query) for query in search_queries[:200])
+
+    print(f"{'every posting list':<20} {timed(scan.fuzzy, search_queries)}")
+    print(f"{'fuzzy()':<20} {timed(index.fuzzy, search_queries)}")
+
+
+if __name__ == '__main__':
+    main()
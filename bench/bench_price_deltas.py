@@ -0,0 +1,60 @@
+"""Applying price deltas to a live index against rebuilding it from the CSV.
+
+Uses a 1M-row catalog: 50k medicines, each stocked by 20 of 10k pharmacies.
+
+    python bench/bench_price_deltas.py
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import price_table, write_price_csv
+from prices import DELETE, UPSERT, PriceIndex, read_price_csv
+
+
+def main():
+    rng = random.Random(11)
+    table = price_table(50_000)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'medicine_prices.csv')
+        rows = write_price_csv(csv_path, table)
+        print(f"Catalog: {rows:,} rows, {len(table):,} medicines")
+
+        start = time.perf_counter()
+        PriceIndex(read_price_csv(csv_path)).prepare()
+        print(f"{'full rebuild from CSV':<32} {(time.perf_counter() - start) * 1000:>9,.1f} ms")
+
+    index = PriceIndex(table).prepare()
+    names = list(index.names())
+    deltas = (
+        ('1 price changed', lambda i: [(UPSERT, names[i], 'Pharmacy 1', 9.99)]),
+        ('1 new medicine', lambda i: [(UPSERT, f'Zenith Newdrug{i} 10mg Tablets', 'Pharmacy 1', 9.99)]),
+        ('1 medicine removed', lambda i: [(DELETE, names[100 + i], pharmacy, None)
+                                          for pharmacy in table[names[100 + i]]]),
+        ('10k rows, 10 new medicines', lambda i: [
+            (UPSERT, rng.choice(names), f'Pharmacy {rng.randrange(10_000)}', round(rng.uniform(1, 100), 2))
+            for _ in range(9_990)
+        ] + [(UPSERT, f'Brand New {i}-{n} 5mg Syrup', 'Pharmacy 2', 3.0) for n in range(10)]),
+    )
+    for name, make_delta in deltas:
+        times = []
+        for i in range(5):
+            changes = make_delta(i)
+            start = time.perf_counter()
+            # As PriceCatalog applies a delta file; the matcher is built afterwards
+            index = index.apply_delta(changes).prepare(matcher=False)
+            times.append(time.perf_counter() - start)
+        print(f"{'delta: ' + name:<32} {statistics.median(times) * 1000:>9,.1f} ms")
+
+    start = time.perf_counter()
+    index.matcher()
+    print(f"{'matcher rebuild (background)':<32} {(time.perf_counter() - start) * 1000:>9,.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
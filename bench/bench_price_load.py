@@ -0,0 +1,63 @@
+"""Loading a 1M-row price CSV: the streaming csv reader against pandas.
+
+The catalog is the one the price benchmarks share: 50k medicines, each
+stocked by 20 of 10k pharmacies. The baseline is what the app did before
+read_price_csv: pd.read_csv() and then iterrows() over every row. It only
+runs if pandas is installed, which the app no longer requires.
+
+    python bench/bench_price_load.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import price_table, write_price_csv
+from prices import read_price_csv
+
+
+def pandas_iterrows(csv_path):
+    # What MedicineReminder.load_medicine_prices did before read_price_csv
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    prices_dict = {}
+    for _, row in df.iterrows():
+        medicine = row['Medicine Name']
+        pharmacy = row['Pharmacy Name']
+        price = float(row['Price'])
+
+        if medicine not in prices_dict:
+            prices_dict[medicine] = {}
+        prices_dict[medicine][pharmacy] = price
+    return prices_dict
+
+
+def timed(load, csv_path):
+    start = time.perf_counter()
+    prices = load(csv_path)
+    return prices, time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'medicine_prices.csv')
+        rows = write_price_csv(csv_path, price_table(50_000))
+        print(f"Catalog: {rows:,} rows")
+
+        prices, streamed = timed(read_price_csv, csv_path)
+        print(f"{'csv reader':<20} {streamed:>8,.2f} s")
+        try:
+            import pandas  # noqa: F401
+        except ImportError:
+            print("pandas is not installed; skipping the read_csv + iterrows baseline")
+            return
+        baseline_prices, baseline = timed(pandas_iterrows, csv_path)
+        assert baseline_prices == prices
+        print(f"{'read_csv + iterrows':<20} {baseline:>8,.2f} s   ({baseline / streamed:.0f}x slower)")
+
+
+if __name__ == '__main__':
+    main()
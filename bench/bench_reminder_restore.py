@@ -0,0 +1,83 @@
+"""Restoring 100k stored reminders (4 each for 25k users) into the scheduler at startup.
+
+Times the restore as MedicineReminder.restore_reminders does it, reading
+the reminders from the store and registering them with one
+schedule_many() call. The JSON and SQLite stores are both timed. The
+baseline registers the same reminders one schedule_daily() call at a time.
+
+    python bench/bench_reminder_restore.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reminder_scheduler import ReminderScheduler
+from sqlite_users import SQLiteUserManager
+from user_store import JournalStore
+from users import User, UserManager
+
+USERS = 25_000
+REMINDERS_PER_USER = 4
+
+
+def alert_reminder(user_id, medicine_name):
+    pass
+
+
+def users_data(rng):
+    data = {}
+    for i in range(USERS):
+        user = User(f'User {i}', f'user{i}@example.com', 'hash')
+        for n in range(REMINDERS_PER_USER):
+            user.reminders[f'Medicine {n}'] = f"{rng.randrange(24):02d}:{rng.randrange(60):02d}"
+        data[user.user_id] = user.to_dict()
+    return data
+
+
+def restore(user_manager):
+    # As MedicineReminder.restore_reminders does
+    scheduler = ReminderScheduler()
+    jobs = (
+        (f"{user_id}_{medicine_name}", time_24hour, alert_reminder, (user_id, medicine_name))
+        for user_id, medicine_name, time_24hour in user_manager.iter_reminders()
+    )
+    return scheduler.schedule_many(jobs)
+
+
+def one_at_a_time(user_manager):
+    scheduler = ReminderScheduler()
+    for user_id, medicine_name, time_24hour in user_manager.iter_reminders():
+        scheduler.schedule_daily(f"{user_id}_{medicine_name}", time_24hour, alert_reminder,
+                                 user_id, medicine_name)
+    return len(scheduler)
+
+
+def timed(label, restore, user_manager):
+    start = time.perf_counter()
+    count = restore(user_manager)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {count:>7,} reminders in {elapsed * 1000:>8,.1f} ms")
+
+
+def main():
+    data = users_data(random.Random(5))
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'users.json')
+        JournalStore(json_path, snapshot_source=lambda: data).compact()
+        SQLiteUserManager(os.path.join(tmp, 'users.db'), write_behind=False).import_users(data)
+
+        stores = (
+            ('json', UserManager(json_path, flush_interval=3600)),
+            ('sqlite', SQLiteUserManager(os.path.join(tmp, 'users.db'), write_behind=False)),
+        )
+        for label, user_manager in stores:
+            timed(f"{label}, schedule_many", restore, user_manager)
+            timed(f"{label}, schedule_daily one at a time", one_at_a_time, user_manager)
+
+
+if __name__ == '__main__':
+    main()
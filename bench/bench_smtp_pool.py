@@ -0,0 +1,63 @@
+"""Reminder email throughput: a connection per message against SMTPConnectionPool.
+
+Runs against the plain-text fake SMTP server from the tests, so it
+measures session setup and protocol round trips; a real server also
+charges a TLS handshake for every new connection.
+
+    python bench/bench_smtp_pool.py
+"""
+import os
+import smtplib
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_templates import ReminderEmailTemplate
+from smtp_pool import SMTPConnectionPool
+from tests.fake_smtp import FakeSMTPServer
+
+MESSAGES = 2000
+THREADS = 4
+SENDER = 'mediremind@example.com'
+
+
+def main():
+    template = ReminderEmailTemplate(SENDER)
+    recipients = [f'user{i}@example.com' for i in range(MESSAGES)]
+    messages = {to: template.render(to, 'User', ['Aspirin']) for to in recipients}
+
+    with FakeSMTPServer() as server:
+        def per_message(to):
+            # What send_reminder_email did before the pool
+            with smtplib.SMTP(server.host, server.port) as smtp:
+                smtp.login('user', 'secret')
+                smtp.sendmail(SENDER, [to], messages[to])
+
+        pool = SMTPConnectionPool(server.host, server.port, 'user', 'secret', use_tls=False,
+                                  max_connections=THREADS)
+
+        def pooled(to):
+            pool.send(SENDER, [to], messages[to])
+
+        for name, send in (('connection per message', per_message), ('pooled send()', pooled)):
+            server.connections = 0
+            start = time.perf_counter()
+            with ThreadPoolExecutor(THREADS) as executor:
+                list(executor.map(send, recipients))
+            elapsed = time.perf_counter() - start
+            print(f"{name:<24} {MESSAGES / elapsed:>6,.0f} msg/s, {server.connections} connections")
+
+        pool.close()
+        server.connections = 0
+        start = time.perf_counter()
+        failures = pool.send_many((SENDER, [to], messages[to]) for to in recipients)
+        elapsed = time.perf_counter() - start
+        print(f"{'send_many() (1 thread)':<24} {MESSAGES / elapsed:>6,.0f} msg/s, "
+              f"{server.connections} connections, {len(failures)} failed")
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Prescription upload throughput: saving each upload to disk against analyzing its stream.
+
+Serves the app on a local port and posts prescriptions from 8 client
+threads, small (20kB, kept in memory) and large (4MB, spilled to a temp
+file). The baseline is a route doing what /analyze_prescription did
+before: save the upload under uploads/, analyze, delete it. Each client
+uploads its own filename there, since clients sharing one would delete
+each other's files mid-request, as the old handler did.
+
+    python bench/bench_uploads.py
+
+Runs in a temporary directory, so the benchmark's users and files never
+touch the repository's.
+"""
+import http.client
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CLIENTS = 8
+SIZES = ((20_000, 100), (4_000_000, 10))  # upload bytes, uploads per client
+BOUNDARY = b'prescription-boundary'
+
+
+def install_disk_route(app_module):
+    from flask import jsonify, request, session
+    from werkzeug.utils import secure_filename
+
+    upload_folder = os.path.join(os.getcwd(), 'uploads')
+    os.makedirs(upload_folder, exist_ok=True)
+
+    @app_module.app.route('/bench/analyze_via_disk', methods=['POST'])
+    @app_module.login_required
+    def analyze_via_disk():
+        file = request.files['prescription_image']
+        filename = secure_filename(file.filename)
+        file_path = os.path.join(upload_folder, filename)
+        file.save(file_path)
+        medicines = app_module.reminder.analyze_prescription(session['user_id'], filename)
+        os.remove(file_path)
+        return jsonify({"status": "success", "data": {"medicines": medicines}})
+
+
+def logged_in(port, email):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    headers = {'Content-Type': 'application/json'}
+    conn.request('POST', '/api/register',
+                 json.dumps({'name': 'Bench', 'email': email, 'password': 'bench-password'}), headers)
+    conn.getresponse().read()
+    conn.request('POST', '/api/login', json.dumps({'email': email, 'password': 'bench-password'}), headers)
+    response = conn.getresponse()
+    response.read()
+    return conn, response.getheader('Set-Cookie').split(';')[0]
+
+
+def client(port, path, size, uploads, done):
+    conn, cookie = logged_in(port, f'bench{threading.get_ident()}@example.com')
+    disposition = f'form-data; name="prescription_image"; filename="aspirin scan {threading.get_ident()}.jpg"'
+    body = (b'--' + BOUNDARY + b'\r\nContent-Disposition: ' + disposition.encode() +
+            b'\r\nContent-Type: image/jpeg\r\n\r\n' + b'\0' * size + b'\r\n--' + BOUNDARY + b'--\r\n')
+    headers = {'Content-Type': 'multipart/form-data; boundary=' + BOUNDARY.decode(), 'Cookie': cookie}
+    ok = 0
+    for _ in range(uploads):
+        conn.request('POST', path, body, headers)
+        response = conn.getresponse()
+        response.read()
+        ok += response.status == 200
+    done.append(ok)
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    shutil.copy(os.path.join(ROOT, 'medicine_prices.csv'), workdir)
+    os.chdir(workdir)
+    os.environ.setdefault('MEDIREMIND_VOICE_ALERTS', '0')
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    import app
+    from werkzeug.serving import make_server
+
+    logging.getLogger('mediremind').setLevel(logging.WARNING)
+    install_disk_route(app)
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for size, uploads in SIZES:
+            for label, path in (('save + delete', '/bench/analyze_via_disk'),
+                                ('stream', '/analyze_prescription')):
+                done = []
+                threads = [threading.Thread(target=client, args=(server.server_port, path, size, uploads, done))
+                           for _ in range(CLIENTS)]
+                start = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - start
+                print(f"{size // 1000:>5} kB  {label:<14} {sum(done):>4}/{CLIENTS * uploads} ok "
+                      f"{sum(done) / elapsed:>8,.1f} uploads/s")
+    finally:
+        server.shutdown()
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Synthetic price catalogs shared by the benchmarks.
+
+Names are built the way real catalog entries look ("Novacare Amoxicillin
+500mg Capsules"), so they share the common trigrams ("mg ", "tab", ...)
+that make name search expensive, unlike "Medicine 12345" style names.
+"""
+import csv
+import random
+from typing import Dict, List
+
+MAKERS = ('Apex', 'Bioline', 'Cipla', 'Dermacare', 'Eurogen', 'Fortis', 'Glenmark', 'Healix',
+          'Intas', 'Jubilant', 'Kemwell', 'Lupin', 'Medley', 'Novacare', 'Orchid', 'Pharmex',
+          'Quantum', 'Ranbax', 'Sunova', 'Torrent', 'Unimed', 'Vantage', 'Wockhart', 'Zydex')
+STEMS = ('Acyclovir', 'Albendazole', 'Amlodipine', 'Amoxicillin', 'Atenolol', 'Atorvastatin',
+         'Azithromycin', 'Cefixime', 'Cetirizine', 'Ciprofloxacin', 'Clopidogrel', 'Diclofenac',
+         'Domperidone', 'Doxycycline', 'Esomeprazole', 'Fluconazole', 'Gabapentin', 'Glimepiride',
+         'Ibuprofen', 'Levocetirizine', 'Levofloxacin', 'Losartan', 'Metformin', 'Metoprolol',
+         'Metronidazole', 'Montelukast', 'Naproxen', 'Ofloxacin', 'Omeprazole', 'Ondansetron',
+         'Pantoprazole', 'Paracetamol', 'Prednisolone', 'Ranitidine', 'Rosuvastatin', 'Salbutamol',
+         'Sertraline', 'Telmisartan', 'Tramadol', 'Vildagliptin')
+STRENGTHS = ('2.5mg', '5mg', '10mg', '20mg', '25mg', '40mg', '50mg', '100mg', '250mg', '500mg',
+             '650mg', '1g')
+FORMS = ('Tablets', 'Capsules', 'Syrup', 'Suspension', 'Injection', 'Drops', 'Gel', 'Cream')
+
+
+def medicine_names(count: int, seed: int = 1) -> List[str]:
+    """``count`` distinct realistic medicine names, in random order."""
+    combinations = len(MAKERS) * len(STEMS) * len(STRENGTHS) * len(FORMS)
+    if count > combinations:
+        raise ValueError(f"At most {combinations} distinct names can be generated")
+    rng = random.Random(seed)
+    picks = rng.sample(range(combinations), count)
+    names = []
+    for pick in picks:
+        pick, form = divmod(pick, len(FORMS))
+        pick, strength = divmod(pick, len(STRENGTHS))
+        maker, stem = divmod(pick, len(STEMS))
+        names.append(f"{MAKERS[maker]} {STEMS[stem]} {STRENGTHS[strength]} {FORMS[form]}")
+    return names
+
+
+def price_table(medicines: int = 50_000, pharmacies: int = 10_000, per_medicine: int = 20,
+                seed: int = 7) -> Dict[str, Dict[str, float]]:
+    """``{medicine: {pharmacy: price}}`` with ``per_medicine`` pharmacies stocking each medicine."""
+    rng = random.Random(seed)
+    pharmacy_names = [f"Pharmacy {i}" for i in range(pharmacies)]
+    table = {}
+    for name in medicine_names(medicines, seed):
+        base = rng.uniform(2, 80)
+        table[name] = {
+            pharmacy: round(base * rng.uniform(0.7, 1.4), 2)
+            for pharmacy in rng.sample(pharmacy_names, per_medicine)
+        }
+    return table
+
+
+def write_price_csv(path, table: Dict[str, Dict[str, float]]) -> int:
+    """Write ``table`` in the price CSV format, rows shuffled; returns the row count."""
+    rows = [(medicine, pharmacy, f"{price:.2f}")
+            for medicine, prices in table.items() for pharmacy, price in prices.items()]
+    random.Random(0).shuffle(rows)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Medicine Name', 'Pharmacy Name', 'Price'])
+        writer.writerows(rows)
+    return len(rows)
@@ -0,0 +1,174 @@
+import datetime
+import html
+import re
+from email.header import Header
+from email.utils import formatdate
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+REMINDER_HTML = """
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background-color: #4a90e2; color: white; padding: 20px; text-align: center; }
+        .content { padding: 20px; background-color: #f8f9fa; }
+        .footer { text-align: center; margin-top: 20px; font-size: 12px; color: #777; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>Medicine Reminder</h1>
+        </div>
+        <div class="content">
+            <h2>Hello $user_name,</h2>
+            <p>It's time to take your medication:</p>
+            $medicines
+            <p>Current time: $current_time</p>
+            <p>Stay healthy!</p>
+        </div>
+        <div class="footer">
+            <p>This is an automated reminder from MediRemind.</p>
+            <p>&copy; 2025 MediRemind - Healthcare INIT-SAGA</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+MEDICINE_HTML = '<p style="font-size: 18px; font-weight: bold; color: #4a90e2;">{}</p>'
+
+_FIELD = re.compile(r'\$(\w+)')
+
+# CR and LF would end a header line and start a new header; other control
+# characters have no business in one either
+_CONTROL = re.compile(r'[\x00-\x1f\x7f]+')
+
+# Longest Subject we send unfolded; SMTP caps a line at 998 characters
+MAX_PLAIN_SUBJECT = 900
+
+
+def html_ascii(text: str) -> bytes:
+    """HTML-escape text, turning non-ASCII characters into character references."""
+    return html.escape(text).encode('ascii', 'xmlcharrefreplace')
+
+
+def header_address(address: str) -> bytes:
+    """An email address as a header value.
+
+    Raises ValueError for an address with a line break or other control
+    character, which could otherwise inject headers. A non-ASCII domain is
+    IDNA-encoded; a non-ASCII local part is RFC 2047-encoded.
+    """
+    if address.isprintable() and address.isascii():
+        return address.encode('ascii')
+    if _CONTROL.search(address):
+        raise ValueError(f"Email address {address!r} contains a control character")
+    local, at, domain = address.rpartition('@')
+    if local.isascii() and at:
+        return f"{local}@{domain.encode('idna').decode('ascii')}".encode('ascii')
+    return Header(address, 'utf-8').encode(linesep='\r\n').encode('ascii')
+
+
+def format_medicine_list(medicine_names: Sequence[str]) -> str:
+    """Join medicine names for a sentence: 'A', 'A and B', 'A, B and C'."""
+    if len(medicine_names) == 1:
+        return medicine_names[0]
+    return f"{', '.join(medicine_names[:-1])} and {medicine_names[-1]}"
+
+
+class ReminderEmailTemplate:
+    """Reminder email with its static parts rendered and encoded once.
+
+    The HTML body is split around its ``$field`` markers into pre-encoded
+    byte chunks, and the fixed MIME headers are prepared up front, so
+    rendering a message is a single ``b''.join`` over a few chunks. Every
+    substituted value is HTML-escaped to ASCII, which keeps the whole
+    message 7-bit clean without a transfer encoding. Header values never
+    carry a line break: addresses with one are refused (see
+    ``header_address``) and control characters in the Subject are
+    replaced with spaces.
+    """
+
+    def __init__(self, sender: str):
+        self.sender = sender
+        chunks = _FIELD.split(REMINDER_HTML.strip().replace('\n', '\r\n'))
+        self._parts = [chunk.encode('ascii') for chunk in chunks[0::2]]
+        self._fields = chunks[1::2]
+        self._headers = (
+            b"From: " + header_address(sender) + b"\r\n"
+            b"MIME-Version: 1.0\r\n"
+            b"Content-Type: text/html; charset=us-ascii\r\n"
+            b"Content-Transfer-Encoding: 7bit\r\n"
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _medicine_html(medicine_name: str) -> bytes:
+        # Medicine names repeat across thousands of users
+        return MEDICINE_HTML.format(html.escape(medicine_name)).encode('ascii', 'xmlcharrefreplace')
+
+    @staticmethod
+    def _subject(medicine_names: Sequence[str]) -> bytes:
+        subject = f"MediRemind: Time to take {format_medicine_list(medicine_names)}"
+        if not subject.isprintable():
+            subject = _CONTROL.sub(' ', subject)
+        if subject.isascii() and len(subject) <= MAX_PLAIN_SUBJECT:
+            return subject.encode('ascii')
+        return Header(subject, 'utf-8').encode(linesep='\r\n').encode('ascii')
+
+    def _render(self, to: str, user_name: str, medicine_names: Sequence[str],
+                current_time: bytes, date: bytes) -> bytes:
+        values = {
+            'user_name': html_ascii(user_name),
+            'medicines': b'\r\n'.join(self._medicine_html(name) for name in medicine_names),
+            'current_time': current_time,
+        }
+        chunks = [
+            self._headers,
+            b'Date: ', date,
+            b'\r\nTo: ', header_address(to),
+            b'\r\nSubject: ', self._subject(medicine_names),
+            b'\r\n\r\n',
+        ]
+        for part, field in zip(self._parts, self._fields):
+            chunks.append(part)
+            chunks.append(values[field])
+        chunks.append(self._parts[-1])
+        chunks.append(b'\r\n')
+        return b''.join(chunks)
+
+    def render(self, to: str, user_name: str, medicine_names: Sequence[str],
+               now: Optional[datetime.datetime] = None) -> bytes:
+        """Render one message, ready to pass to ``smtplib.SMTP.sendmail``.
+
+        Raises ValueError if ``to`` cannot be used as a header value.
+        """
+        now = now or datetime.datetime.now()
+        return self._render(to, user_name, medicine_names,
+                            now.strftime('%I:%M %p').encode('ascii'),
+                            formatdate(now.timestamp(), localtime=True).encode('ascii'))
+
+    def render_many(self, recipients: Iterable[Tuple[str, str, Sequence[str]]],
+                    now: Optional[datetime.datetime] = None,
+                    failed: Optional[List[Tuple[str, ValueError]]] = None
+                    ) -> Iterator[Tuple[str, bytes]]:
+        """Render ``(to, user_name, medicine_names)`` recipients as ``(to, message)`` pairs.
+
+        The time fields are formatted once for the whole batch. A recipient
+        ``render`` would refuse is skipped, and added to ``failed`` as
+        ``(to, error)`` if it is given, rather than ending the batch.
+        """
+        now = now or datetime.datetime.now()
+        current_time = now.strftime('%I:%M %p').encode('ascii')
+        date = formatdate(now.timestamp(), localtime=True).encode('ascii')
+        for to, user_name, medicine_names in recipients:
+            try:
+                message = self._render(to, user_name, medicine_names, current_time, date)
+            except ValueError as e:
+                if failed is not None:
+                    failed.append((to, e))
+                continue
+            yield to, message
@@ -0,0 +1,85 @@
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+
+def _is_word(char: str) -> bool:
+    # Same characters as the regex class \w for str patterns
+    return char.isalnum() or char == '_'
+
+
+class MedicineMatcher:
+    """Find every known medicine name in a text in one pass (Aho-Corasick).
+
+    Names are compiled once into a trie with failure links, so scanning a
+    text costs time proportional to its length plus the number of matches,
+    whatever the size of the catalog. Matching is case-insensitive, and a
+    match only counts where ``re.search(rf'\\b{name}\\b', text, re.I)``
+    would find it: there must be a word boundary at both of its ends.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.names = list(names)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._lengths: Dict[int, int] = {}
+        self._output: List[Tuple[int, ...]] = [()]  # names ending at this state
+        for name_id, name in enumerate(self.names):
+            key = name.casefold()
+            if not key:
+                continue
+            state = 0
+            for char in key:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._output.append(())
+                state = next_state
+            self._output[state] += (name_id,)
+            self._lengths[state] = len(key)
+        self._build_links()
+
+    def _build_links(self) -> None:
+        goto, output = self._goto, self._output
+        self._fail = fail = [0] * len(goto)
+        # Nearest state down the failure chain that ends a name
+        self._match_link = match_link = [-1] * len(goto)
+        pending = deque(goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, child in goto[state].items():
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(char, 0)
+                fail[child] = target if target != child else 0
+                match_link[child] = target if output[target] else match_link[target]
+                pending.append(child)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def find(self, text: str) -> List[str]:
+        """Names that occur in ``text`` as whole words, in catalog order."""
+        folded = text.casefold()
+        goto, fail, output, match_link = self._goto, self._fail, self._output, self._match_link
+        lengths = self._lengths
+        found = set()
+        state = 0
+        for end, char in enumerate(folded, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            hit = state if output[state] else match_link[state]
+            while hit != -1:
+                if self._bounded(folded, end - lengths[hit], end):
+                    found.update(output[hit])
+                hit = match_link[hit]
+        return [self.names[name_id] for name_id in sorted(found)]
+
+    @staticmethod
+    def _bounded(text: str, start: int, end: int) -> bool:
+        # \b holds where exactly one side of the position is a word character
+        before = start > 0 and _is_word(text[start - 1])
+        after = end < len(text) and _is_word(text[end])
+        return before != _is_word(text[start]) and _is_word(text[end - 1]) != after
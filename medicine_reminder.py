@@ -2,12 +2,11 @@ import schedule
 import time
 import pyttsx3
 import datetime
-import pandas as pd
-import os
 import threading
 import platform
 from typing import Dict, List
-from pathlib import Path
+
+import prices
 
 class MedicineReminder:
     def __init__(self):
@@ -40,29 +39,7 @@ class MedicineReminder:
 
     def load_medicine_prices(self) -> Dict:
         """Load medicine prices from CSV file."""
-        try:
-            csv_path = Path("medicine_prices.csv")
-            if not csv_path.exists():
-                print("Warning: medicine_prices.csv not found. Using empty price database.")
-                return {}
-            
-            df = pd.read_csv(csv_path)
-            # Convert DataFrame to nested dictionary
-            prices_dict = {}
-            for _, row in df.iterrows():
-                medicine = row['Medicine Name']
-                pharmacy = row['Pharmacy Name']
-                price = float(row['Price'])
-                
-                if medicine not in prices_dict:
-                    prices_dict[medicine] = {}
-                prices_dict[medicine][pharmacy] = price
-            
-            return prices_dict
-        except Exception as e:
-            print(f"Error loading medicine prices: {e}")
-            print("Using empty price database.")
-            return {}
+        return prices.load_medicine_prices("medicine_prices.csv")
 
     def validate_time_format(self, time_str: str) -> bool:
         """Validate if the time string is in correct format."""
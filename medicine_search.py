@@ -0,0 +1,251 @@
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Fuzzy matches scoring below this Dice coefficient are not suggested
+MIN_SIMILARITY = 0.3
+# How far fuzzy search lowers its cut-off score at a time while it has
+# fewer matches than asked for
+CUTOFF_STEP = 0.1
+# Bits in the per-name trigram signature; collisions only cost speed
+SIGNATURE_BITS = 512
+
+
+def trigrams(text: str) -> List[str]:
+    """Overlapping three-character slices of ``text``, padded so short words still have some."""
+    padded = f"  {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def _signature(grams: Iterable[str]) -> int:
+    """A bit per trigram, folded into ``SIGNATURE_BITS`` bits; only comparable within one process."""
+    signature = 0
+    for gram in grams:
+        signature |= 1 << hash(gram) % SIGNATURE_BITS
+    return signature
+
+
+def _lists_to_read(lists: List, needed: int) -> int:
+    # A name in none of the rarest len(lists) - needed + 1 lists is in too few
+    return len(lists) - needed + 1
+
+
+def _sharing(lists: List[Tuple[List[int], int]], needed: int, signatures: List[int],
+             shared: Counter, skip: Set[int]) -> Dict[int, int]:
+    """Names in at least ``needed`` of ``lists``, with how many they are in.
+
+    ``lists`` holds (posting list, trigram signature) pairs, rarest first.
+    ``shared`` counts the names in the rarest ``_lists_to_read(lists,
+    needed)`` of them, the only names that can be in enough. Names in
+    ``skip`` were already found and are not checked again.
+    """
+    read = _lists_to_read(lists, needed)
+    unread = [name_ids for name_ids, _ in lists[read:]]
+    unread_signature = 0
+    for _, signature in lists[read:]:
+        unread_signature |= signature
+    # Trigrams that share a signature bit are counted once by the signature
+    collisions = len(unread) - unread_signature.bit_count()
+
+    sharing = {}
+    for name_id, common in shared.items():
+        if name_id in skip:
+            continue
+        # The signature overcounts, so this never drops a name that makes it
+        if common + (signatures[name_id] & unread_signature).bit_count() + collisions < needed:
+            continue
+        missable = common + len(unread) - needed
+        for name_ids in unread:
+            # Posting lists are in name id order
+            position = bisect_left(name_ids, name_id)
+            if position < len(name_ids) and name_ids[position] == name_id:
+                common += 1
+            elif missable:
+                missable -= 1
+            else:
+                break
+        else:
+            sharing[name_id] = common
+    return sharing
+
+
+def _push(best: List[Tuple[float, int]], limit: int, scored: Tuple[float, int]) -> None:
+    if len(best) < limit:
+        heapq.heappush(best, scored)
+    elif scored > best[0]:
+        heapq.heapreplace(best, scored)
+
+
+class MedicineSearchIndex:
+    """Case-insensitive prefix and typo-tolerant lookup over medicine names.
+
+    Prefix search bisects a sorted array of case-folded names, which does
+    the job of a prefix trie with one flat list instead of a node per
+    character. Typo tolerance comes from a trigram index: candidate names
+    are scored by the Dice coefficient of their trigram sets against the
+    query's. The trigram index is split by how many trigrams a name has,
+    since that alone caps the score a name can reach.
+
+    The index is never changed once built; ``with_changes`` returns an
+    updated copy for a catalog that gained or lost a few names.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.names = list(names)
+        folded = [name.casefold() for name in self.names]
+        self._sorted = sorted(range(len(self.names)), key=folded.__getitem__)
+        self._sorted_keys = [folded[i] for i in self._sorted]
+
+        # {trigram count: {trigram: [name_id, ...]}}, each list in name id order
+        postings: Dict[int, Dict[str, List[int]]] = defaultdict(lambda: defaultdict(list))
+        self._signatures = []
+        bits: Dict[str, int] = {}
+        for name_id, key in enumerate(folded):
+            grams = set(trigrams(key))
+            by_gram = postings[len(grams)]
+            signature = 0
+            for gram in grams:
+                by_gram[gram].append(name_id)
+                bit = bits.get(gram)
+                if bit is None:
+                    bit = bits[gram] = _signature((gram,))
+                signature |= bit
+            self._signatures.append(signature)
+        self._postings = {count: dict(by_gram) for count, by_gram in postings.items()}
+
+    def with_changes(self, added: Iterable[str] = (), removed: Iterable[str] = ()) -> 'MedicineSearchIndex':
+        """A copy of this index with names added and removed, built without a full rebuild.
+
+        The flat arrays are copied, which is a memcpy, and only the posting
+        lists of the changed names' trigrams are rewritten. Removed names
+        keep their id, so the ids of every other name stay valid.
+        """
+        index = MedicineSearchIndex.__new__(MedicineSearchIndex)
+        index.names = list(self.names)
+        index._sorted = list(self._sorted)
+        index._sorted_keys = list(self._sorted_keys)
+        index._signatures = list(self._signatures)
+        index._postings = postings = dict(self._postings)
+        copied = set()  # (trigram count, trigram) lists this copy already owns
+
+        def own(count, gram):
+            if count not in copied:
+                postings[count] = dict(postings.get(count, {}))
+                copied.add(count)
+            if (count, gram) not in copied:
+                postings[count][gram] = list(postings[count].get(gram, ()))
+                copied.add((count, gram))
+            return postings[count][gram]
+
+        for name in removed:
+            key = name.casefold()
+            position = bisect_left(index._sorted_keys, key)
+            while position < len(index._sorted_keys) and index._sorted_keys[position] == key:
+                name_id = index._sorted[position]
+                if index.names[name_id] == name:
+                    del index._sorted[position]
+                    del index._sorted_keys[position]
+                    grams = set(trigrams(key))
+                    for gram in grams:
+                        own(len(grams), gram).remove(name_id)
+                    index.names[name_id] = None
+                    break
+                position += 1
+
+        for name in added:
+            name_id = len(index.names)
+            index.names.append(name)
+            key = name.casefold()
+            # After equal keys, as a full build would order them by id
+            position = bisect_right(index._sorted_keys, key)
+            index._sorted.insert(position, name_id)
+            index._sorted_keys.insert(position, key)
+            grams = set(trigrams(key))
+            for gram in grams:
+                own(len(grams), gram).append(name_id)
+            index._signatures.append(_signature(grams))
+        return index
+
+    def prefix(self, query: str, limit: int = 10) -> List[str]:
+        """Names starting with ``query``, alphabetically."""
+        key = query.casefold()
+        start = bisect_left(self._sorted_keys, key)
+        matches = []
+        for position in range(start, min(start + limit, len(self._sorted_keys))):
+            if not self._sorted_keys[position].startswith(key):
+                break
+            matches.append(self.names[self._sorted[position]])
+        return matches
+
+    def fuzzy(self, query: str, limit: int = 10) -> List[str]:
+        """Names most similar to ``query`` by shared trigrams, best first.
+
+        A name with ``n`` trigrams scores at most ``2 * min(q, n) / (q + n)``
+        against a query with ``q``, so names are visited a trigram count at
+        a time, best bound first, until no name left could make the top
+        ``limit``. Within a trigram count, a cut-off score fixes how many
+        trigrams a name must share, and so how few posting lists need
+        reading in full. Until ``limit`` names are known the cut-off starts
+        high and is lowered a step at a time, which is cheap because high
+        cut-offs read only the rarest lists.
+        """
+        grams = set(trigrams(query.casefold()))
+        if not grams or limit < 1:
+            return []
+        query_count = len(grams)
+        bits = {gram: _signature((gram,)) for gram in grams}
+        counts = sorted(self._postings, reverse=True,
+                        key=lambda count: 2 * min(query_count, count) / (query_count + count))
+
+        best = []  # min-heap of the top (score, name_id) so far
+        threshold = MIN_SIMILARITY
+        cutoff = 1.0
+        for count in counts:
+            total = query_count + count
+            bound = 2 * min(query_count, count) / total
+            if bound < threshold:
+                break
+            cutoff = min(bound, cutoff + CUTOFF_STEP)
+            by_gram = self._postings[count]
+            lists = sorted(((by_gram[gram], bits[gram]) for gram in grams if gram in by_gram),
+                           key=lambda pair: len(pair[0]))
+            found = set()
+            # The cut-off only falls, so each step adds lists to those counted
+            shared, counted = Counter(), 0
+            while True:
+                cutoff = threshold if len(best) == limit else max(threshold, cutoff - CUTOFF_STEP)
+                # Fewest shared trigrams that reach the cut-off at this count
+                needed = int(cutoff * total / 2)
+                while 2 * needed / total < cutoff:
+                    needed += 1
+                if needed <= len(lists):
+                    read = _lists_to_read(lists, needed)
+                    for name_ids, _ in lists[counted:read]:
+                        shared.update(name_ids)
+                    counted = read
+                    for name_id, common in _sharing(lists, needed, self._signatures, shared, found).items():
+                        found.add(name_id)
+                        _push(best, limit, (2 * common / total, name_id))
+                if len(best) == limit:
+                    threshold = max(threshold, best[0][0])
+                if cutoff <= threshold:
+                    break
+
+        best.sort(reverse=True)
+        return [self.names[name_id] for score, name_id in best]
+
+    def search(self, query: str, limit: int = 10) -> List[str]:
+        """Prefix matches first, topped up with fuzzy matches."""
+        query = query.strip()
+        if not query:
+            return []
+        results = self.prefix(query, limit)
+        if len(results) < limit:
+            seen = set(results)
+            for name in self.fuzzy(query, limit):
+                if name not in seen:
+                    results.append(name)
+                    if len(results) == limit:
+                        break
+        return results
@@ -0,0 +1,291 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+# Seconds; suits everything from a price lookup to an SMTP round trip
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+log = logging.getLogger(__name__)
+
+# (name suffix, label names, label values, value)
+Sample = Tuple[str, Sequence[str], Sequence[str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Registry:
+    """The metrics of this process, rendered in the Prometheus text format.
+
+    A metric registered under a name already taken replaces the old one,
+    so re-importing a module does not leave stale duplicates behind.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, '_Metric'] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: '_Metric') -> None:
+        with self._lock:
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                # One failing callback must not take the whole scrape down
+                log.warning("Could not collect metric %s: %s", metric.name, e)
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, names, values, value in samples:
+                labels = ','.join(f'{name}="{_escape(str(v))}"' for name, v in zip(names, values))
+                label_text = f"{{{labels}}}" if labels else ''
+                lines.append(f"{metric.name}{suffix}{label_text} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = 'untyped'
+    suffix = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional[Registry] = REGISTRY, function: Optional[Callable] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames and function is None:
+            # Exported as zero from the start rather than missing until first used
+            self.labels()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values: str):
+        """The child metric for these label values, created on first use."""
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _unlabelled(self):
+        return self.labels()
+
+    def samples(self) -> Iterable[Sample]:
+        if self.function is not None:
+            yield from self._function_samples()
+            return
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            for suffix, names, label_values, value in child.samples():
+                yield suffix, self.labelnames + tuple(names), values + tuple(label_values), value
+
+    def _function_samples(self) -> Iterable[Sample]:
+        result = self.function()
+        if not self.labelnames:
+            yield self.suffix, (), (), result
+            return
+        for values, value in result:
+            yield self.suffix, self.labelnames, tuple(values), value
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        yield '_total', (), (), self.value
+
+
+class Counter(_Metric):
+    """A count that only goes up; exported as ``<name>_total``.
+
+    With ``function``, the count is read by calling it at scrape time, as
+    for Gauge.
+    """
+
+    kind = 'counter'
+    suffix = '_total'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabelled().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def samples(self):
+        yield '', (), (), self.value
+
+
+class Gauge(_Metric):
+    """A value that goes up and down.
+
+    With ``function``, the value is read by calling it at scrape time; it
+    may return a number, or ``(label values, number)`` pairs for a
+    labelled gauge.
+    """
+
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._unlabelled().set(value)
+
+
+class _Timer:
+    """Observes the seconds spent in a ``with`` block or decorated function."""
+
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram: '_HistogramChild'):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+    def __call__(self, func: Callable) -> Callable:
+        histogram = self.histogram
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return timed
+
+
+class _HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        # Bucket upper bounds are inclusive (le)
+        slot = bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    def samples(self):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip(self.upper_bounds + (float('inf'),), counts):
+            cumulative += count
+            yield '_bucket', ('le',), (_format_value(bound),), cumulative
+        yield '_sum', (), (), total
+        yield '_count', (), (), cumulative
+
+
+class Histogram(_Metric):
+    """Observations counted into fixed buckets, plus their sum and count.
+
+    Observing is a bisect and a locked increment, cheap enough to leave on
+    around every request.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional[Registry] = REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._unlabelled().observe(value)
+
+    def time(self) -> _Timer:
+        return self._unlabelled().time()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = '0.0.0.0', registry: Registry = REGISTRY
+                         ) -> ThreadingHTTPServer:
+    """Serve ``registry`` over HTTP from a background thread, for processes without a web app."""
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
@@ -0,0 +1,147 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict
+
+from metrics import Histogram
+
+log = logging.getLogger(__name__)
+
+QUEUE_LATENCY_SECONDS = Histogram(
+    'mediremind_notification_queue_latency_seconds',
+    'Time from submitting a notification to its first delivery attempt', ['channel']
+)
+
+
+class NotificationJob:
+    __slots__ = ('func', 'args', 'attempts', 'queued_at')
+
+    def __init__(self, func: Callable, args: tuple):
+        self.func = func
+        self.args = args
+        self.attempts = 0
+        self.queued_at = time.monotonic()
+
+
+class Channel:
+    """Bounded queue and worker threads for one delivery channel."""
+
+    def __init__(self, name: str, workers: int, queue_size: int, max_retries: int):
+        self.name = name
+        self.workers = workers
+        self.max_retries = max_retries
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.latency = QUEUE_LATENCY_SECONDS.labels(name)
+        self.in_flight = 0
+        self.high_water = 0
+        self.counts = {'submitted': 0, 'delivered': 0, 'failed': 0, 'retried': 0, 'dropped': 0}
+        # Seconds from submit to the first delivery attempt
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_count = 0
+
+
+class NotificationDispatcher:
+    """Deliver notifications off the scheduler thread.
+
+    Each channel (voice, email, ...) has its own bounded queue drained by a
+    fixed number of worker threads, which caps how many deliveries of that
+    kind run at once. A slow mail server therefore backs up only the email
+    queue. Failed deliveries are retried with exponential backoff; when a
+    queue is full, new notifications are dropped and counted rather than
+    blocking the caller.
+    """
+
+    def __init__(self, queue_size: int = 1000, retry_backoff: float = 2.0,
+                 enqueue_timeout: float = 0.5):
+        self.queue_size = queue_size
+        self.retry_backoff = retry_backoff
+        self.enqueue_timeout = enqueue_timeout
+        self.channels: Dict[str, Channel] = {}
+        self._lock = threading.Lock()
+
+    def add_channel(self, name: str, workers: int = 1, max_retries: int = 0) -> None:
+        """Create a channel and start its workers."""
+        channel = Channel(name, workers, self.queue_size, max_retries)
+        self.channels[name] = channel
+        for i in range(workers):
+            threading.Thread(
+                target=self._worker, args=(channel,), name=f"notify-{name}-{i}", daemon=True
+            ).start()
+
+    def submit(self, channel_name: str, func: Callable, *args) -> bool:
+        """Queue ``func(*args)`` for delivery; returns False if it was dropped."""
+        channel = self.channels[channel_name]
+        job = NotificationJob(func, args)
+        self._count(channel, 'submitted')
+        return self._enqueue(channel, job, timeout=self.enqueue_timeout)
+
+    def _enqueue(self, channel: Channel, job: NotificationJob, timeout: float) -> bool:
+        try:
+            channel.queue.put(job, timeout=timeout)
+        except queue.Full:
+            self._count(channel, 'dropped')
+            log.warning("Notification queue '%s' is full; dropping notification", channel.name)
+            return False
+        depth = channel.queue.qsize()
+        if depth > channel.high_water:
+            channel.high_water = depth
+        return True
+
+    def _count(self, channel: Channel, key: str, delta: int = 1) -> None:
+        with self._lock:
+            channel.counts[key] += delta
+
+    def _worker(self, channel: Channel) -> None:
+        while True:
+            job = channel.queue.get()
+            with self._lock:
+                channel.in_flight += 1
+                if not job.attempts:
+                    latency = time.monotonic() - job.queued_at
+                    channel.latency_total += latency
+                    channel.latency_count += 1
+                    channel.latency_max = max(channel.latency_max, latency)
+                    channel.latency.observe(latency)
+            try:
+                job.attempts += 1
+                job.func(*job.args)
+                self._count(channel, 'delivered')
+            except Exception as e:
+                self._retry_or_fail(channel, job, e)
+            finally:
+                with self._lock:
+                    channel.in_flight -= 1
+                channel.queue.task_done()
+
+    def _retry_or_fail(self, channel: Channel, job: NotificationJob, error: Exception) -> None:
+        if job.attempts > channel.max_retries:
+            self._count(channel, 'failed')
+            log.error("Failed to deliver %s notification after %d attempts: %s",
+                      channel.name, job.attempts, error)
+            return
+        delay = self.retry_backoff * (2 ** (job.attempts - 1))
+        self._count(channel, 'retried')
+        log.warning("Retrying %s notification in %.1fs: %s", channel.name, delay, error)
+        timer = threading.Timer(delay, self._enqueue, args=(channel, job, 0))
+        timer.daemon = True
+        timer.start()
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Queue depth and latency, concurrency and delivery counters per channel."""
+        with self._lock:
+            return {
+                name: {
+                    'queue_depth': channel.queue.qsize(),
+                    'queue_capacity': channel.queue.maxsize,
+                    'queue_high_water': channel.high_water,
+                    'workers': channel.workers,
+                    'in_flight': channel.in_flight,
+                    'queue_latency_avg': (channel.latency_total / channel.latency_count
+                                          if channel.latency_count else None),
+                    'queue_latency_max': channel.latency_max,
+                    **channel.counts,
+                }
+                for name, channel in self.channels.items()
+            }
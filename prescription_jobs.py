@@ -0,0 +1,292 @@
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import BinaryIO, Callable, Dict, List, Optional, Union
+
+from prices import PriceCatalog
+
+log = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def extract_prescription_text(filename: str, image: Union[bytes, BinaryIO]) -> str:
+    """Text read from a prescription upload, to search for medicine names.
+
+    Placeholder for image decoding and OCR: for now the filename stands in
+    for the recognised text. ``image`` is the upload's bytes or, when called
+    in the web process, its (possibly spooled) stream, so that large uploads
+    are never read into memory just to be analyzed.
+    """
+    return filename
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    state TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_user_state ON jobs (user_id, state);
+"""
+
+
+class JobStore:
+    """Analysis jobs in an SQLite database shared by every process in the app's directory.
+
+    Any web worker can then report on a job, whichever one queued it, and
+    the per-user limit counts the user's jobs across all of them.
+    """
+
+    def __init__(self, db_path: str = 'prescription_jobs.db'):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections may not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, job: 'AnalysisJob', max_per_user: int, result_ttl: float) -> bool:
+        """Store a new job; False if its user already has ``max_per_user`` unfinished ones."""
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._expire(conn, result_ttl)
+            (active,) = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE user_id = ? AND state IN (?, ?)",
+                (job.user_id, QUEUED, RUNNING)
+            ).fetchone()
+            if active >= max_per_user:
+                return False
+            conn.execute(
+                "INSERT INTO jobs (job_id, user_id, filename, state, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job.job_id, job.user_id, job.filename, job.state, job.created_at)
+            )
+        return True
+
+    def started(self, job_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET state = ? WHERE job_id = ? AND state = ?",
+                         (RUNNING, job_id, QUEUED))
+
+    def complete(self, job_id: str, state: str, result=None, error: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                (state, json.dumps(result), error, time.time(), job_id)
+            )
+
+    def get(self, job_id: str, result_ttl: float) -> Optional['AnalysisJob']:
+        with self._connect() as conn:
+            self._expire(conn, result_ttl)
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return AnalysisJob.from_row(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for row in self._connect().execute("SELECT state, COUNT(*) AS jobs FROM jobs GROUP BY state"):
+            counts[row['state']] = row['jobs']
+        return counts
+
+    @staticmethod
+    def _expire(conn: sqlite3.Connection, result_ttl: float) -> None:
+        # A job that never finished was lost with the process that queued
+        # it; it is dropped too, or it would count against its user forever
+        cutoff = time.time() - result_ttl
+        conn.execute("DELETE FROM jobs WHERE COALESCE(finished_at, created_at) < ?", (cutoff,))
+
+
+# The price catalog and job store of a worker process, opened by open_worker
+_catalog: Optional[PriceCatalog] = None
+_jobs: Optional[JobStore] = None
+
+
+def open_worker(csv_path: str, delta_dir: Optional[str], db_path: str) -> None:
+    """Load the prices a worker process matches names against; runs once as each worker starts."""
+    global _catalog, _jobs
+    _jobs = JobStore(db_path)
+    _catalog = PriceCatalog(csv_path, delta_dir=delta_dir)
+    _catalog.reload()
+
+
+def find_prescription_medicines(job_id: str, image_path: str, filename: str) -> List[str]:
+    """Extract the text of the upload saved at ``image_path`` and find the medicines it names.
+
+    Runs in a worker process, so it must stay a plain module-level function
+    of picklable arguments. The upload is passed by path, never as bytes.
+    """
+    _jobs.started(job_id)
+    with open(image_path, 'rb') as image:
+        text = extract_prescription_text(filename, image)
+    # Catches up with a new price file or deltas applied since the last job
+    _catalog.refresh()
+    return _catalog.index.matcher().find(text)
+
+
+def _remove_upload(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError as e:
+        log.warning("Could not remove analyzed upload %s: %s", path, e)
+
+
+class AnalysisJob:
+    __slots__ = ('job_id', 'user_id', 'filename', 'state', 'result', 'error',
+                 'created_at', 'finished_at')
+
+    def __init__(self, user_id: str, filename: str):
+        self.job_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.filename = filename
+        self.state = QUEUED
+        self.result = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> 'AnalysisJob':
+        job = cls.__new__(cls)
+        for field in cls.__slots__:
+            setattr(job, field, row[field])
+        job.result = json.loads(row['result']) if row['result'] is not None else None
+        return job
+
+    def to_dict(self) -> Dict:
+        job = {
+            "job_id": self.job_id,
+            "state": self.state,
+            "filename": self.filename,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+        if self.state == DONE:
+            job["result"] = self.result
+        elif self.state == FAILED:
+            job["error"] = self.error
+        return job
+
+
+class PrescriptionJobQueue:
+    """Run prescription analysis in a pool of worker processes.
+
+    Text extraction and the search for medicine names, the CPU-heavy
+    part, run in up to ``workers`` processes so they scale across cores
+    and never tie up a web thread. Each worker loads its own copy of the
+    prices from ``csv_path`` and ``delta_dir`` to match names against.
+    The names found are handed to ``finish(user_id, names)`` back in this
+    process, on a thread of its own, where the live price index and the
+    user store are; whatever that returns becomes the job's result.
+
+    Jobs are kept in the SQLite database at ``db_path`` (see JobStore), so
+    web workers sharing it can each answer for any job. A user may have at
+    most ``max_per_user`` unfinished jobs; finished jobs are forgotten
+    ``result_ttl`` seconds after they complete.
+
+    Workers are started with the 'spawn' method: the app runs several
+    threads, and forking a multi-threaded process can deadlock the child.
+    """
+
+    def __init__(self, finish: Callable[[str, List[str]], object], csv_path: str,
+                 db_path: str = 'prescription_jobs.db', delta_dir: Optional[str] = None,
+                 workers: Optional[int] = None, max_per_user: int = 3, result_ttl: float = 600.0):
+        self.finish = finish
+        self.csv_path = csv_path
+        self.delta_dir = delta_dir
+        self.workers = workers
+        self.max_per_user = max_per_user
+        self.result_ttl = result_ttl
+        self.jobs = JobStore(db_path)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._finisher: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Started on first use so that importing the app does not spawn processes
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=open_worker, initargs=(self.csv_path, self.delta_dir, self.jobs.db_path)
+                )
+                # finish() saves to the user store, which may block; done callbacks
+                # run on the pool's own thread, so they only hand results over
+                self._finisher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prescription-finish')
+            return self._executor
+
+    def submit(self, user_id: str, filename: str, image_path: str,
+               remove_image: bool = False) -> Optional[AnalysisJob]:
+        """Queue the upload saved at ``image_path`` for analysis.
+
+        With ``remove_image`` the file is deleted once the job is done with
+        it. Returns None if the user is at their limit.
+        """
+        job = AnalysisJob(user_id, filename)
+        if not self.jobs.add(job, self.max_per_user, self.result_ttl):
+            return None
+        try:
+            future = self._pool().submit(find_prescription_medicines, job.job_id, image_path, filename)
+        except Exception as e:
+            log.exception("Could not queue prescription analysis: %s", e)
+            self.jobs.complete(job.job_id, FAILED, error=str(e))
+            if remove_image:
+                _remove_upload(image_path)
+            return job
+
+        def extracted(future: Future) -> None:
+            self._finisher.submit(self._finish, job, future)
+            if remove_image:
+                _remove_upload(image_path)
+
+        future.add_done_callback(extracted)
+        return job
+
+    def _finish(self, job: AnalysisJob, future: Future) -> None:
+        try:
+            result = self.finish(job.user_id, future.result())
+        except Exception as e:
+            log.exception("Prescription analysis job %s failed: %s", job.job_id, e)
+            self.jobs.complete(job.job_id, FAILED, error=str(e))
+        else:
+            self.jobs.complete(job.job_id, DONE, result=result)
+
+    def get(self, job_id: str, user_id: str) -> Optional[AnalysisJob]:
+        """The user's job with this ID, or None if unknown, expired or someone else's."""
+        job = self.jobs.get(job_id, self.result_ttl)
+        if job is None or job.user_id != user_id:
+            return None
+        return job
+
+    def status(self) -> Dict:
+        """Counts of jobs by state, across every process sharing the job database."""
+        return self.jobs.counts()
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, once queued jobs are done."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+            self._finisher.shutdown()
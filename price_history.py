@@ -0,0 +1,115 @@
+import datetime
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# Price checks remembered per user unless configured otherwise
+DEFAULT_CAPACITY = 10
+
+# (medicine, unix time in seconds, min_price, max_price)
+PriceCheck = Tuple[str, int, float, float]
+
+
+def _to_epoch(timestamp) -> int:
+    if isinstance(timestamp, str):
+        return int(datetime.datetime.fromisoformat(timestamp).timestamp())
+    return int(timestamp)
+
+
+class PriceCheckHistory:
+    """A user's most recent price checks, in a fixed-capacity ring buffer.
+
+    Recording a check is an O(1) append; once the buffer is full the
+    oldest check falls off the other end. Checks are kept as compact
+    tuples and serialized as ``[medicine, unix_time, min_price, max_price]``
+    lists, oldest first. The old format, a newest-first list of dicts with
+    ISO timestamps, is still read.
+    """
+
+    __slots__ = ('_checks',)
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, checks: Iterable[PriceCheck] = ()):
+        self._checks = deque(checks, maxlen=capacity)
+
+    @classmethod
+    def from_data(cls, data: List, capacity: int = DEFAULT_CAPACITY) -> 'PriceCheckHistory':
+        """Load either serialized form."""
+        if data and isinstance(data[0], dict):
+            checks = [
+                (check['medicine'], _to_epoch(check['timestamp']), check['min_price'], check['max_price'])
+                for check in reversed(data)
+            ]
+        else:
+            checks = [tuple(check) for check in data]
+        return cls(capacity, checks)
+
+    @property
+    def capacity(self) -> int:
+        return self._checks.maxlen
+
+    def record(self, medicine: str, min_price: float, max_price: float, timestamp=None) -> None:
+        """Add a check; ``timestamp`` defaults to now."""
+        when = int(time.time()) if timestamp is None else _to_epoch(timestamp)
+        self._checks.append((medicine, when, min_price, max_price))
+
+    def to_data(self) -> List[List]:
+        """Compact serialized form, oldest first."""
+        return [list(check) for check in self._checks]
+
+    def __len__(self) -> int:
+        return len(self._checks)
+
+    def __iter__(self) -> Iterator[PriceCheck]:
+        """Checks newest first."""
+        return reversed(self._checks)
+
+    def recent(self) -> List[Dict]:
+        """Checks newest first, as dicts with ISO timestamps, ready to display."""
+        # list() copies the deque in one step, so a concurrent record() cannot
+        # break the iteration
+        return [
+            {
+                'medicine': medicine,
+                'timestamp': datetime.datetime.fromtimestamp(when).isoformat(),
+                'min_price': min_price,
+                'max_price': max_price
+            }
+            for medicine, when, min_price, max_price in reversed(list(self._checks))
+        ]
+
+    def by_medicine(self) -> List[Dict]:
+        """One entry per medicine, most recently checked first, with its check count."""
+        summary: Dict[str, Dict] = {}
+        for medicine, when, min_price, max_price in reversed(list(self._checks)):
+            entry = summary.get(medicine)
+            if entry is None:
+                summary[medicine] = {
+                    'medicine': medicine,
+                    'last_checked': datetime.datetime.fromtimestamp(when).isoformat(),
+                    'min_price': min_price,
+                    'max_price': max_price,
+                    'checks': 1
+                }
+            else:
+                entry['checks'] += 1
+        return list(summary.values())
+
+
+class PricePopularity:
+    """How often each medicine's prices have been checked, across all users."""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, medicine_names: Iterable[str]) -> None:
+        with self._lock:
+            self._counts.update(medicine_names)
+
+    def most_common(self, n: int) -> List[Tuple[str, int]]:
+        with self._lock:
+            return self._counts.most_common(n)
+
+    def __len__(self) -> int:
+        return len(self._counts)
@@ -0,0 +1,726 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from array import array
+from collections.abc import Mapping
+from contextlib import contextmanager
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from medicine_matcher import MedicineMatcher
+from medicine_search import MedicineSearchIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows: the lock is skipped; run one process there
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+MEDICINE_COLUMN = 'Medicine Name'
+PHARMACY_COLUMN = 'Pharmacy Name'
+PRICE_COLUMN = 'Price'
+ACTION_COLUMN = 'Action'
+
+UPSERT = 'upsert'
+DELETE = 'delete'
+
+# (action, medicine, pharmacy, price); price is None for deletes
+PriceChange = Tuple[str, str, str, Optional[float]]
+
+# (st_mtime_ns, st_size) of a price CSV
+CSVSignature = Tuple[int, int]
+
+# Applied deltas are named <sequence>-<name>.csv; the sequence orders them
+SEQUENCE_DIGITS = 10
+# Records which CSV the applied deltas apply to and the last sequence it covers
+WATERMARK_FILE = 'watermark.json'
+LOCK_FILE = '.lock'
+
+
+def read_price_csv(csv_path: Union[str, Path]) -> Dict[str, Dict[str, float]]:
+    """Stream the price CSV into ``{medicine: {pharmacy: price}}``.
+
+    Rows are read with the csv module, so no DataFrame is ever built.
+    Later rows for the same medicine and pharmacy replace earlier ones, and
+    rows without a valid price are skipped.
+    """
+    prices_dict: Dict[str, Dict[str, float]] = {}
+    skipped = 0
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return prices_dict
+        medicine_col = header.index(MEDICINE_COLUMN)
+        pharmacy_col = header.index(PHARMACY_COLUMN)
+        price_col = header.index(PRICE_COLUMN)
+
+        get_medicine = prices_dict.get
+        for row in reader:
+            try:
+                medicine = row[medicine_col]
+                pharmacy = row[pharmacy_col]
+                price = float(row[price_col])
+            except (IndexError, ValueError):
+                skipped += 1
+                continue
+            pharmacies = get_medicine(medicine)
+            if pharmacies is None:
+                pharmacies = prices_dict[medicine] = {}
+            pharmacies[pharmacy] = price
+
+    if skipped:
+        log.warning("Skipped %d malformed rows in %s", skipped, csv_path)
+    return prices_dict
+
+
+def read_price_delta(delta_path: Union[str, Path]) -> List[PriceChange]:
+    """Read a delta file of ``Action,Medicine Name,Pharmacy Name,Price`` rows.
+
+    ``Action`` is ``upsert`` or ``delete``; deletes leave the price empty.
+    Changes are returned in file order.
+    """
+    changes: List[PriceChange] = []
+    skipped = 0
+    with open(delta_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return changes
+        action_col = header.index(ACTION_COLUMN)
+        medicine_col = header.index(MEDICINE_COLUMN)
+        pharmacy_col = header.index(PHARMACY_COLUMN)
+        price_col = header.index(PRICE_COLUMN)
+
+        for row in reader:
+            try:
+                action = row[action_col].strip().lower()
+                medicine = row[medicine_col]
+                pharmacy = row[pharmacy_col]
+                if action == DELETE:
+                    changes.append((DELETE, medicine, pharmacy, None))
+                elif action == UPSERT:
+                    changes.append((UPSERT, medicine, pharmacy, float(row[price_col])))
+                else:
+                    skipped += 1
+            except (IndexError, ValueError):
+                skipped += 1
+
+    if skipped:
+        log.warning("Skipped %d malformed rows in %s", skipped, delta_path)
+    return changes
+
+
+def load_medicine_prices(csv_path: Union[str, Path] = "medicine_prices.csv") -> Dict[str, Dict[str, float]]:
+    """Load medicine prices from CSV file, reporting how long it took."""
+    try:
+        csv_path = Path(csv_path)
+        if not csv_path.exists():
+            log.warning("%s not found. Using empty price database.", csv_path)
+            return {}
+
+        start = time.perf_counter()
+        prices_dict = read_price_csv(csv_path)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        log.info("Loaded prices for %d medicines from %s in %.1f ms", len(prices_dict), csv_path, elapsed_ms)
+        return prices_dict
+    except Exception as e:
+        log.exception("Error loading medicine prices: %s", e)
+        return {}
+
+
+class MedicinePrices:
+    """Prices of one medicine in contiguous arrays, cheapest first.
+
+    Aggregates are computed once when the entry is built, so lookups never
+    have to walk the prices again.
+    """
+    __slots__ = ('name', 'pharmacy_ids', 'prices', 'min_price', 'max_price',
+                 'mean_price', 'best_pharmacy', '_table', '_index')
+
+    def __init__(self, name: str, pharmacy_ids: array, prices: array, index: 'PriceIndex'):
+        self.name = name
+        self.pharmacy_ids = pharmacy_ids
+        self.prices = prices
+        self.min_price = prices[0]
+        self.max_price = prices[-1]
+        self.mean_price = sum(prices) / len(prices)
+        self.best_pharmacy = index.pharmacies[pharmacy_ids[0]]
+        self._index = index
+        self._table = None
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def price_table(self) -> Dict[str, float]:
+        """``{pharmacy: price}`` for responses; built on first use and cached."""
+        if self._table is None:
+            pharmacies = self._index.pharmacies
+            self._table = {pharmacies[i]: price for i, price in zip(self.pharmacy_ids, self.prices)}
+        return self._table
+
+
+class MedicineOverlay(Mapping):
+    """Medicine table of a delta-updated index: a shared base table plus changes.
+
+    ``changes`` maps each medicine a delta touched to its new entry, or to
+    None if the delta removed it. Neither ``base`` nor ``changes`` is ever
+    modified, so an index and the ones derived from it share ``base`` and a
+    delta costs the size of the changes rather than a copy of the catalog.
+    Iteration follows the base order, then added medicines in the order
+    they were added.
+    """
+
+    __slots__ = ('base', 'changes', '_len')
+
+    def __init__(self, base: Dict[str, 'MedicinePrices'], changes: Dict[str, Optional['MedicinePrices']],
+                 length: int):
+        self.base = base
+        self.changes = changes
+        self._len = length
+
+    def get(self, medicine: str, default=None):
+        entry = self.changes.get(medicine, self)  # self stands for "not changed"
+        if entry is self:
+            return self.base.get(medicine, default)
+        return default if entry is None else entry
+
+    def __getitem__(self, medicine: str) -> 'MedicinePrices':
+        entry = self.get(medicine)
+        if entry is None:
+            raise KeyError(medicine)
+        return entry
+
+    def __contains__(self, medicine) -> bool:
+        return self.get(medicine) is not None
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[str]:
+        changes = self.changes
+        for medicine in self.base:
+            if changes.get(medicine, True) is not None:
+                yield medicine
+        for medicine, entry in changes.items():
+            if entry is not None and medicine not in self.base:
+                yield medicine
+
+
+# A delta-updated index copies its medicine table into a plain dict once
+# the overlay holds more changes than this, or than 1/16 of the table
+OVERLAY_MIN_FLATTEN = 1024
+
+
+class PriceIndex:
+    """Read-only price table with interned pharmacy names.
+
+    Each medicine is stored as a :class:`MedicinePrices` whose pharmacy IDs
+    and prices are sorted by price. Min, max, mean and best pharmacy are
+    therefore available in O(1) to every request.
+
+    ``medicines`` is a dict, or a :class:`MedicineOverlay` for an index
+    made by ``apply_delta``.
+    """
+
+    def __init__(self, prices_dict: Optional[Dict[str, Dict[str, float]]] = None):
+        self.pharmacies: List[str] = []
+        self._pharmacy_ids: Dict[str, int] = {}
+        self.medicines: Mapping = {}
+        for medicine, pharmacy_prices in (prices_dict or {}).items():
+            if pharmacy_prices:
+                self.medicines[medicine] = self._build(medicine, pharmacy_prices)
+        self._names: Optional[Tuple[str, ...]] = None
+        self._search: Optional[MedicineSearchIndex] = None
+        self._matcher: Optional[MedicineMatcher] = None
+        self._matcher_lock = threading.Lock()
+
+    def _intern(self, pharmacy: str) -> int:
+        pharmacy_id = self._pharmacy_ids.get(pharmacy)
+        if pharmacy_id is None:
+            pharmacy_id = self._pharmacy_ids[pharmacy] = len(self.pharmacies)
+            self.pharmacies.append(pharmacy)
+        return pharmacy_id
+
+    def _build(self, medicine: str, pharmacy_prices: Dict[str, float]) -> MedicinePrices:
+        # sorted() is stable, so ties keep file order and the first pharmacy listed wins
+        ordered = sorted(pharmacy_prices.items(), key=itemgetter(1))
+        return MedicinePrices(
+            medicine,
+            array('l', [self._intern(pharmacy) for pharmacy, _ in ordered]),
+            array('d', [price for _, price in ordered]),
+            self
+        )
+
+    def __len__(self) -> int:
+        return len(self.medicines)
+
+    def __contains__(self, medicine: str) -> bool:
+        return medicine in self.medicines
+
+    def get(self, medicine: str) -> Optional[MedicinePrices]:
+        return self.medicines.get(medicine)
+
+    def names(self) -> Tuple[str, ...]:
+        """Every medicine name, in file order."""
+        if self._names is None:
+            self._names = tuple(self.medicines)
+        return self._names
+
+    def search_index(self) -> MedicineSearchIndex:
+        """Name search over this index; built on first use."""
+        if self._search is None:
+            self._search = MedicineSearchIndex(self.names())
+        return self._search
+
+    def matcher(self) -> MedicineMatcher:
+        """Automaton finding catalog names in free text; built on first use.
+
+        Concurrent first callers wait for one build rather than each
+        building their own.
+        """
+        matcher = self._matcher
+        if matcher is None:
+            with self._matcher_lock:
+                if self._matcher is None:
+                    self._matcher = MedicineMatcher(self.names())
+                matcher = self._matcher
+        return matcher
+
+    def prepare(self, popular: Iterable[str] = (), matcher: bool = True) -> 'PriceIndex':
+        """Build the name lookups, and the price tables of ``popular`` medicines, now,
+        so no request has to wait for them.
+
+        With ``matcher`` False the text matcher, by far the slowest of these
+        to build, is left for ``matcher()`` to build when first needed.
+        """
+        self.search_index()
+        if matcher:
+            self.matcher()
+        for name in popular:
+            entry = self.medicines.get(name)
+            if entry:
+                entry.price_table()
+        return self
+
+    def apply_delta(self, changes: Iterable[PriceChange]) -> 'PriceIndex':
+        """Return a new index with the changes applied; this one is left untouched.
+
+        Only the medicines named in the delta are rebuilt. Every other entry
+        and the interned pharmacy table are shared with this index, through
+        a :class:`MedicineOverlay`, so the cost follows the size of the delta
+        rather than of the catalog. A built search index is updated with the
+        names the delta added or removed; the text matcher, whose automaton
+        cannot be updated in place, is rebuilt on first use.
+        """
+        touched: Dict[str, Dict[str, float]] = {}
+        for action, medicine, pharmacy, price in changes:
+            pharmacy_prices = touched.get(medicine)
+            if pharmacy_prices is None:
+                entry = self.medicines.get(medicine)
+                pharmacy_prices = touched[medicine] = dict(entry.price_table()) if entry else {}
+            if action == DELETE:
+                pharmacy_prices.pop(pharmacy, None)
+            else:
+                pharmacy_prices[pharmacy] = price
+
+        index = PriceIndex.__new__(PriceIndex)
+        # Interning is append-only, so older indexes can keep using the shared table
+        index.pharmacies = self.pharmacies
+        index._pharmacy_ids = self._pharmacy_ids
+        if isinstance(self.medicines, MedicineOverlay):
+            base, overlay = self.medicines.base, dict(self.medicines.changes)
+        else:
+            base, overlay = self.medicines, {}
+        length = len(self.medicines)
+        added, removed = [], []
+        for medicine, pharmacy_prices in touched.items():
+            present = medicine in self.medicines
+            if pharmacy_prices:
+                overlay[medicine] = index._build(medicine, pharmacy_prices)
+                if not present:
+                    added.append(medicine)
+            elif present:
+                removed.append(medicine)
+                if medicine in base:
+                    overlay[medicine] = None
+                else:
+                    del overlay[medicine]
+        length += len(added) - len(removed)
+        index.medicines = MedicineOverlay(base, overlay, length)
+        if len(overlay) > max(OVERLAY_MIN_FLATTEN, len(base) // 16):
+            # Keeps lookups one probe deep; an occasional copy, amortized over many deltas
+            index.medicines = dict(index.medicines.items())
+
+        # Price-only deltas leave the set of names, and so the name lookups, unchanged
+        names_changed = bool(added or removed)
+        index._names = None if names_changed else self._names
+        index._search = self._search
+        if names_changed and self._search is not None:
+            index._search = self._search.with_changes(added, removed)
+        index._matcher = None if names_changed else self._matcher
+        index._matcher_lock = threading.Lock()
+        return index
+
+    def write_csv(self, csv_path: Union[str, Path]) -> None:
+        """Write the index back out in the price CSV format."""
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([MEDICINE_COLUMN, PHARMACY_COLUMN, PRICE_COLUMN])
+            for medicine, entry in self.medicines.items():
+                writer.writerows(
+                    (medicine, pharmacy, price) for pharmacy, price in entry.price_table().items()
+                )
+
+
+class PriceCatalog:
+    """Holds the live PriceIndex and swaps in a new one when prices change.
+
+    A reload builds the new index off to the side and then replaces the
+    ``index`` reference in one assignment. Readers take ``catalog.index``
+    once per request and never lock or see a half-built table.
+
+    With a ``delta_dir``, delta files dropped into that directory are
+    moved to ``delta_dir/applied`` under the next sequence number by
+    whichever process sharing the directory polls first. Every process
+    then applies them to its live index from there, in sequence order,
+    remembering the last one it applied in ``delta_sequence``. Applied
+    deltas are replayed on top of the CSV on every full reload, except
+    those the CSV already covers according to the watermark (see
+    ``delta_watermark``). A CSV the
+    watermark was not recorded for is a newer full feed: it supersedes,
+    and deletes, every delta applied before it was loaded.
+
+    ``popular``, if given, returns the names of medicines whose price
+    tables are built ahead of time whenever a new index is swapped in.
+
+    ``start_watching(load=True)`` does the first load on the watcher
+    thread too, so startup does not wait for it; ``wait_loaded`` blocks
+    until that load has been tried.
+    """
+
+    def __init__(self, csv_path: Union[str, Path], poll_interval: float = 5.0,
+                 delta_dir: Optional[Union[str, Path]] = None,
+                 popular: Optional[Callable[[], Iterable[str]]] = None):
+        self.csv_path = Path(csv_path)
+        self.poll_interval = poll_interval
+        self.delta_dir = Path(delta_dir) if delta_dir else None
+        self.popular = popular or (lambda: ())
+        self.index = PriceIndex()
+        self.generation = 0
+        self.last_reload_seconds: Optional[float] = None
+        self.last_reload_at: Optional[float] = None
+        self.last_delta_seconds: Optional[float] = None
+        self.deltas_applied = 0
+        self.delta_sequence = 0
+        self._signature = None
+        self._reload_lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    @property
+    def applied_dir(self) -> Optional[Path]:
+        return self.delta_dir / 'applied' if self.delta_dir else None
+
+    def _file_signature(self) -> Optional[CSVSignature]:
+        return csv_signature(self.csv_path)
+
+    def _delta_lock(self):
+        return delta_lock(self.delta_dir) if self.delta_dir else _no_lock()
+
+    def _csv_deltas(self) -> Tuple[Optional[CSVSignature], int, List[Tuple[int, Path]]]:
+        """The CSV's signature, the last delta sequence it covers, and the applied deltas to replay on top of it."""
+        if self.delta_dir is None:
+            return self._file_signature(), 0, []
+        with self._delta_lock():
+            signature = self._file_signature()
+            if signature is None:
+                return None, 0, []
+            recorded, covered = delta_watermark(self.delta_dir)
+            if recorded != signature:
+                # A full feed replaced the CSV: it supersedes every delta applied so far
+                covered = last_sequence(self.delta_dir)
+                write_delta_watermark(self.delta_dir, signature, covered)
+                for _, delta_path in applied_deltas(self.delta_dir):
+                    delta_path.unlink()
+            return signature, covered, applied_deltas(self.delta_dir, covered)
+
+    def wait_loaded(self, timeout: Optional[float] = None) -> bool:
+        """Block until the first load has been tried; False if ``timeout`` ran out first."""
+        return self._loaded.wait(timeout)
+
+    def reload(self) -> bool:
+        """Rebuild the index from the CSV and applied deltas; keeps the current one if that fails."""
+        try:
+            return self._reload()
+        finally:
+            self._loaded.set()
+
+    def _reload(self) -> bool:
+        signature, sequence, deltas = self._csv_deltas()
+        with self._reload_lock:
+            if signature is None:
+                fallback = "Using empty price database" if self.generation == 0 else "Keeping current prices"
+                log.warning("%s not found. %s.", self.csv_path, fallback)
+                return False
+            start = time.perf_counter()
+            try:
+                index = PriceIndex(read_price_csv(self.csv_path))
+                for sequence, delta_path in deltas:
+                    index = index.apply_delta(read_price_delta(delta_path))
+                index.prepare(self.popular())
+            except Exception as e:
+                log.exception("Error loading medicine prices: %s", e)
+                return False
+            elapsed = time.perf_counter() - start
+
+            self.index = index
+            self.delta_sequence = sequence
+            self._signature = signature
+            self.generation += 1
+            self.last_reload_seconds = elapsed
+            self.last_reload_at = time.time()
+        log.info("Loaded prices for %d medicines from %s in %.1f ms (generation %d)",
+                 len(index), self.csv_path, elapsed * 1000, self.generation)
+        return True
+
+    def apply_delta_file(self, delta_path: Union[str, Path], sequence: Optional[int] = None) -> bool:
+        """Apply one delta file to the live index; ``sequence`` is its number in ``applied/``."""
+        with self._reload_lock:
+            start = time.perf_counter()
+            try:
+                changes = read_price_delta(delta_path)
+                # The watcher builds the text matcher once the pending deltas are in
+                index = self.index.apply_delta(changes).prepare(self.popular(), matcher=False)
+            except Exception as e:
+                log.exception("Error applying price delta %s: %s", delta_path, e)
+                return False
+            elapsed = time.perf_counter() - start
+
+            self.index = index
+            if sequence is not None:
+                self.delta_sequence = sequence
+            self.generation += 1
+            self.deltas_applied += 1
+            self.last_delta_seconds = elapsed
+        log.info("Applied %d price changes from %s in %.1f ms (generation %d)",
+                 len(changes), delta_path, elapsed * 1000, self.generation)
+        return True
+
+    def ingest_pending_deltas(self) -> int:
+        """Number the deltas waiting in ``delta_dir``, then apply every one this process has not.
+
+        Deltas are numbered in name order. Returns how many were applied.
+        """
+        if self.delta_dir is None or not self.delta_dir.is_dir():
+            return 0
+        with self._delta_lock():
+            for delta_path in sorted(self.delta_dir.glob('*.csv')):
+                try:
+                    read_price_delta(delta_path)
+                except Exception as e:
+                    log.error("Rejected price delta %s: %s", delta_path, e)
+                    # Leave it out of the way so it is not retried on every poll
+                    delta_path.rename(delta_path.with_suffix('.failed'))
+                    continue
+                self.applied_dir.mkdir(exist_ok=True)
+                sequence = last_sequence(self.delta_dir) + 1
+                delta_path.rename(self.applied_dir / f"{sequence:0{SEQUENCE_DIGITS}d}-{delta_path.name}")
+        applied = 0
+        for sequence, delta_path in applied_deltas(self.delta_dir, self.delta_sequence):
+            if not self.apply_delta_file(delta_path, sequence):
+                # Gone if a compaction folded it into the CSV; reloading that CSV catches up
+                break
+            applied += 1
+        if applied:
+            # A delta that added or removed names leaves the matcher to be
+            # rebuilt; do it here, once for the whole batch, not in a request
+            self.index.matcher()
+        return applied
+
+    def refresh(self) -> None:
+        """Reload if the CSV changed, then apply new deltas; for processes that run no watcher."""
+        if self._file_signature() != self._signature:
+            self.reload()
+        self.ingest_pending_deltas()
+
+    def start_watching(self, load: bool = False) -> None:
+        """Poll the CSV and delta directory in the background and apply changes.
+
+        With ``load``, the thread first loads the CSV and applies pending deltas.
+        """
+        if self._watcher is None:
+            self._watcher = threading.Thread(
+                target=self._watch, args=(load,), name="price-watcher", daemon=True
+            )
+            self._watcher.start()
+
+    def _watch(self, load: bool = False) -> None:
+        if load:
+            self.reload()
+            self.ingest_pending_deltas()
+        pending = None
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                pending = self._poll(pending)
+            except Exception as e:
+                # A failed poll, such as the delta directory being unreadable
+                # for a moment, must not stop prices from updating for good
+                log.exception("Error checking for new prices: %s", e)
+                pending = None
+
+    def _poll(self, pending: Optional[CSVSignature]) -> Optional[CSVSignature]:
+        """Apply new deltas, and reload the CSV once it has stopped changing.
+
+        ``pending`` is the CSV signature seen on the previous poll; returns
+        the one to pass next time.
+        """
+        self.ingest_pending_deltas()
+        signature = self._file_signature()
+        if signature is None or signature == self._signature:
+            return None
+        # Only reload once the file has stopped changing, so we never
+        # read a feed that is still being written
+        if signature == pending:
+            self.reload()
+            return None
+        return signature
+
+    def status(self) -> Dict:
+        return {
+            "generation": self.generation,
+            "medicines": len(self.index),
+            "pharmacies": len(self.index.pharmacies),
+            "last_reload_seconds": self.last_reload_seconds,
+            "last_reload_at": self.last_reload_at,
+            "deltas_applied": self.deltas_applied,
+            "delta_sequence": self.delta_sequence,
+            "last_delta_seconds": self.last_delta_seconds,
+        }
+
+
+def csv_signature(csv_path: Path) -> Optional[CSVSignature]:
+    """What identifies one version of a price CSV; None if it does not exist."""
+    try:
+        stat = csv_path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+@contextmanager
+def _no_lock():
+    yield
+
+
+@contextmanager
+def delta_lock(delta_dir: Path):
+    """Hold the lock on ``delta_dir`` that every process changing it takes first."""
+    delta_dir.mkdir(parents=True, exist_ok=True)
+    # flock locks belong to the open file, so threads of one process exclude each other too
+    with open(delta_dir / LOCK_FILE, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def applied_deltas(delta_dir: Optional[Path], after: int = 0) -> List[Tuple[int, Path]]:
+    """``(sequence, path)`` of the applied deltas with a sequence above ``after``, in order."""
+    if delta_dir is None or not (delta_dir / 'applied').is_dir():
+        return []
+    deltas = []
+    for path in (delta_dir / 'applied').glob('*.csv'):
+        sequence = path.name.partition('-')[0]
+        if sequence.isdigit() and int(sequence) > after:
+            deltas.append((int(sequence), path))
+    return sorted(deltas)
+
+
+def delta_watermark(delta_dir: Path) -> Tuple[Optional[CSVSignature], int]:
+    """The CSV the watermark was recorded for, and the last delta sequence that CSV covers."""
+    try:
+        watermark = json.loads((delta_dir / WATERMARK_FILE).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return None, 0
+    return tuple(watermark['csv']), watermark['sequence']
+
+
+def write_delta_watermark(delta_dir: Path, signature: CSVSignature, sequence: int) -> None:
+    tmp_path = delta_dir / (WATERMARK_FILE + '.tmp')
+    tmp_path.write_text(json.dumps({'csv': list(signature), 'sequence': sequence}), encoding='utf-8')
+    os.replace(tmp_path, delta_dir / WATERMARK_FILE)
+
+
+def last_sequence(delta_dir: Path) -> int:
+    """The highest sequence number given to a delta so far."""
+    deltas = applied_deltas(delta_dir)
+    return max(delta_watermark(delta_dir)[1], deltas[-1][0] if deltas else 0)
+
+
+def submit_delta(delta_path: Path, delta_dir: Path) -> Path:
+    """Copy a delta into the running app's inbox without it ever seeing a partial file."""
+    delta_dir.mkdir(parents=True, exist_ok=True)
+    # Named by submission time down to the nanosecond, so that deltas are
+    # applied in the order they were submitted and never replace each other
+    now = time.time_ns()
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now // 10**9))}.{now % 10**9:09d}"
+    target = delta_dir / f"{stamp}-{delta_path.stem}.csv"
+    tmp_path = target.with_suffix('.tmp')
+    shutil.copyfile(delta_path, tmp_path)
+    os.replace(tmp_path, target)
+    return target
+
+
+def compact_deltas(csv_path: Path, delta_dir: Path) -> int:
+    """Fold applied deltas into the CSV and delete them; returns how many were folded.
+
+    Holds the delta lock throughout, so no delta is applied in the meantime
+    and the new CSV covers exactly the deltas it deletes. Deltas a newer
+    full CSV already superseded are deleted without being folded.
+    """
+    with delta_lock(delta_dir):
+        recorded, covered = delta_watermark(delta_dir)
+        folded = applied_deltas(delta_dir, covered) if recorded == csv_signature(csv_path) else []
+        index = PriceIndex(read_price_csv(csv_path))
+        for _, delta_path in folded:
+            index = index.apply_delta(read_price_delta(delta_path))
+
+        tmp_path = csv_path.with_suffix('.tmp')
+        index.write_csv(tmp_path)
+        os.replace(tmp_path, csv_path)
+        write_delta_watermark(delta_dir, csv_signature(csv_path), last_sequence(delta_dir))
+        for _, delta_path in applied_deltas(delta_dir):
+            delta_path.unlink()
+    return len(folded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage MediRemind price deltas.")
+    parser.add_argument('--catalog', default='medicine_prices.csv', help="Path to the price CSV")
+    parser.add_argument('--deltas', default='price_deltas', help="Delta directory the app watches")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    submit = subparsers.add_parser('submit', help="Queue a delta file for the running app")
+    submit.add_argument('delta', help="CSV of Action,Medicine Name,Pharmacy Name,Price rows")
+    subparsers.add_parser('compact', help="Fold applied deltas into the price CSV")
+    args = parser.parse_args()
+
+    if args.command == 'submit':
+        delta_path = Path(args.delta)
+        changes = read_price_delta(delta_path)
+        target = submit_delta(delta_path, Path(args.deltas))
+        print(f"Queued {len(changes)} price changes as {target}")
+    elif args.command == 'compact':
+        folded = compact_deltas(Path(args.catalog), Path(args.deltas))
+        print(f"Folded {folded} deltas into {args.catalog}")
+
+
+if __name__ == '__main__':
+    main()
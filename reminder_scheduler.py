@@ -0,0 +1,175 @@
+import datetime
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from metrics import Histogram
+
+log = logging.getLogger(__name__)
+
+FIRE_LAG_SECONDS = Histogram(
+    'mediremind_scheduler_lag_seconds', 'How late jobs were taken off the heap after their fire time',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 60.0, 300.0)
+)
+
+
+def next_daily_run(time_24hour: str, now: Optional[datetime.datetime] = None) -> float:
+    """Timestamp of the next time the clock reads ``time_24hour`` (HH:MM)."""
+    hour, minute = map(int, time_24hour.split(':'))
+    now = now or datetime.datetime.now()
+    run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run <= now:
+        run += datetime.timedelta(days=1)
+    return run.timestamp()
+
+
+class ScheduledJob:
+    __slots__ = ('tag', 'time_24hour', 'callback', 'args', 'next_run', 'cancelled')
+
+    def __init__(self, tag: str, time_24hour: str, callback: Callable, args: tuple, next_run: float):
+        self.tag = tag
+        self.time_24hour = time_24hour
+        self.callback = callback
+        self.args = args
+        self.next_run = next_run
+        self.cancelled = False
+
+
+class ReminderScheduler:
+    """Daily jobs kept in a min-heap ordered by their next fire time.
+
+    The run loop sleeps until the earliest job is due and is woken early when
+    a job is added or cancelled. Cancelled jobs stay in the heap and are
+    dropped when they reach the top, so both insert and cancel are O(log n)
+    at worst.
+
+    Jobs that come due together are passed as one list to ``on_due`` when
+    it is given; otherwise each job's own callback is run.
+    """
+
+    def __init__(self, on_due: Optional[Callable[[List[ScheduledJob]], None]] = None):
+        self.on_due = on_due
+        self._heap = []  # (next_run, sequence, job)
+        self._jobs: Dict[str, ScheduledJob] = {}
+        self._sequence = itertools.count()
+        self._cancelled = 0
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __contains__(self, tag: str) -> bool:
+        return tag in self._jobs
+
+    def schedule_daily(self, tag: str, time_24hour: str, callback: Callable, *args) -> ScheduledJob:
+        """Run ``callback(*args)`` every day at ``time_24hour``, replacing any job with this tag."""
+        job = ScheduledJob(tag, time_24hour, callback, args, next_daily_run(time_24hour))
+        with self._cond:
+            self._cancel(tag)
+            self._jobs[tag] = job
+            heapq.heappush(self._heap, (job.next_run, next(self._sequence), job))
+            if self._heap[0][2] is job:
+                self._cond.notify()
+        return job
+
+    def schedule_many(self, jobs: Iterable[Tuple[str, str, Callable, tuple]]) -> int:
+        """Register many ``(tag, time_24hour, callback, args)`` daily jobs in one pass.
+
+        The heap is rebuilt once instead of pushing each job, and the next
+        run is computed once per distinct time. Returns the number of jobs
+        registered.
+        """
+        now = datetime.datetime.now()
+        next_runs: Dict[str, float] = {}
+        new_jobs = []
+        for tag, time_24hour, callback, args in jobs:
+            next_run = next_runs.get(time_24hour)
+            if next_run is None:
+                try:
+                    next_run = next_runs[time_24hour] = next_daily_run(time_24hour, now)
+                except ValueError:
+                    log.warning("Skipping job %s: invalid time %r", tag, time_24hour)
+                    continue
+            new_jobs.append(ScheduledJob(tag, time_24hour, callback, args, next_run))
+
+        with self._cond:
+            for job in new_jobs:
+                old_job = self._jobs.get(job.tag)
+                if old_job is not None:
+                    old_job.cancelled = True
+                    self._cancelled += 1
+                self._jobs[job.tag] = job
+                self._heap.append((job.next_run, next(self._sequence), job))
+            heapq.heapify(self._heap)
+            self._cond.notify()
+        return len(new_jobs)
+
+    def cancel(self, tag: str) -> bool:
+        """Cancel the job with this tag; returns False if there was none."""
+        with self._cond:
+            cancelled = self._cancel(tag)
+            if cancelled:
+                self._cond.notify()
+        return cancelled
+
+    def _cancel(self, tag: str) -> bool:
+        job = self._jobs.pop(tag, None)
+        if job is None:
+            return False
+        job.cancelled = True
+        self._cancelled += 1
+        if self._cancelled > len(self._heap) // 2:
+            # Too many dead entries; rebuild the heap from live jobs only
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+        return True
+
+    def _pop_due(self) -> List[ScheduledJob]:
+        """Block until at least one job is due, then take every due job off the heap."""
+        with self._cond:
+            while True:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                    self._cancelled -= 1
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - time.time()
+                if delay <= 0:
+                    break
+                self._cond.wait(delay)
+
+            now = time.time()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                _, _, job = heapq.heappop(self._heap)
+                if job.cancelled:
+                    self._cancelled -= 1
+                    continue
+                due.append(job)
+                FIRE_LAG_SECONDS.observe(now - job.next_run)
+            # Re-arm for tomorrow before running anything
+            for job in due:
+                job.next_run = next_daily_run(job.time_24hour)
+                heapq.heappush(self._heap, (job.next_run, next(self._sequence), job))
+            return due
+
+    def run(self) -> None:
+        """Fire jobs as they come due; never returns."""
+        while True:
+            due = self._pop_due()
+            if self.on_due is not None:
+                try:
+                    self.on_due(due)
+                except Exception as e:
+                    log.exception("Error running %d scheduled jobs: %s", len(due), e)
+                continue
+            for job in due:
+                try:
+                    job.callback(*job.args)
+                except Exception as e:
+                    log.exception("Error running scheduled job %s: %s", job.tag, e)
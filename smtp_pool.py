@@ -0,0 +1,190 @@
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from email.message import Message
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+from metrics import Counter, Histogram
+
+MessageLike = Union[bytes, str, Message]
+
+SEND_SECONDS = Histogram('mediremind_smtp_send_duration_seconds',
+                         'Time to send one message, including any reconnect')
+SEND_FAILURES = Counter('mediremind_smtp_send_failures', 'Messages the SMTP server did not accept')
+
+
+class PooledConnection:
+    __slots__ = ('smtp', 'last_used', 'sent')
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.sent = 0
+
+
+class SMTPConnectionPool:
+    """Keep authenticated SMTP sessions open and reuse them across messages.
+
+    At most ``max_connections`` sessions are open at once; callers wait for a
+    free one. A session that sat idle longer than ``max_idle`` seconds, or
+    that already sent ``max_messages`` messages, is closed and replaced,
+    and a session the server dropped is reconnected once before giving up.
+    """
+
+    def __init__(self, host: str, port: int, username: Optional[str] = None,
+                 password: Optional[str] = None, use_tls: bool = True,
+                 max_connections: int = 4, max_idle: float = 60.0,
+                 max_messages: int = 100, timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_idle = max_idle
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self._idle: List[PooledConnection] = []
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+
+    def _open(self) -> PooledConnection:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        return PooledConnection(smtp)
+
+    def _discard(self, conn: PooledConnection) -> None:
+        try:
+            conn.smtp.quit()
+        except Exception:
+            conn.smtp.close()
+
+    def _checkout(self) -> PooledConnection:
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._open()
+            if now - conn.last_used <= self.max_idle:
+                return conn
+            self._discard(conn)
+
+    def _checkin(self, conn: PooledConnection) -> None:
+        if conn.sent >= self.max_messages:
+            self._discard(conn)
+            return
+        conn.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a session for the duration of the block.
+
+        The session goes back to the pool unless it was dropped: an SMTP
+        error such as a refused recipient leaves it usable.
+        """
+        with self._slots:
+            conn = self._checkout()
+            try:
+                yield conn
+            except smtplib.SMTPServerDisconnected:
+                conn.smtp.close()
+                raise
+            except smtplib.SMTPException:
+                self._checkin(conn)
+                raise
+            except OSError:
+                # A socket error smtplib did not turn into a disconnect
+                conn.smtp.close()
+                raise
+            except Exception:
+                self._checkin(conn)
+                raise
+            else:
+                self._checkin(conn)
+
+    def _send_on(self, conn: PooledConnection, from_addr: str,
+                 to_addrs: Sequence[str], msg: MessageLike) -> None:
+        if isinstance(msg, (bytes, str)):
+            conn.smtp.sendmail(from_addr, list(to_addrs), msg)
+        else:
+            conn.smtp.send_message(msg, from_addr, list(to_addrs))
+        conn.sent += 1
+
+    def send(self, from_addr: str, to_addrs: Sequence[str], msg: MessageLike) -> None:
+        """Send one message, reconnecting once if the pooled session went stale."""
+        start = time.perf_counter()
+        try:
+            try:
+                with self.connection() as conn:
+                    self._send_on(conn, from_addr, to_addrs, msg)
+            except smtplib.SMTPServerDisconnected:
+                with self.connection() as conn:
+                    self._send_on(conn, from_addr, to_addrs, msg)
+        except Exception:
+            SEND_FAILURES.inc()
+            raise
+        finally:
+            SEND_SECONDS.observe(time.perf_counter() - start)
+
+    def send_many(self, messages: Iterable[Tuple[str, Sequence[str], MessageLike]]
+                  ) -> List[Tuple[Sequence[str], Exception]]:
+        """Send many messages over as few sessions as possible.
+
+        Returns the recipients and error of every message that failed; a
+        rejected message does not stop the rest of the batch. If no session
+        can be opened at all, every message not yet sent is returned as
+        failed, so the caller never has to guess which ones went out.
+        """
+        failures = []
+        pending = iter(messages)
+        item = next(pending, None)
+        retried = False
+        while item is not None:
+            conn = None
+            try:
+                with self.connection() as conn:
+                    while item is not None:
+                        from_addr, to_addrs, msg = item
+                        try:
+                            self._send_on(conn, from_addr, to_addrs, msg)
+                        except smtplib.SMTPServerDisconnected:
+                            raise
+                        except (smtplib.SMTPException, ValueError) as e:
+                            # ValueError: an address or message that cannot be encoded
+                            failures.append((to_addrs, e))
+                        item = next(pending, None)
+                        retried = False
+                        if conn.sent >= self.max_messages:
+                            break
+            except Exception as e:
+                if conn is not None and isinstance(e, (smtplib.SMTPServerDisconnected, OSError)):
+                    # The session dropped: retry this message once on a new one
+                    if retried:
+                        failures.append((item[1], e))
+                        item = next(pending, None)
+                    retried = not retried
+                    continue
+                # No session could be opened (server unreachable, login
+                # refused), so every later attempt would fail the same way
+                failures.append((item[1], e))
+                failures.extend((to_addrs, e) for _, to_addrs, _ in pending)
+                break
+        SEND_FAILURES.inc(len(failures))
+        return failures
+
+    def close(self) -> None:
+        """Close every idle session."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
@@ -0,0 +1,397 @@
+import argparse
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from price_history import DEFAULT_CAPACITY, PriceCheckHistory
+from user_store import JournalStore
+from users import EmailAlreadyRegistered, User, UserManager, email_key
+from write_behind import WriteBehind
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    email_key TEXT NOT NULL,
+    password_hash TEXT NOT NULL,
+    streak_days INTEGER NOT NULL DEFAULT 0,
+    email_notifications INTEGER NOT NULL DEFAULT 1,
+    digest_reminders INTEGER NOT NULL DEFAULT 1,
+    reminders_version INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_email_key ON users (email_key);
+
+CREATE TABLE IF NOT EXISTS reminders (
+    user_id TEXT NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+    medicine TEXT NOT NULL,
+    time_24hour TEXT NOT NULL,
+    UNIQUE (user_id, medicine)
+);
+
+CREATE TABLE IF NOT EXISTS medications (
+    user_id TEXT NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    medicine TEXT NOT NULL,
+    PRIMARY KEY (user_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS price_checks (
+    user_id TEXT NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    medicine TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    min_price REAL NOT NULL,
+    max_price REAL NOT NULL,
+    PRIMARY KEY (user_id, position)
+);
+"""
+
+# Columns of the users table that map one-to-one onto User attributes
+USER_COLUMNS = ('name', 'email', 'password_hash', 'streak_days', 'email_notifications',
+                'digest_reminders')
+
+# Every field save_user can be asked to write
+USER_FIELDS = USER_COLUMNS + ('reminders', 'medications', 'price_checks')
+
+# Columns added to the users table after its first release, with their definitions
+ADDED_USER_COLUMNS = {
+    'digest_reminders': "INTEGER NOT NULL DEFAULT 1",
+    'reminders_version': "INTEGER NOT NULL DEFAULT 0",
+}
+
+# Created after ADDED_USER_COLUMNS, which may add the columns they cover
+INDEXES = """
+CREATE INDEX IF NOT EXISTS users_reminders_version ON users (reminders_version);
+"""
+
+
+class SQLiteUserManager(UserManager):
+    """UserManager backed by an SQLite database instead of users.json.
+
+    Users are read from the database on every lookup, so several web workers
+    can share one database file. WAL mode lets those readers run while
+    another connection is writing. Each write of a user's reminders stamps
+    the user with a new, higher ``reminders_version``, which is how a
+    scheduler process finds the reminders changed since it last looked
+    (see ``changed_reminders``).
+
+    With ``write_behind``, changed users are written in one transaction per
+    write-behind batch; until then lookups in this process return the
+    changed user object rather than the stored row. That is only safe while
+    this process is the one writing. Without it, as in web workers sharing
+    the database, ``user_lock`` also holds an IMMEDIATE transaction, so a
+    user is read, changed and saved while no other process can write, and
+    ``save_user`` writes within it.
+    """
+
+    def __init__(self, db_path='users.db', price_history_size=DEFAULT_CAPACITY,
+                 flush_interval=0.05, write_behind=True):
+        self.db_path = db_path
+        self.price_history_size = price_history_size
+        self.write_behind = write_behind
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._user_locks = {}
+        self.writes = WriteBehind(self._write_users, flush_interval)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            existing = {row['name'] for row in conn.execute("PRAGMA table_info(users)")}
+            for column, definition in ADDED_USER_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE users ADD COLUMN {column} {definition}")
+            conn.executescript(INDEXES)
+        if write_behind:
+            self.writes.start()
+        log.info("Using SQLite user database at %s", self.db_path)
+
+    def _connect(self):
+        # sqlite3 connections may not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """This thread's connection inside an IMMEDIATE transaction; nested uses join the outer one."""
+        conn = self._connect()
+        depth = getattr(self._local, 'depth', 0)
+        if not depth:
+            conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            if not depth:
+                conn.rollback()
+            raise
+        else:
+            if not depth:
+                conn.commit()
+        finally:
+            self._local.depth = depth
+
+    def user_lock(self, user_id):
+        """Re-entrant lock to hold while reading, changing and saving one user.
+
+        Without write-behind it is also a transaction, which other
+        processes sharing the database have to wait for.
+        """
+        if self.write_behind:
+            return super().user_lock(user_id)
+        return self._user_transaction(user_id)
+
+    @contextmanager
+    def _user_transaction(self, user_id):
+        with super().user_lock(user_id), self._transaction():
+            yield
+
+    def load_users(self):
+        pass
+
+    def _index_email(self, user, old_email=None):
+        # The unique index on users.email_key does this job
+        pass
+
+    def save_users(self):
+        """Write any changes still waiting for the next batch."""
+        self.writes.flush()
+
+    def save_user(self, user, *fields):
+        """Write the given fields of one user, or the whole record if none are given.
+
+        Queued for the next batch with write-behind, except email changes:
+        those are written now, so that a clash on the unique email index
+        reaches the caller as EmailAlreadyRegistered instead of being logged
+        by a later batch.
+        """
+        if self.write_behind and 'email' not in fields:
+            self.writes.mark(user, fields)
+            return
+        data = self._snapshot(user, fields)
+        with self._transaction() as conn:
+            conn.execute("SAVEPOINT write_user")
+            try:
+                self._write_user(conn, user.user_id, data, not fields)
+            except sqlite3.IntegrityError:
+                # The email index is the only constraint a user's own rows can break
+                conn.execute("ROLLBACK TO write_user")
+                raise EmailAlreadyRegistered(user.email) from None
+            finally:
+                conn.execute("RELEASE write_user")
+
+    def _snapshot(self, user, fields=()):
+        """Values of the given fields of ``user``, or of all of them, copied under its lock."""
+        with super().user_lock(user.user_id):
+            data = {}
+            for field in fields or USER_FIELDS:
+                if field == 'reminders':
+                    data[field] = list(user.reminders.items())
+                elif field == 'medications':
+                    data[field] = list(user.medications)
+                elif field == 'price_checks':
+                    data[field] = user.price_checks.recent()
+                else:
+                    data[field] = getattr(user, field)
+            return data
+
+    def _write_users(self, batch):
+        # Copied before the transaction begins: holding the database's write
+        # lock while waiting for a user lock would deadlock with a request
+        # that holds the user lock and is waiting to write
+        snapshots = [(user.user_id, self._snapshot(user, fields), not fields) for user, fields in batch]
+        with self._transaction() as conn:
+            for user_id, data, whole in snapshots:
+                conn.execute("SAVEPOINT write_user")
+                try:
+                    self._write_user(conn, user_id, data, whole)
+                except sqlite3.IntegrityError as e:
+                    # One bad record must not cost the rest of the batch
+                    conn.execute("ROLLBACK TO write_user")
+                    log.error("Error saving user %s: %s", user_id, e)
+                conn.execute("RELEASE write_user")
+
+    def _write_user(self, conn, user_id, data, whole=False):
+        """Write a ``_snapshot`` of a user; ``whole`` inserts or replaces the entire record."""
+        if whole:
+            conn.execute(
+                "INSERT INTO users (user_id, name, email, email_key, password_hash,"
+                " streak_days, email_notifications, digest_reminders) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (user_id) DO UPDATE SET name = excluded.name,"
+                " email = excluded.email, email_key = excluded.email_key,"
+                " password_hash = excluded.password_hash, streak_days = excluded.streak_days,"
+                " email_notifications = excluded.email_notifications,"
+                " digest_reminders = excluded.digest_reminders",
+                (user_id, data['name'], data['email'], email_key(data['email']), data['password_hash'],
+                 data['streak_days'], int(data['email_notifications']), int(data['digest_reminders']))
+            )
+            columns = []
+        else:
+            columns = [field for field in data if field in USER_COLUMNS]
+        if columns:
+            assignments = [f"{column} = ?" for column in columns]
+            values = [data[column] for column in columns]
+            if 'email' in columns:
+                assignments.append("email_key = ?")
+                values.append(email_key(data['email']))
+            conn.execute(
+                f"UPDATE users SET {', '.join(assignments)} WHERE user_id = ?",
+                values + [user_id]
+            )
+
+        if 'reminders' in data:
+            # Writes are serialized, so each one gets a version above every committed one
+            conn.execute(
+                "UPDATE users SET reminders_version = (SELECT MAX(reminders_version) FROM users) + 1"
+                " WHERE user_id = ?", (user_id,)
+            )
+            conn.execute("DELETE FROM reminders WHERE user_id = ?", (user_id,))
+            conn.executemany(
+                "INSERT INTO reminders (user_id, medicine, time_24hour) VALUES (?, ?, ?)",
+                [(user_id, medicine, time_24hour) for medicine, time_24hour in data['reminders']]
+            )
+        if 'medications' in data:
+            conn.execute("DELETE FROM medications WHERE user_id = ?", (user_id,))
+            conn.executemany(
+                "INSERT INTO medications (user_id, position, medicine) VALUES (?, ?, ?)",
+                [(user_id, position, medicine) for position, medicine in enumerate(data['medications'])]
+            )
+        if 'price_checks' in data:
+            conn.execute("DELETE FROM price_checks WHERE user_id = ?", (user_id,))
+            conn.executemany(
+                "INSERT INTO price_checks (user_id, position, medicine, timestamp, min_price, max_price)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(user_id, position, check['medicine'], check['timestamp'],
+                  check['min_price'], check['max_price'])
+                 for position, check in enumerate(data['price_checks'])]
+            )
+
+    def _read_user(self, conn, row):
+        user = User(row['name'], row['email'], row['password_hash'], user_id=row['user_id'],
+                    price_history_size=self.price_history_size)
+        user.streak_days = row['streak_days']
+        user.email_notifications = bool(row['email_notifications'])
+        user.digest_reminders = bool(row['digest_reminders'])
+        user.reminders = {
+            r['medicine']: r['time_24hour'] for r in conn.execute(
+                "SELECT medicine, time_24hour FROM reminders WHERE user_id = ? ORDER BY rowid",
+                (user.user_id,))
+        }
+        user.medications = [
+            r['medicine'] for r in conn.execute(
+                "SELECT medicine FROM medications WHERE user_id = ? ORDER BY position",
+                (user.user_id,))
+        ]
+        # Rows are stored newest first (position 0), in the old list-of-dicts layout
+        user.price_checks = PriceCheckHistory.from_data([
+            dict(r) for r in conn.execute(
+                "SELECT medicine, timestamp, min_price, max_price FROM price_checks"
+                " WHERE user_id = ? ORDER BY position",
+                (user.user_id,))
+        ], self.price_history_size)
+        return user
+
+    def get_user_by_email(self, email):
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM users WHERE email_key = ?", (email_key(email),)).fetchone()
+        if not row:
+            return None
+        return self.writes.pending(row['user_id']) or self._read_user(conn, row)
+
+    def get_user_by_id(self, user_id):
+        pending = self.writes.pending(user_id)
+        if pending:
+            return pending
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return self._read_user(conn, row) if row else None
+
+    def counts(self):
+        conn = self._connect()
+        users, reminders = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM users), (SELECT COUNT(*) FROM reminders)"
+        ).fetchone()
+        return {'users': users, 'reminders': reminders}
+
+    def iter_reminders(self):
+        conn = self._connect()
+        yield from conn.execute("SELECT user_id, medicine, time_24hour FROM reminders ORDER BY rowid")
+
+    def changed_reminders(self, since=-1):
+        """Reminders of every user whose reminders changed after version ``since``.
+
+        Returns ``(version, {user_id: {medicine: time_24hour}})``; pass the
+        version back in to get only later changes. A user whose reminders
+        were all removed maps to an empty dict. The default returns them all.
+        """
+        conn = self._connect()
+        # One statement reads one consistent snapshot of the database
+        rows = conn.execute(
+            "SELECT u.user_id, u.reminders_version, r.medicine, r.time_24hour FROM users u"
+            " LEFT JOIN reminders r ON r.user_id = u.user_id"
+            " WHERE u.reminders_version > ? ORDER BY r.rowid",
+            (since,)
+        ).fetchall()
+        version = since
+        changed = {}
+        for user_id, reminders_version, medicine, time_24hour in rows:
+            version = max(version, reminders_version)
+            reminders = changed.setdefault(user_id, {})
+            if medicine is not None:
+                reminders[medicine] = time_24hour
+        return version, changed
+
+    def create_user(self, name, email, password):
+        user = User(name, email, self._hash_password(password),
+                    price_history_size=self.price_history_size)
+        try:
+            with self._transaction() as conn:
+                self._write_user(conn, user.user_id, self._snapshot(user), whole=True)
+        except sqlite3.IntegrityError:
+            # Email already registered
+            return None
+        return user
+
+    def import_users(self, users_data):
+        """Insert users from their dict form in one transaction; returns (imported, skipped)."""
+        imported, skipped = 0, []
+        with self._connect() as conn:
+            for user_data in users_data.values():
+                user = User.from_dict(user_data, self.price_history_size)
+                try:
+                    self._write_user(conn, user.user_id, self._snapshot(user), whole=True)
+                    imported += 1
+                except sqlite3.IntegrityError:
+                    skipped.append(user.email)
+        return imported, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the MediRemind SQLite user database.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate = subparsers.add_parser('migrate', help="Import users from users.json (and its journal)")
+    migrate.add_argument('--json', default='users.json', help="Path to users.json")
+    migrate.add_argument('--db', default='users.db', help="Path to the SQLite database")
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        users_data = {}
+        store = JournalStore(args.json, snapshot_source=lambda: users_data)
+        users_data.update(store.load())
+        imported, skipped = SQLiteUserManager(args.db).import_users(users_data)
+        print(f"Imported {imported} users from {args.json} into {args.db}")
+        for email in skipped:
+            print(f"Skipped {email}: email already registered")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """How long each startup phase took, and how long until the first request.
+
+    The clock starts when the timer is created, so create it before the
+    imports it should account for. Phases are timed with ``phase`` and
+    ``ready`` marks the end of startup; ``request_started`` records the
+    first request it sees and logs how long it took.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        self.ready_after: Optional[float] = None
+        self.first_request_after: Optional[float] = None
+        self._last = self.started
+        self._lock = threading.Lock()
+
+    def mark(self, name: str) -> None:
+        """Close a phase that ran from the previous mark or phase until now."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._last = time.perf_counter()
+            self.phases.append((name, self._last - start))
+
+    def ready(self) -> None:
+        self.ready_after = time.perf_counter() - self.started
+        log.info("Started in %s", self.report())
+
+    def request_started(self) -> None:
+        if self.first_request_after is not None:
+            return
+        with self._lock:
+            if self.first_request_after is None:
+                self.first_request_after = time.perf_counter() - self.started
+                log.info("First request %.0f ms after startup began", self.first_request_after * 1000)
+
+    def report(self) -> str:
+        phases = ', '.join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.phases)
+        total = self.ready_after if self.ready_after is not None else time.perf_counter() - self.started
+        return f"{total * 1000:.0f} ms ({phases})"
+
+    def to_dict(self) -> Dict:
+        return {
+            "phases": {name: seconds for name, seconds in self.phases},
+            "ready_seconds": self.ready_after,
+            "first_request_seconds": self.first_request_after,
+        }
@@ -0,0 +1,108 @@
+import socket
+import socketserver
+import threading
+from typing import List, Tuple
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            server.sessions.append(self.request)
+        mail_from, rcpt_to = None, []
+        self.reply('220 fake ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250-fake\r\n250 AUTH PLAIN LOGIN')
+            elif verb == 'AUTH':
+                self.reply('235 Authentication successful' if server.accept_logins
+                           else '535 Authentication credentials invalid')
+            elif verb == 'MAIL':
+                mail_from, rcpt_to = command.split(':', 1)[1].strip(' <>'), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                rcpt_to.append(command.split(':', 1)[1].strip(' <>'))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in self.rfile:
+                    if data_line == b'.\r\n':
+                        break
+                    data.append(data_line)
+                with server.lock:
+                    if server.rejections:
+                        server.rejections -= 1
+                        rejected = True
+                    else:
+                        server.messages.append((mail_from, rcpt_to, b''.join(data)))
+                        rejected = False
+                self.reply('451 Try again later' if rejected else '250 Queued')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+    def reply(self, text: str) -> None:
+        self.wfile.write(text.encode('ascii') + b'\r\n')
+        self.wfile.flush()
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """Plain-text SMTP server on localhost that keeps every message it accepts.
+
+    ``messages`` holds ``(from, [to, ...], data)`` per accepted message and
+    ``connections`` counts sessions opened. ``reject(n)`` makes the next
+    ``n`` messages fail with a temporary 451 error, ``drop_sessions`` cuts
+    every open session, as a server timing out idle clients would, and
+    setting ``accept_logins`` to False refuses every login.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.lock = threading.Lock()
+        self.messages: List[Tuple[str, List[str], bytes]] = []
+        self.sessions: List[socket.socket] = []
+        self.connections = 0
+        self.rejections = 0
+        self.accept_logins = True
+
+    @property
+    def host(self) -> str:
+        return self.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def reject(self, count: int) -> None:
+        with self.lock:
+            self.rejections = count
+
+    def drop_sessions(self) -> None:
+        with self.lock:
+            sessions, self.sessions = self.sessions, []
+        for session in sessions:
+            try:
+                session.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.drop_sessions()
+        self.server_close()
@@ -0,0 +1,73 @@
+import datetime
+import email
+
+import pytest
+
+from email_templates import ReminderEmailTemplate
+
+NOW = datetime.datetime(2025, 3, 1, 8, 30)
+
+
+@pytest.fixture
+def template():
+    return ReminderEmailTemplate('mediremind@example.com')
+
+
+def headers_of(message: bytes):
+    return message.split(b'\r\n\r\n', 1)[0].split(b'\r\n')
+
+
+def test_render_parses_as_html_email(template):
+    parsed = email.message_from_bytes(template.render('zoe@example.com', 'Zoë <b>', ['Aspirin'], NOW))
+
+    assert parsed['To'] == 'zoe@example.com'
+    assert parsed['Subject'] == 'MediRemind: Time to take Aspirin'
+    assert parsed.get_content_type() == 'text/html'
+    assert 'Zo&#235; &lt;b&gt;' in parsed.get_payload()
+
+
+def test_medicine_name_cannot_inject_headers(template):
+    message = template.render('zoe@example.com', 'Zoe', ['Aspirin\r\nBcc: someone@evil.example'], NOW)
+
+    parsed = email.message_from_bytes(message)
+    assert parsed['Bcc'] is None
+    assert parsed['Subject'] == 'MediRemind: Time to take Aspirin Bcc: someone@evil.example'
+    assert not any(line.startswith(b'Bcc') for line in headers_of(message))
+
+
+@pytest.mark.parametrize('address', ['zoe@example.com\r\nBcc: someone@evil.example',
+                                     'zoe@example.com\nBcc: someone@evil.example'])
+def test_address_with_line_break_is_refused(template, address):
+    with pytest.raises(ValueError):
+        template.render(address, 'Zoe', ['Aspirin'], NOW)
+
+
+def test_non_ascii_addresses_are_encoded(template):
+    idna = email.message_from_bytes(template.render('zoe@bücher.example', 'Zoe', ['Aspirin'], NOW))
+    assert idna['To'] == 'zoe@xn--bcher-kva.example'
+
+    message = template.render('zoë@bücher.example', 'Zoe', ['Aspirin'], NOW)
+    assert message.isascii()
+    assert str(email.header.make_header(email.header.decode_header(
+        email.message_from_bytes(message)['To']))) == 'zoë@bücher.example'
+
+
+def test_long_non_ascii_subject_is_folded_with_crlf(template):
+    message = template.render('zoe@example.com', 'Zoe', ['Paracétamol'] * 200, NOW)
+
+    for line in headers_of(message):
+        assert b'\n' not in line and b'\r' not in line
+        assert len(line) <= 998
+
+
+def test_render_many_skips_unrenderable_recipients(template):
+    failed = []
+    recipients = [('a@example.com', 'A', ['Aspirin']),
+                  ('b@example.com\r\nBcc: someone@evil.example', 'B', ['Aspirin']),
+                  ('c@example.com', 'C', ['Aspirin'])]
+
+    rendered = list(template.render_many(recipients, NOW, failed=failed))
+
+    assert [to for to, _ in rendered] == ['a@example.com', 'c@example.com']
+    assert rendered[0][1] == template.render('a@example.com', 'A', ['Aspirin'], NOW)
+    assert [to for to, _ in failed] == ['b@example.com\r\nBcc: someone@evil.example']
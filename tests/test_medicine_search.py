@@ -0,0 +1,81 @@
+import heapq
+import itertools
+import random
+
+import pytest
+
+from medicine_search import MIN_SIMILARITY, MedicineSearchIndex, trigrams
+
+MAKERS = ('Apex', 'Cipla', 'Healix', 'Lupin', 'Novacare', 'Zydex')
+STEMS = ('Amoxicillin', 'Atorvastatin', 'Cetirizine', 'Levocetirizine', 'Metformin', 'Omeprazole',
+         'Pantoprazole', 'Paracetamol')
+STRENGTHS = ('5mg', '10mg', '250mg', '500mg', '1g')
+FORMS = ('Tablets', 'Capsules', 'Syrup', 'Gel')
+
+
+def catalog(seed=1, size=600):
+    names = [' '.join(parts) for parts in itertools.product(MAKERS, STEMS, STRENGTHS, FORMS)]
+    return random.Random(seed).sample(names, size)
+
+
+def typo(text, rng):
+    position = rng.randrange(len(text))
+    return text[:position] + rng.choice('aeiouxz') + text[position + 1:]
+
+
+def brute_force(names, query, limit):
+    # Every name scored, the ranking fuzzy() must reproduce
+    grams = set(trigrams(query.casefold()))
+    scored = []
+    for name_id, name in enumerate(names):
+        if name is None:
+            continue
+        name_grams = set(trigrams(name.casefold()))
+        common = len(grams & name_grams)
+        if common:
+            scored.append((2 * common / (len(grams) + len(name_grams)), name_id))
+    best = heapq.nlargest(limit, scored)
+    return [names[name_id] for score, name_id in best if score >= MIN_SIMILARITY]
+
+
+def queries(names, seed=2):
+    rng = random.Random(seed)
+    result = ['amoxicilin', 'tablets', '500mg', 'mg', 'x', 'Ωmega', 'healix paracetamol 5mg gel']
+    for name in rng.sample(names, 60):
+        words = name.lower().split()
+        result.append(typo(rng.choice([name.lower(), ' '.join(words[1:3]), words[1]]), rng))
+    return result
+
+
+@pytest.mark.parametrize('limit', [1, 3, 10, 40])
+def test_fuzzy_matches_scoring_every_name(limit):
+    names = catalog()
+    index = MedicineSearchIndex(names)
+
+    for query in queries(names):
+        assert index.fuzzy(query, limit) == brute_force(names, query, limit), query
+
+
+def test_fuzzy_after_changes_matches_scoring_every_name():
+    names = catalog()
+    rng = random.Random(3)
+    removed = rng.sample(names, 100)
+    added = [f"Medley {name.split(' ', 1)[1]}" for name in rng.sample(names, 100)]
+
+    index = MedicineSearchIndex(names).with_changes(added, removed)
+
+    removed = set(removed)
+    remaining = [None if name in removed else name for name in names] + added
+    for query in queries([name for name in remaining if name is not None]):
+        assert index.fuzzy(query) == brute_force(remaining, query, 10), query
+
+
+def test_name_removed_then_added_back_is_found():
+    names = catalog(size=50)
+    index = MedicineSearchIndex(names).with_changes(removed=[names[0]])
+    assert names[0] not in index.fuzzy(names[0])
+
+    index = index.with_changes(added=[names[0]])
+
+    assert index.fuzzy(names[0])[0] == names[0]
+    assert index.search(names[0][:6]).count(names[0]) == 1
@@ -0,0 +1,177 @@
+import smtplib
+import socket
+import threading
+import time
+
+import pytest
+
+from notifications import NotificationDispatcher
+from smtp_pool import SMTPConnectionPool
+from tests.fake_smtp import FakeSMTPServer
+
+
+def make_message(to):
+    return (f"From: mediremind@example.com\r\nTo: {to}\r\nSubject: Reminder\r\n\r\n"
+            f"Time to take your medicine, {to}\r\n").encode('ascii')
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def smtp_server():
+    with FakeSMTPServer() as server:
+        yield server
+
+
+@pytest.fixture
+def pool(smtp_server):
+    pool = SMTPConnectionPool(smtp_server.host, smtp_server.port, username='user', password='secret',
+                              use_tls=False, max_connections=2, timeout=5)
+    yield pool
+    pool.close()
+
+
+def test_pool_reuses_sessions(smtp_server, pool):
+    threads = [
+        threading.Thread(target=lambda i=i: [
+            pool.send('mediremind@example.com', [f'user{i}.{n}@example.com'],
+                      make_message(f'user{i}.{n}@example.com'))
+            for n in range(10)
+        ])
+        for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(smtp_server.messages) == 40
+    # Never more sessions than the pool allows at once, each used many times
+    assert smtp_server.connections <= 2
+
+
+def test_pool_recycles_session_after_max_messages(smtp_server):
+    pool = SMTPConnectionPool(smtp_server.host, smtp_server.port, use_tls=False,
+                              max_connections=1, max_messages=3, timeout=5)
+    for n in range(7):
+        pool.send('mediremind@example.com', [f'user{n}@example.com'], make_message(f'user{n}@example.com'))
+    pool.close()
+
+    assert len(smtp_server.messages) == 7
+    assert smtp_server.connections == 3
+
+
+def test_pool_reconnects_when_server_drops_session(smtp_server, pool):
+    pool.send('mediremind@example.com', ['first@example.com'], make_message('first@example.com'))
+    smtp_server.drop_sessions()
+
+    pool.send('mediremind@example.com', ['second@example.com'], make_message('second@example.com'))
+
+    assert [to for _, to, _ in smtp_server.messages] == [['first@example.com'], ['second@example.com']]
+    assert smtp_server.connections == 2
+
+
+def test_send_many_reports_rejected_messages(smtp_server, pool):
+    smtp_server.reject(1)
+    recipients = [f'user{n}@example.com' for n in range(5)]
+
+    failures = pool.send_many(
+        ('mediremind@example.com', [to], make_message(to)) for to in recipients
+    )
+
+    assert [to_addrs for to_addrs, _ in failures] == [['user0@example.com']]
+    assert [to for _, (to, ), _ in smtp_server.messages] == recipients[1:]
+    assert smtp_server.connections == 1
+
+
+def test_send_many_fails_every_message_when_login_is_refused(smtp_server, pool):
+    smtp_server.accept_logins = False
+    recipients = [f'user{n}@example.com' for n in range(50)]
+
+    failures = pool.send_many(
+        ('mediremind@example.com', [to], make_message(to)) for to in recipients
+    )
+
+    assert [to_addrs for to_addrs, _ in failures] == [[to] for to in recipients]
+    assert all(isinstance(error, smtplib.SMTPAuthenticationError) for _, error in failures)
+    assert smtp_server.messages == []
+    # One refused login fails the batch; it is not retried per message
+    assert smtp_server.connections == 1
+
+
+def test_send_many_fails_fast_when_server_is_unreachable():
+    with socket.socket() as unused:
+        unused.bind(('127.0.0.1', 0))
+        port = unused.getsockname()[1]
+    pool = SMTPConnectionPool('127.0.0.1', port, use_tls=False, timeout=5)
+
+    failures = pool.send_many(
+        ('mediremind@example.com', [f'user{n}@example.com'], b'Subject: x\r\n\r\nx') for n in range(20)
+    )
+
+    assert len(failures) == 20
+    assert all(isinstance(error, ConnectionRefusedError) for _, error in failures)
+
+
+def test_rejected_message_keeps_session_in_pool(smtp_server, pool):
+    smtp_server.reject(1)
+
+    with pytest.raises(smtplib.SMTPDataError):
+        pool.send('mediremind@example.com', ['first@example.com'], make_message('first@example.com'))
+    pool.send('mediremind@example.com', ['second@example.com'], make_message('second@example.com'))
+
+    assert [to for _, to, _ in smtp_server.messages] == [['second@example.com']]
+    assert smtp_server.connections == 1
+
+
+def test_dispatcher_retries_failed_email(smtp_server, pool):
+    dispatcher = NotificationDispatcher(retry_backoff=0.01)
+    dispatcher.add_channel('email', workers=2, max_retries=3)
+    smtp_server.reject(2)
+
+    assert dispatcher.submit('email', pool.send, 'mediremind@example.com', ['retry@example.com'],
+                             make_message('retry@example.com'))
+
+    assert wait_for(lambda: dispatcher.metrics()['email']['delivered'] == 1)
+    metrics = dispatcher.metrics()['email']
+    assert metrics['retried'] == 2
+    assert metrics['failed'] == 0
+    assert [to for _, to, _ in smtp_server.messages] == [['retry@example.com']]
+
+
+def test_dispatcher_gives_up_after_max_retries(smtp_server, pool):
+    dispatcher = NotificationDispatcher(retry_backoff=0.01)
+    dispatcher.add_channel('email', workers=1, max_retries=1)
+    smtp_server.reject(5)
+
+    dispatcher.submit('email', pool.send, 'mediremind@example.com', ['never@example.com'],
+                      make_message('never@example.com'))
+
+    assert wait_for(lambda: dispatcher.metrics()['email']['failed'] == 1)
+    metrics = dispatcher.metrics()['email']
+    assert metrics['retried'] == 1
+    assert metrics['delivered'] == 0
+    assert smtp_server.messages == []
+
+
+def test_slow_channel_does_not_hold_up_another(smtp_server, pool):
+    dispatcher = NotificationDispatcher()
+    dispatcher.add_channel('voice', workers=1)
+    dispatcher.add_channel('email', workers=2)
+    release = threading.Event()
+    dispatcher.submit('voice', release.wait)
+
+    for n in range(5):
+        to = f'user{n}@example.com'
+        dispatcher.submit('email', pool.send, 'mediremind@example.com', [to], make_message(to))
+
+    assert wait_for(lambda: len(smtp_server.messages) == 5)
+    assert dispatcher.metrics()['voice']['in_flight'] == 1
+    release.set()
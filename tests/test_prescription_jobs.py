@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from prescription_jobs import DONE, FAILED, PrescriptionJobQueue
+
+
+def wait_finished(queue, job, user_id='user'):
+    for _ in range(300):
+        state = queue.get(job.job_id, user_id).to_dict()['state']
+        if state in (DONE, FAILED):
+            return queue.get(job.job_id, user_id).to_dict()
+        time.sleep(0.1)
+    raise AssertionError(f"job {job.job_id} never finished")
+
+
+@pytest.fixture
+def upload(tmp_path):
+    csv_path = tmp_path / 'medicine_prices.csv'
+    csv_path.write_text('Medicine Name,Pharmacy Name,Price\nAspirin,Pharmacy A,5\nIbuprofen,Pharmacy A,8\n')
+    image_path = tmp_path / 'upload.jpg'
+    image_path.write_bytes(b'\0' * 1024)
+    return str(csv_path), image_path, str(tmp_path / 'jobs.db')
+
+
+def test_medicines_are_found_in_the_worker_and_the_upload_removed(upload):
+    csv_path, image_path, db_path = upload
+    queue = PrescriptionJobQueue(lambda user_id, names: {'user': user_id, 'names': names}, csv_path, db_path=db_path, workers=1)
+    try:
+        job = queue.submit('user', 'aspirin scan.jpg', str(image_path), remove_image=True)
+        finished = wait_finished(queue, job)
+    finally:
+        queue.shutdown()
+
+    assert finished['state'] == DONE
+    assert finished['result'] == {'user': 'user', 'names': ['Aspirin']}
+    assert not image_path.exists()
+
+
+def test_failure_to_finish_fails_the_job(upload, caplog):
+    csv_path, image_path, db_path = upload
+
+    def finish(user_id, names):
+        raise RuntimeError('user store unavailable')
+
+    queue = PrescriptionJobQueue(finish, csv_path, db_path=db_path, workers=1)
+    try:
+        job = queue.submit('user', 'aspirin scan.jpg', str(image_path))
+        finished = wait_finished(queue, job)
+    finally:
+        queue.shutdown()
+
+    assert finished['state'] == FAILED
+    assert finished['error'] == 'user store unavailable'
+    assert 'user store unavailable' in caplog.text
+    assert image_path.exists()
+
+
+def test_web_workers_sharing_the_job_database_see_each_others_jobs(upload):
+    csv_path, image_path, db_path = upload
+    workers = [PrescriptionJobQueue(lambda user_id, names: names, csv_path, db_path=db_path,
+                                    workers=1, max_per_user=2)
+               for _ in range(2)]
+    try:
+        jobs = [worker.submit('user', 'aspirin scan.jpg', str(image_path)) for worker in workers]
+        # The user's limit counts the jobs queued by every worker
+        assert workers[0].submit('user', 'aspirin scan.jpg', str(image_path)) is None
+        finished = [wait_finished(workers[1], job) for job in jobs]
+    finally:
+        for worker in workers:
+            worker.shutdown()
+
+    assert [job['result'] for job in finished] == [['Aspirin'], ['Aspirin']]
+    assert workers[1].get(jobs[0].job_id, 'someone else') is None
+    assert workers[0].submit('user', 'aspirin scan.jpg', str(image_path)) is not None
+    workers[0].shutdown()
@@ -0,0 +1,165 @@
+import os
+import time
+
+import pytest
+
+from prices import PriceCatalog, compact_deltas, submit_delta
+
+
+def write_prices(path, prices):
+    lines = ['Medicine Name,Pharmacy Name,Price'] + [f'{name},Pharmacy A,{price}' for name, price in prices.items()]
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+def write_delta(path, changes):
+    lines = ['Action,Medicine Name,Pharmacy Name,Price'] + [f'upsert,{name},Pharmacy A,{price}'
+                                                          for name, price in changes.items()]
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return path
+
+
+def price(catalog, name):
+    return catalog.index.get(name).price_table()['Pharmacy A']
+
+
+@pytest.fixture
+def feed(tmp_path):
+    csv_path = tmp_path / 'medicine_prices.csv'
+    write_prices(csv_path, {'Aspirin': 5.0, 'Ibuprofen': 8.0})
+    return csv_path, tmp_path / 'price_deltas'
+
+
+def submit(tmp_path, delta_dir, changes):
+    source = write_delta(tmp_path / 'delta.csv', changes)
+    return submit_delta(source, delta_dir)
+
+
+def test_applied_deltas_are_replayed_on_reload(tmp_path, feed):
+    csv_path, delta_dir = feed
+    catalog = PriceCatalog(csv_path, delta_dir=delta_dir)
+    catalog.reload()
+    submit(tmp_path, delta_dir, {'Aspirin': 1.0})
+    submit(tmp_path, delta_dir, {'Aspirin': 2.0, 'Ibuprofen': 3.0})
+
+    assert catalog.ingest_pending_deltas() == 2
+    assert (price(catalog, 'Aspirin'), price(catalog, 'Ibuprofen')) == (2.0, 3.0)
+
+    restarted = PriceCatalog(csv_path, delta_dir=delta_dir)
+    restarted.reload()
+    assert (price(restarted, 'Aspirin'), price(restarted, 'Ibuprofen')) == (2.0, 3.0)
+
+
+def test_new_full_feed_supersedes_applied_deltas(tmp_path, feed):
+    csv_path, delta_dir = feed
+    catalog = PriceCatalog(csv_path, delta_dir=delta_dir)
+    catalog.reload()
+    submit(tmp_path, delta_dir, {'Aspirin': 1.0})
+    catalog.ingest_pending_deltas()
+    write_prices(csv_path, {'Aspirin': 10.0, 'Ibuprofen': 8.0})
+
+    assert catalog.reload()
+    assert price(catalog, 'Aspirin') == 10.0
+    submit(tmp_path, delta_dir, {'Ibuprofen': 4.0})
+    catalog.ingest_pending_deltas()
+
+    compact_deltas(csv_path, delta_dir)
+    catalog.reload()
+    assert (price(catalog, 'Aspirin'), price(catalog, 'Ibuprofen')) == (10.0, 4.0)
+    assert list((delta_dir / 'applied').glob('*.csv')) == []
+
+
+def test_compaction_does_not_revive_deltas_of_an_unloaded_feed(tmp_path, feed):
+    csv_path, delta_dir = feed
+    catalog = PriceCatalog(csv_path, delta_dir=delta_dir)
+    catalog.reload()
+    submit(tmp_path, delta_dir, {'Aspirin': 1.0})
+    catalog.ingest_pending_deltas()
+    # A new full feed lands, and is compacted before any app reloads it;
+    # apart in time, as they would be, so file times alone order them
+    time.sleep(0.05)
+    write_prices(csv_path, {'Aspirin': 10.0, 'Ibuprofen': 8.0})
+    time.sleep(0.05)
+
+    assert compact_deltas(csv_path, delta_dir) == 0
+    catalog.reload()
+    assert price(catalog, 'Aspirin') == 10.0
+
+
+def test_delta_with_the_csvs_mtime_is_kept(tmp_path, feed):
+    csv_path, delta_dir = feed
+    catalog = PriceCatalog(csv_path, delta_dir=delta_dir)
+    catalog.reload()
+    submit(tmp_path, delta_dir, {'Aspirin': 1.0})
+    catalog.ingest_pending_deltas()
+    mtime_ns = csv_path.stat().st_mtime_ns
+    for delta_path in (delta_dir / 'applied').glob('*.csv'):
+        os.utime(delta_path, ns=(mtime_ns, mtime_ns))
+
+    restarted = PriceCatalog(csv_path, delta_dir=delta_dir)
+    restarted.reload()
+    assert price(restarted, 'Aspirin') == 1.0
+
+    assert compact_deltas(csv_path, delta_dir) == 1
+    restarted.reload()
+    assert price(restarted, 'Aspirin') == 1.0
+
+
+def test_every_worker_sharing_the_inbox_applies_each_delta(tmp_path, feed):
+    csv_path, delta_dir = feed
+    workers = [PriceCatalog(csv_path, delta_dir=delta_dir) for _ in range(3)]
+    for worker in workers:
+        worker.reload()
+    submit(tmp_path, delta_dir, {'Aspirin': 1.0})
+
+    assert [worker.ingest_pending_deltas() for worker in workers] == [1, 1, 1]
+    assert [price(worker, 'Aspirin') for worker in workers] == [1.0, 1.0, 1.0]
+    assert [worker.ingest_pending_deltas() for worker in workers] == [0, 0, 0]
+
+    submit(tmp_path, delta_dir, {'Aspirin': 2.0})
+    submit(tmp_path, delta_dir, {'Ibuprofen': 3.0})
+    workers[2].ingest_pending_deltas()
+    compact_deltas(csv_path, delta_dir)
+    # Caught up by reloading the compacted CSV, not by the deleted delta files
+    for worker in workers:
+        worker.ingest_pending_deltas()
+        worker.reload()
+    assert [(price(worker, 'Aspirin'), price(worker, 'Ibuprofen')) for worker in workers] == [(2.0, 3.0)] * 3
+
+
+def test_malformed_delta_is_set_aside(tmp_path, feed):
+    csv_path, delta_dir = feed
+    catalog = PriceCatalog(csv_path, delta_dir=delta_dir)
+    catalog.reload()
+    delta_dir.mkdir(exist_ok=True)
+    # A full price CSV dropped into the delta inbox by mistake: no Action column
+    (delta_dir / 'bad.csv').write_text('Medicine Name,Pharmacy Name,Price\nAspirin,Pharmacy A,1\n')
+    submit(tmp_path, delta_dir, {'Aspirin': 1.0})
+
+    assert catalog.ingest_pending_deltas() == 1
+    assert (delta_dir / 'bad.failed').exists()
+    assert price(catalog, 'Aspirin') == 1.0
+
+
+def test_watcher_keeps_polling_after_an_error(tmp_path, feed, monkeypatch):
+    csv_path, delta_dir = feed
+    catalog = PriceCatalog(csv_path, poll_interval=0.01, delta_dir=delta_dir)
+    catalog.reload()
+    ingest = catalog.ingest_pending_deltas
+    failures = []
+
+    def flaky_ingest():
+        if not failures:
+            failures.append(1)
+            raise PermissionError('delta directory unreadable')
+        return ingest()
+
+    monkeypatch.setattr(catalog, 'ingest_pending_deltas', flaky_ingest)
+    catalog.start_watching()
+    submit(tmp_path, delta_dir, {'Aspirin': 1.0})
+
+    for _ in range(200):
+        if price(catalog, 'Aspirin') == 1.0:
+            break
+        time.sleep(0.01)
+    assert failures and price(catalog, 'Aspirin') == 1.0
+    assert catalog._watcher.is_alive()
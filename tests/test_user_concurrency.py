@@ -0,0 +1,185 @@
+import threading
+import time
+
+import pytest
+
+from sqlite_users import SQLiteUserManager
+from users import EmailAlreadyRegistered, UserManager
+
+THREADS = 8
+UPDATES = 60
+
+
+@pytest.fixture(scope='module')
+def app_module(tmp_path_factory):
+    # Importing the app starts its services in the working directory, so
+    # it is imported from an empty one with a price list of its own
+    workdir = tmp_path_factory.mktemp('app')
+    (workdir / 'medicine_prices.csv').write_text(
+        'Medicine Name,Pharmacy Name,Price\nAspirin,Pharmacy A,5\nAspirin,Pharmacy B,4\n')
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setenv('MEDIREMIND_VOICE_ALERTS', '0')
+    monkeypatch.chdir(workdir)
+    import app
+    yield app
+    monkeypatch.undo()
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def store_kind(request):
+    return request.param
+
+
+@pytest.fixture
+def open_store(store_kind, tmp_path):
+    def open_store(flush_interval=0.01):
+        if store_kind == 'sqlite':
+            return SQLiteUserManager(str(tmp_path / 'users.db'), flush_interval=flush_interval)
+        return UserManager(str(tmp_path / 'users.json'), flush_interval=flush_interval)
+    return open_store
+
+
+@pytest.fixture
+def reminder(app_module, store_kind, tmp_path, monkeypatch):
+    """A MedicineReminder running every role on the store ``open_store`` opens."""
+    config = app_module.app.config
+    monkeypatch.setitem(config, 'USER_STORE', store_kind)
+    monkeypatch.setitem(config, 'USERS_FILE', str(tmp_path / 'users.json'))
+    monkeypatch.setitem(config, 'USER_DB_PATH', str(tmp_path / 'users.db'))
+    monkeypatch.setitem(config, 'USER_FLUSH_INTERVAL', 0.01)
+    return app_module.MedicineReminder()
+
+
+def run_threads(target, count=THREADS):
+    threads = [threading.Thread(target=target, args=(n,)) for n in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_updates_survive_reload(reminder, open_store):
+    users = reminder.user_manager
+    user_ids = [users.create_user(f'User {n}', f'user{n}@example.com', 'secret').user_id
+                for n in range(5)]
+
+    def update(thread):
+        for n in range(UPDATES):
+            # Threads share users, and each user is written by several threads
+            user_id = user_ids[(thread + n) % len(user_ids)]
+            result = reminder.set_reminder(user_id, f'Medicine {thread}-{n}', '08:00')
+            assert result['status'] == 'success', result
+            assert reminder.record_price_check(user_id, 'Aspirin')
+            users.update_user(user_id, name=f'User {thread}-{n}')
+
+    run_threads(update)
+    users.save_users()
+
+    assert len(reminder.scheduler) == THREADS * UPDATES
+    assert reminder.popularity.most_common(1) == [('Aspirin', THREADS * UPDATES)]
+    reloaded = open_store()
+    stored = [reloaded.get_user_by_id(user_id) for user_id in user_ids]
+    assert sorted(medicine for user in stored for medicine in user.reminders) == sorted(
+        f'Medicine {thread}-{n}' for thread in range(THREADS) for n in range(UPDATES))
+    for user in stored:
+        live = users.get_user_by_id(user.user_id)
+        assert user.reminders == live.reminders
+        assert user.medications == list(user.reminders)
+        assert user.name == live.name
+        # Every user was checked more often than the history keeps
+        assert len(user.price_checks) == user.price_checks.capacity
+
+
+def test_email_change_to_taken_address_changes_nothing(open_store):
+    users = open_store()
+    users.create_user('Ann', 'ann@example.com', 'secret')
+    bob = users.create_user('Bob', 'bob@example.com', 'secret')
+
+    with pytest.raises(EmailAlreadyRegistered):
+        users.update_user(bob.user_id, name='Robert', email='ANN@example.com')
+
+    users.save_users()
+    for store in (users, open_store()):
+        assert store.get_user_by_id(bob.user_id).name == 'Bob'
+        assert store.get_user_by_email('bob@example.com').user_id == bob.user_id
+        assert store.get_user_by_email('ann@example.com').name == 'Ann'
+
+
+def test_email_taken_by_another_process_is_reported(tmp_path, monkeypatch):
+    path = str(tmp_path / 'users.db')
+    first, second = SQLiteUserManager(path, flush_interval=3600), SQLiteUserManager(path, flush_interval=3600)
+    ann = first.create_user('Ann', 'ann@example.com', 'secret')
+    bob = second.create_user('Bob', 'bob@example.com', 'secret')
+    # Bob has unwritten changes, so the second process keeps his user object
+    with second.user_lock(bob.user_id):
+        user = second.get_user_by_id(bob.user_id)
+        user.reminders['Aspirin'] = '08:00'
+        second.save_user(user, 'reminders')
+
+    first.update_user(ann.user_id, email='shared@example.com')
+    # As if Bob's request checked the address just before Ann's change committed
+    monkeypatch.setattr(second, 'get_user_by_email', lambda email: None)
+
+    with pytest.raises(EmailAlreadyRegistered):
+        second.update_user(bob.user_id, name='Robert', email='shared@example.com')
+
+    assert second.get_user_by_id(bob.user_id).email == 'bob@example.com'
+    assert second.get_user_by_id(bob.user_id).name == 'Bob'
+    second.save_users()
+    assert first.get_user_by_id(bob.user_id).email == 'bob@example.com'
+    assert first.get_user_by_id(bob.user_id).reminders == {'Aspirin': '08:00'}
+
+
+def test_email_change_while_batch_waits_for_user_lock(tmp_path):
+    users = SQLiteUserManager(str(tmp_path / 'users.db'), flush_interval=3600)
+    ann = users.create_user('Ann', 'ann@example.com', 'secret')
+    bob = users.create_user('Bob', 'bob@example.com', 'secret')
+
+    with users.user_lock(bob.user_id):
+        for user in (users.get_user_by_id(ann.user_id), users.get_user_by_id(bob.user_id)):
+            user.streak_days = 3
+            users.save_user(user, 'streak_days')
+        # The batch writes Ann, then needs Bob's lock, which this thread holds
+        flusher = threading.Thread(target=users.writes.flush)
+        flusher.start()
+        time.sleep(0.2)
+
+        start = time.perf_counter()
+        users.update_user(bob.user_id, email='robert@example.com')
+        assert time.perf_counter() - start < 2
+
+    flusher.join(timeout=5)
+    assert not flusher.is_alive()
+    stored = users.get_user_by_email('robert@example.com')
+    assert stored.user_id == bob.user_id
+    assert stored.streak_days == 3
+
+
+def test_web_workers_sharing_a_database_keep_each_others_updates(tmp_path):
+    path = str(tmp_path / 'users.db')
+    # Two web workers: separate managers, so separate user locks and connections
+    workers = [SQLiteUserManager(path, write_behind=False) for _ in range(2)]
+    user_ids = [workers[0].create_user(f'User {n}', f'user{n}@example.com', 'secret').user_id
+                for n in range(3)]
+
+    def update(thread):
+        users = workers[thread % len(workers)]
+        for n in range(UPDATES):
+            user_id = user_ids[(thread + n) % len(user_ids)]
+            with users.user_lock(user_id):
+                user = users.get_user_by_id(user_id)
+                user.reminders[f'Medicine {thread}-{n}'] = '08:00'
+                user.medications.append(f'Medicine {thread}-{n}')
+                user.streak_days += 1
+                users.save_user(user, 'reminders', 'medications', 'streak_days')
+
+    run_threads(update)
+
+    stored = [workers[1].get_user_by_id(user_id) for user_id in user_ids]
+    assert sum(user.streak_days for user in stored) == THREADS * UPDATES
+    assert sorted(medicine for user in stored for medicine in user.reminders) == sorted(
+        f'Medicine {thread}-{n}' for thread in range(THREADS) for n in range(UPDATES))
+    assert all(list(user.reminders) == user.medications for user in stored)
+    version, changed = workers[1].changed_reminders()
+    assert {user_id: len(reminders) for user_id, reminders in changed.items()} == {
+        user.user_id: len(user.reminders) for user in stored}
@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metrics import BYTE_BUCKETS, Counter, Histogram
+
+log = logging.getLogger(__name__)
+
+JOURNAL_BYTES = Counter('mediremind_user_journal_bytes_written', 'Bytes appended to the user journal')
+SNAPSHOT_SECONDS = Histogram('mediremind_user_snapshot_duration_seconds',
+                             'Time to write a full users snapshot (save_users and compactions)')
+SNAPSHOT_BYTES = Histogram('mediremind_user_snapshot_bytes', 'Size of each users snapshot written',
+                           buckets=BYTE_BUCKETS)
+
+
+class JournalStore:
+    """Snapshot file plus an append-only journal of per-user changes.
+
+    Every change is appended as one JSON line holding only the fields that
+    changed, so a write costs the size of the change rather than the size of
+    the whole user table. Once the journal grows past ``compact_threshold``
+    records it is folded into the snapshot on a background thread.
+    """
+
+    def __init__(self, snapshot_path: str, snapshot_source: Callable[[], Dict],
+                 journal_path: Optional[str] = None, compact_threshold: int = 1000):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or f"{snapshot_path}.journal"
+        self.rotated_path = f"{self.journal_path}.old"
+        self.snapshot_source = snapshot_source
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._journal = None
+        self._records = 0
+        self._compacting = False
+
+    def exists(self) -> bool:
+        return any(os.path.exists(path) for path in
+                   (self.snapshot_path, self.rotated_path, self.journal_path))
+
+    def load(self) -> Dict[str, Dict]:
+        """Read the snapshot and replay any journaled changes on top of it."""
+        users_data = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r') as f:
+                users_data = json.load(f)
+
+        # A rotated journal is left behind if we stopped mid-compaction;
+        # replaying it is harmless because records only ever set fields.
+        self._records = 0
+        for path in (self.rotated_path, self.journal_path):
+            if os.path.exists(path):
+                self._records += self._replay(path, users_data)
+        return users_data
+
+    def _replay(self, path: str, users_data: Dict[str, Dict]) -> int:
+        count = 0
+        good_end = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Torn final write from a crash; it was never acknowledged
+                    break
+                good_end += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A damaged record costs only itself, not the records after it
+                    log.warning("Skipping unreadable record in %s at byte %d",
+                                path, good_end - len(line))
+                    continue
+                users_data.setdefault(record['user_id'], {}).update(record['fields'])
+                count += 1
+        if good_end < os.path.getsize(path):
+            # New appends would otherwise run onto the end of the partial line
+            # and be unreadable themselves
+            log.warning("Truncating torn record at the end of %s (byte %d)", path, good_end)
+            with open(path, 'r+b') as f:
+                f.truncate(good_end)
+        return count
+
+    def append(self, user_id: str, fields: Dict) -> None:
+        """Journal the given fields of one user."""
+        self.append_many([(user_id, fields)])
+
+    def append_many(self, records: List[Tuple[str, Dict]]) -> None:
+        """Journal ``(user_id, fields)`` records with a single write."""
+        if not records:
+            return
+        data = ''.join(
+            json.dumps({'user_id': user_id, 'fields': fields}, separators=(',', ':')) + '\n'
+            for user_id, fields in records
+        )
+        with self._lock:
+            if self._journal is None:
+                self._journal = open(self.journal_path, 'a')
+            self._journal.write(data)
+            self._journal.flush()
+            self._records += len(records)
+        JOURNAL_BYTES.inc(len(data))
+        self.maybe_compact()
+
+    def maybe_compact(self) -> None:
+        """Start a background compaction if the journal has grown too long."""
+        with self._lock:
+            if self._compacting or self._records < self.compact_threshold:
+                return
+            self._compacting = True
+        threading.Thread(target=self._compact_in_background, daemon=True).start()
+
+    def _compact_in_background(self) -> None:
+        try:
+            self.compact()
+        except Exception as e:
+            log.exception("Error compacting %s: %s", self.journal_path, e)
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def compact(self) -> None:
+        """Write a fresh snapshot and discard the journal it covers."""
+        with self._compact_lock:
+            start = time.perf_counter()
+            with self._lock:
+                # Everything journaled so far is reflected in this snapshot,
+                # so later appends can go to a fresh journal.
+                users_data = self.snapshot_source()
+                if self._journal is not None:
+                    self._journal.close()
+                    self._journal = None
+                if os.path.exists(self.journal_path):
+                    os.replace(self.journal_path, self.rotated_path)
+                self._records = 0
+
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(users_data, f, indent=4)
+                f.flush()
+                # The rename must never expose a snapshot that is not fully on disk
+                os.fsync(f.fileno())
+                size = os.fstat(f.fileno()).st_size
+            os.replace(tmp_path, self.snapshot_path)
+            if os.path.exists(self.rotated_path):
+                os.remove(self.rotated_path)
+            SNAPSHOT_SECONDS.observe(time.perf_counter() - start)
+            SNAPSHOT_BYTES.observe(size)
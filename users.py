@@ -0,0 +1,250 @@
+import hashlib
+import logging
+import threading
+import uuid
+
+from price_history import DEFAULT_CAPACITY, PriceCheckHistory
+from user_store import JournalStore
+from write_behind import WriteBehind
+
+log = logging.getLogger(__name__)
+
+
+class EmailAlreadyRegistered(ValueError):
+    """A user's email was changed to an address another user registered."""
+
+
+def email_key(email):
+    """Normalized form of an email address used for case-insensitive lookup."""
+    return email.casefold()
+
+
+class User:
+    def __init__(self, name, email, password_hash, user_id=None,
+                 price_history_size=DEFAULT_CAPACITY):
+        self.user_id = user_id or str(uuid.uuid4())
+        self.name = name
+        self.email = email
+        self.password_hash = password_hash
+        self.reminders = {}
+        self.medications = []
+        self.price_checks = PriceCheckHistory(price_history_size)
+        self.streak_days = 0
+        self.email_notifications = True  # Default to enabled
+        self.digest_reminders = True  # Merge reminders due at the same time into one alert
+        
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'name': self.name,
+            'email': self.email,
+            'password_hash': self.password_hash,
+            'reminders': dict(self.reminders),
+            'medications': list(self.medications),
+            'price_checks': self.price_checks.to_data(),
+            'streak_days': self.streak_days,
+            'email_notifications': self.email_notifications,
+            'digest_reminders': self.digest_reminders
+        }
+    
+    @classmethod
+    def from_dict(cls, data, price_history_size=DEFAULT_CAPACITY):
+        user = cls(
+            name=data['name'],
+            email=data['email'],
+            password_hash=data['password_hash'],
+            user_id=data['user_id']
+        )
+        user.reminders = data.get('reminders', {})
+        user.medications = data.get('medications', [])
+        user.price_checks = PriceCheckHistory.from_data(data.get('price_checks', []), price_history_size)
+        user.streak_days = data.get('streak_days', 0)
+        user.email_notifications = data.get('email_notifications', True)
+        user.digest_reminders = data.get('digest_reminders', True)
+        return user
+
+class UserManager:
+    """Users kept in memory and persisted to users.json plus its journal.
+
+    Code that reads, changes and saves a user holds ``user_lock(user_id)``
+    throughout, so concurrent requests and the scheduler cannot lose each
+    other's updates. ``save_user`` only marks the user dirty; a write-behind
+    thread journals every dirty user in one batch each ``flush_interval``
+    seconds, so request threads never wait on disk.
+    """
+
+    def __init__(self, users_file='users.json', price_history_size=DEFAULT_CAPACITY,
+                 flush_interval=0.05):
+        self.users = {}
+        self.price_history_size = price_history_size  # price checks kept per user
+        self._email_index = {}  # email_key(email) -> user_id
+        self._lock = threading.Lock()  # guards the user table, email index and user locks
+        self._user_locks = {}
+        self.users_file = users_file
+        self.store = JournalStore(self.users_file, snapshot_source=self._users_data)
+        self.writes = WriteBehind(self._write_users, flush_interval)
+        self.load_users()
+        self.writes.start()
+
+    def user_lock(self, user_id):
+        """Re-entrant lock to hold while reading, changing and saving one user."""
+        with self._lock:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = threading.RLock()
+            return lock
+        
+    def load_users(self):
+        try:
+            if self.store.exists():
+                users_data = self.store.load()
+                for user_id, user_data in users_data.items():
+                    user = User.from_dict(user_data, self.price_history_size)
+                    self.users[user_id] = user
+                    # Keep the first user on duplicate emails, as the old linear scan did
+                    self._email_index.setdefault(email_key(user.email), user_id)
+                log.info("Loaded %d users from %s", len(self.users), self.users_file)
+                self.store.maybe_compact()
+            else:
+                log.info("No users file found at %s", self.users_file)
+        except Exception as e:
+            log.exception("Error loading users: %s", e)
+            
+    def _users_data(self):
+        users_data = {}
+        for user_id, user in list(self.users.items()):
+            with self.user_lock(user_id):
+                users_data[user_id] = user.to_dict()
+        return users_data
+            
+    def save_users(self):
+        """Write a full snapshot of every user and truncate the journal."""
+        try:
+            self.writes.flush()
+            self.store.compact()
+            log.info("Saved %d users to %s", len(self.users), self.users_file)
+        except Exception as e:
+            log.exception("Error saving users: %s", e)
+            
+    def save_user(self, user, *fields):
+        """Queue the given fields of one user, or the whole record if none are given, for writing."""
+        self.writes.mark(user, fields)
+
+    def _user_fields(self, user, fields):
+        with self.user_lock(user.user_id):
+            data = user.to_dict()
+        if fields:
+            data = {field: data[field] for field in fields}
+        return data
+
+    def _write_users(self, batch):
+        # Called by the write-behind thread with every user changed since the last batch
+        self.store.append_many(
+            [(user.user_id, self._user_fields(user, fields)) for user, fields in batch]
+        )
+            
+    def get_user_by_email(self, email):
+        user_id = self._email_index.get(email_key(email))
+        return self.users.get(user_id) if user_id else None
+        
+    def iter_reminders(self):
+        """Yield (user_id, medicine_name, time_24hour) for every stored reminder."""
+        for user in list(self.users.values()):
+            for medicine_name, time_24hour in list(user.reminders.items()):
+                yield user.user_id, medicine_name, time_24hour
+        
+    def get_user_by_id(self, user_id):
+        return self.users.get(user_id)
+
+    def counts(self):
+        """Number of users and of stored reminders."""
+        users = list(self.users.values())
+        return {'users': len(users), 'reminders': sum(len(user.reminders) for user in users)}
+        
+    def create_user(self, name, email, password):
+        # Hash password
+        password_hash = self._hash_password(password)
+        
+        with self._lock:
+            # Check if user with email already exists
+            if self.get_user_by_email(email):
+                return None
+            
+            # Create new user
+            user = User(name, email, password_hash, price_history_size=self.price_history_size)
+            self.users[user.user_id] = user
+            self._index_email(user)
+        self.save_user(user)
+        return user
+        
+    def authenticate_user(self, email, password):
+        user = self.get_user_by_email(email)
+        if not user:
+            return None
+            
+        password_hash = self._hash_password(password)
+        if user.password_hash == password_hash:
+            return user
+        return None
+        
+    def update_user(self, user_id, name=None, email=None, password=None, email_notifications=None,
+                    digest_reminders=None):
+        """Change the given fields; False if there is no such user.
+
+        Raises EmailAlreadyRegistered, changing nothing, if ``email`` belongs
+        to another user.
+        """
+        with self.user_lock(user_id):
+            return self._update_user(user_id, name, email, password, email_notifications,
+                                     digest_reminders)
+
+    def _update_user(self, user_id, name, email, password, email_notifications, digest_reminders):
+        user = self.get_user_by_id(user_id)
+        if not user:
+            return False
+            
+        previous = {}  # field -> value before this update
+        if email:
+            with self._lock:
+                if email_key(email) != email_key(user.email) and self.get_user_by_email(email):
+                    raise EmailAlreadyRegistered(email)
+                previous['email'] = user.email
+                user.email = email
+                self._index_email(user, previous['email'])
+        if name:
+            previous['name'] = user.name
+            user.name = name
+        if password:
+            previous['password_hash'] = user.password_hash
+            user.password_hash = self._hash_password(password)
+        if email_notifications is not None:
+            previous['email_notifications'] = user.email_notifications
+            user.email_notifications = email_notifications
+        if digest_reminders is not None:
+            previous['digest_reminders'] = user.digest_reminders
+            user.digest_reminders = digest_reminders
+            
+        if previous:
+            try:
+                self.save_user(user, *previous)
+            except EmailAlreadyRegistered:
+                # The store refused the address (another process took it first)
+                # and wrote nothing, so undo the change in memory as well
+                with self._lock:
+                    for field, value in previous.items():
+                        setattr(user, field, value)
+                    self._index_email(user, email)
+                raise
+        return True
+        
+    def _index_email(self, user, old_email=None):
+        if old_email is not None:
+            old_key = email_key(old_email)
+            # With legacy duplicate emails the entry may belong to the first user
+            if self._email_index.get(old_key) == user.user_id:
+                del self._email_index[old_key]
+        self._email_index[email_key(user.email)] = user.user_id
+        
+    def _hash_password(self, password):
+        # Simple password hashing - in production, use a more secure method
+        return hashlib.sha256(password.encode()).hexdigest()
@@ -0,0 +1,220 @@
+import hashlib
+import logging
+import os
+import platform
+import subprocess
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+log = logging.getLogger(__name__)
+
+
+class VoiceBackend:
+    """Turns text into an audio file and plays audio files back.
+
+    ``name`` is part of the cache key, so audio made by one backend is
+    never played by another.
+    """
+
+    name = 'base'
+    extension = '.wav'
+
+    def synthesize(self, text: str, path: str) -> None:
+        raise NotImplementedError
+
+    def play(self, path: str) -> None:
+        raise NotImplementedError
+
+
+class NullVoiceBackend(VoiceBackend):
+    """Makes no sound; for servers without audio and for tests.
+
+    Synthesized "audio" is the text itself, and every played phrase is
+    kept in ``played``.
+    """
+
+    name = 'none'
+
+    def __init__(self):
+        self.synthesized = 0
+        self.played: List[str] = []
+
+    def synthesize(self, text: str, path: str) -> None:
+        self.synthesized += 1
+        Path(path).write_text(text, encoding='utf-8')
+
+    def play(self, path: str) -> None:
+        self.played.append(Path(path).read_text(encoding='utf-8'))
+
+
+class Pyttsx3Backend(VoiceBackend):
+    """Speech from pyttsx3, played with the platform's own audio player.
+
+    The engine is started on first use, from the thread that uses it;
+    pyttsx3 engines must stay on one thread.
+    """
+
+    name = 'pyttsx3'
+
+    def __init__(self):
+        self._engine = None
+
+    def _get_engine(self):
+        if self._engine is None:
+            # Imported here: loading its driver is slow and often fails on servers
+            import pyttsx3
+            self._engine = pyttsx3.init()
+            log.info("Voice alert system is ready")
+        return self._engine
+
+    def synthesize(self, text: str, path: str) -> None:
+        engine = self._get_engine()
+        engine.save_to_file(text, path)
+        engine.runAndWait()
+
+    def play(self, path: str) -> None:
+        play_audio_file(path)
+
+
+def play_audio_file(path: str) -> None:
+    """Play an audio file to the end, raising if it cannot be played."""
+    system = platform.system()
+    if system == 'Windows':
+        import winsound
+        winsound.PlaySound(path, winsound.SND_FILENAME)
+        return
+    player = 'afplay' if system == 'Darwin' else 'aplay'
+    subprocess.run([player, path], check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+VOICE_BACKENDS = {
+    'pyttsx3': Pyttsx3Backend,
+    'none': NullVoiceBackend,
+}
+
+
+def create_voice_backend(name: str) -> VoiceBackend:
+    try:
+        return VOICE_BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown voice backend {name!r}; expected one of {', '.join(VOICE_BACKENDS)}")
+
+
+class AudioCache:
+    """Synthesized phrases kept as audio files, at most ``max_entries`` of them.
+
+    Files are named after a hash of the backend and text. The least
+    recently played file is deleted to make room. Files already in
+    ``cache_dir`` are picked up at startup, oldest played first, so phrases
+    spoken yesterday are not synthesized again after a restart.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], max_entries: int = 64, extension: str = '.wav'):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self.extension = extension
+        self.hits = 0
+        self.misses = 0
+        self._files: 'OrderedDict[str, Path]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        existing = sorted(self.cache_dir.glob(f'*{extension}'), key=lambda path: path.stat().st_mtime)
+        for path in existing:
+            self._files[path.stem] = path
+        self._evict()
+
+    def key(self, backend_name: str, text: str) -> str:
+        return hashlib.sha1(f"{backend_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Path]:
+        """The cached file for ``key``, marked as just used; None on a miss."""
+        with self._lock:
+            path = self._files.get(key)
+            if path is not None and path.exists():
+                self._files.move_to_end(key)
+                self.hits += 1
+            else:
+                self._files.pop(key, None)
+                self.misses += 1
+                return None
+        # Keeps the recency order across restarts
+        os.utime(path)
+        return path
+
+    def put(self, key: str, synthesize) -> Path:
+        """Create the file for ``key`` with ``synthesize(path)`` and cache it."""
+        path = self.cache_dir / f"{key}{self.extension}"
+        tmp_path = path.with_name(f"{key}.tmp")
+        try:
+            synthesize(str(tmp_path))
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        with self._lock:
+            self._files[key] = path
+            self._files.move_to_end(key)
+            self._evict()
+        return path
+
+    def _evict(self) -> None:
+        while len(self._files) > self.max_entries:
+            _, path = self._files.popitem(last=False)
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._files),
+                'capacity': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+            }
+
+
+class VoiceAlerts:
+    """Speak alerts through a backend, reusing audio already synthesized.
+
+    ``speak`` blocks for as long as the phrase plays, so it is meant to
+    run on a single dedicated worker (the notification dispatcher's
+    'voice' channel). If the backend fails to make audio, voice alerts
+    are switched off and ``available`` becomes False.
+    """
+
+    def __init__(self, backend: VoiceBackend, cache: AudioCache):
+        self.backend = backend
+        self.cache = cache
+        self.available = True
+
+    def speak(self, text: str) -> None:
+        if not self.available:
+            # Alerts queued before the backend failed
+            return
+        key = self.cache.key(self.backend.name, text)
+        path = self.cache.get(key)
+        if path is None:
+            try:
+                path = self.cache.put(key, lambda tmp_path: self.backend.synthesize(text, tmp_path))
+            except Exception as e:
+                self.available = False
+                log.warning("Could not synthesize voice alert: %s. "
+                            "Reminders will still work, but without voice alerts.", e)
+                return
+        try:
+            self.backend.play(str(path))
+        except Exception as e:
+            log.warning("Could not play voice alert: %s", e)
+
+    def metrics(self) -> Dict:
+        return {'backend': self.backend.name, 'available': self.available, **self.cache.metrics()}
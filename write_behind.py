@@ -0,0 +1,104 @@
+import atexit
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metrics import Histogram
+
+log = logging.getLogger(__name__)
+
+FLUSH_SECONDS = Histogram('mediremind_user_flush_duration_seconds',
+                          'Time to write one batch of changed users')
+FLUSH_USERS = Histogram('mediremind_user_flush_users', 'Users written per batch',
+                        buckets=(1, 2, 5, 10, 25, 50, 100, 250, 1000))
+
+# (user, fields to write); no fields means the whole record
+DirtyUser = Tuple[object, Tuple[str, ...]]
+
+
+class WriteBehind:
+    """Collect changed users and persist them in batches off the request path.
+
+    ``mark`` only records which user changed and which fields, so callers
+    never wait on disk. A background thread hands everything marked since
+    the last pass to ``write`` once every ``interval`` seconds; a user
+    changed many times in between is written once. Users stay visible
+    through ``pending`` until their batch has been written, so a backend
+    that reads from storage still sees its own unflushed changes. Anything
+    left is flushed when the interpreter exits.
+    """
+
+    def __init__(self, write: Callable[[List[DirtyUser]], None], interval: float = 0.05):
+        self.write = write
+        self.interval = interval
+        self.batches = 0
+        self.users_written = 0
+        self.last_flush_seconds: Optional[float] = None
+        self._dirty: Dict[str, List] = {}
+        self._flushing: Dict[str, List] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='user-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def mark(self, user, fields: Tuple[str, ...] = ()) -> None:
+        """Queue ``fields`` of ``user`` for the next write."""
+        with self._lock:
+            self._merge(user.user_id, user, set(fields) if fields else None)
+
+    def _merge(self, user_id: str, user, fields: Optional[set]) -> None:
+        entry = self._dirty.get(user_id)
+        if entry is None:
+            self._dirty[user_id] = [user, fields]
+            return
+        # None stands for the whole record, which covers every field
+        if entry[1] is not None:
+            entry[1] = entry[1] | fields if fields is not None else None
+
+    def pending(self, user_id: str):
+        """The user object awaiting a write, or None if it has none."""
+        with self._lock:
+            entry = self._dirty.get(user_id) or self._flushing.get(user_id)
+            return entry[0] if entry else None
+
+    def flush(self) -> None:
+        """Write everything marked so far, on the calling thread."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._flushing, self._dirty = self._dirty, {}
+            start = time.perf_counter()
+            batch = [
+                (user, tuple(sorted(fields)) if fields is not None else ())
+                for user, fields in self._flushing.values()
+            ]
+            try:
+                self.write(batch)
+            except Exception as e:
+                log.error("Error writing %d users, will retry: %s", len(batch), e)
+                with self._lock:
+                    for user_id, (user, fields) in self._flushing.items():
+                        self._merge(user_id, user, fields)
+            finally:
+                with self._lock:
+                    self._flushing = {}
+            self.batches += 1
+            self.users_written += len(batch)
+            self.last_flush_seconds = time.perf_counter() - start
+            FLUSH_SECONDS.observe(self.last_flush_seconds)
+            FLUSH_USERS.observe(len(batch))
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def __len__(self) -> int:
+        return len(self._dirty)